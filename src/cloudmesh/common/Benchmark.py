@@ -1,9 +1,14 @@
+import gc
 import inspect
+import itertools
 import os
+import random
 from pprint import pprint
 
 import yaml
 from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.StopWatch import TimerHistogram
+from cloudmesh.common.Tabulate import Printer
 from cloudmesh.common.util import path_expand
 from cloudmesh.common.variables import Variables
 
@@ -22,14 +27,19 @@ class Benchmark(object):
         - Start(status=True): Starts a timer associated with the calling method's name.
         - Status(value=True): Prints the status of a timer associated with the calling method's name.
         - Stop(): Stops a timer associated with the calling method's name.
+        - run(func, ...): Times a callable repeatedly after a warm-up and returns its statistics.
         - print(sysinfo=True, csv=True, tag=None, node=None, user=None): Prints benchmark information with all timers.
         - yaml(path, n): Creates a Cloudmesh service YAML test file with specified attributes.
+        - stream(size, block=1048576): Yields the blocks of a file of a given size.
         - file(path, n): Creates a file of a given size in binary megabytes and returns the size in megabytes.
 
     Note:
         This class relies on the StopWatch class for timer functionality.
     """
 
+    # the confidence intervals of the timers measured with run by name
+    intervals = {}
+
     @staticmethod
     def debug():
         """Sets the CMS shell variables for trace, debug, and verbosity.
@@ -127,6 +137,182 @@ class Benchmark(object):
         StopWatch.start("benchmark_start_stop")
         StopWatch.stop("benchmark_start_stop")
         StopWatch.benchmark(sysinfo=sysinfo, csv=csv, tag=tag, user=user, node=node)
+        if Benchmark.intervals:
+            print(Benchmark.interval_report())
+
+    @staticmethod
+    def interval_report(output="table"):
+        """formats the confidence intervals of the timers measured with run
+
+        Args:
+            output (str): table, csv, json or yaml
+
+        Returns:
+            str: the formatted intervals
+        """
+        return Printer.write(
+            list(Benchmark.intervals.values()),
+            order=["timer", "number", "repeat", "mean", "low", "high", "confidence"],
+            output=output,
+        )
+
+    @staticmethod
+    def _calibrate(loop, min_time):
+        """returns the number of calls of a sample that take at least
+        min_time seconds, using the sequence 1, 2, 5, 10, 20, 50, ... of
+        timeit.Timer.autorange
+
+        Args:
+            loop (function): runs the callable n times and returns the time
+                in ns
+            min_time (float): the minimal time of a sample in seconds
+
+        Returns:
+            int: the number of calls
+        """
+        i = 1
+        while True:
+            for j in 1, 2, 5:
+                number = i * j
+                if loop(number) >= min_time * 1e9:
+                    return number
+            i *= 10
+
+    @staticmethod
+    def _interval(values, confidence, samples, seed):
+        """computes a bootstrap confidence interval of the mean
+
+        Returns:
+            tuple: the lower and upper bound of the interval
+        """
+        if len(values) < 2:
+            return values[0], values[0]
+        choices = random.Random(seed).choices
+        means = sorted(
+            sum(choices(values, k=len(values))) / len(values) for i in range(samples)
+        )
+        alpha = (1 - confidence) / 2
+        low = means[int(alpha * (len(means) - 1))]
+        high = means[int(round((1 - alpha) * (len(means) - 1)))]
+        return low, high
+
+    @staticmethod
+    def run(
+        func,
+        args=(),
+        kwargs=None,
+        name=None,
+        number=None,
+        repeat=7,
+        warmup=1,
+        min_time=0.2,
+        disable_gc=True,
+        cpu=None,
+        confidence=0.95,
+        samples=1000,
+        seed=None,
+        output=True,
+    ):
+        """times a callable like timeit. After warmup calls the callable is
+        called number times per sample and repeat samples are taken. The
+        time per call of each sample is added to the StopWatch timer, so it
+        appears with its statistics in the benchmark table.
+
+        Args:
+            func (function): the callable
+            args (tuple): the positional arguments of the callable
+            kwargs (dict): the keyword arguments of the callable
+            name (str): the name of the timer, by default the qualified
+                name of the callable
+            number (int): the number of calls per sample, if None it is
+                calibrated so that a sample takes at least min_time
+            repeat (int): the number of samples
+            warmup (int): the number of calls before the measurement
+            min_time (float): the minimal time of a sample in seconds used
+                for the calibration
+            disable_gc (bool): if True the garbage collector is disabled
+                while the samples are taken
+            cpu (int or list): the CPUs the process is pinned to while the
+                samples are taken, ignored where the platform does not
+                support it
+            confidence (float): the confidence level of the interval of
+                the mean
+            samples (int): the number of bootstrap samples
+            seed (int): the seed of the bootstrap for reproducible intervals
+            output (bool): if True the benchmark table and the interval
+                are printed
+
+        Returns:
+            dict: the timer, number, repeat, the statistics of the time per
+            call in seconds and the interval of the mean as low and high
+
+        Raises:
+            ValueError: if repeat is less than 1
+
+        Usage:
+            Benchmark.run(sorted, args=(data,), repeat=10)
+        """
+        if repeat < 1:
+            raise ValueError(f"Benchmark.run: repeat must be at least 1, got {repeat}")
+        kwargs = kwargs or {}
+        name = name or getattr(func, "__qualname__", None) or repr(func)
+        clock = StopWatch.clock
+        repeat_calls = itertools.repeat
+
+        def loop(n):
+            start = clock()
+            for i in repeat_calls(None, n):
+                func(*args, **kwargs)
+            return clock() - start
+
+        affinity = None
+        if cpu is not None and hasattr(os, "sched_setaffinity"):
+            affinity = os.sched_getaffinity(0)
+            cpus = {cpu} if isinstance(cpu, int) else set(cpu)
+            os.sched_setaffinity(0, cpus)
+        gc_enabled = gc.isenabled()
+        try:
+            for i in range(warmup):
+                func(*args, **kwargs)
+            if number is None:
+                number = Benchmark._calibrate(loop, min_time)
+            if disable_gc:
+                gc.collect()
+                gc.disable()
+            values = [loop(number) // number for i in range(repeat)]
+        finally:
+            if gc_enabled:
+                gc.enable()
+            if affinity is not None:
+                os.sched_setaffinity(0, affinity)
+
+        timer = StopWatch.timer(name)
+        stats = TimerHistogram()
+        for value in values:
+            timer.add(value)
+            stats.add(value)
+        StopWatch.message(name, f"number={number} repeat={repeat}")
+
+        low, high = Benchmark._interval(values, confidence, samples, seed)
+        Benchmark.intervals[name] = {
+            "timer": name,
+            "number": number,
+            "repeat": repeat,
+            "mean": stats.mean / 1e9,
+            "low": low / 1e9,
+            "high": high / 1e9,
+            "confidence": confidence,
+        }
+        result = dict(
+            Benchmark.intervals[name],
+            cpu=cpu,
+            gc=not disable_gc,
+            statistics=stats.statistics(),
+        )
+        if output:
+            StopWatch.benchmark(sysinfo=False, csv=False)
+            print(Benchmark.interval_report())
+        return result
 
     @staticmethod
     def yaml(path, n):
@@ -151,14 +337,49 @@ class Benchmark(object):
         with open(location, "w") as yaml_file:
             yaml.dump(cm, yaml_file, default_flow_style=False)
 
+    @staticmethod
+    def stream(size, block=1048576, data=None):
+        """Yields the content of a file of the given size one block at a time, so
+        files larger than the memory can be generated.
+
+        Args:
+            size (int): The size in bytes.
+            block (int): The size of the blocks in bytes.
+            data (bytes): The content of each block, repeated if it is shorter
+                than block, by default every block is filled with new random
+                bytes.
+
+        Yields:
+            bytes: The blocks, the last one is shorter if size is not a multiple
+            of block.
+
+        Usage:
+            with open("example.bin", "wb") as f:
+                for chunk in Benchmark.stream(10 * 1048576):
+                    f.write(chunk)
+        """
+        if data is not None and len(data) < block:
+            if not data:
+                raise ValueError("Benchmark.stream: data is empty")
+            data = (data * (block // len(data) + 1))[:block]
+        remaining = size
+        while remaining > 0:
+            n = min(block, remaining)
+            if data is None:
+                yield os.urandom(n)
+            else:
+                yield data[:n]
+            remaining -= n
+
     # noinspection SpellCheckingInspection
     @staticmethod
-    def file(path, n):
+    def file(path, n, block=1048576):
         """Creates a file of a given size in binary megabytes and returns the size in megabytes.
 
         Args:
             path (str): The filename and path for the created file.
             n (int): The size in binary megabytes.
+            block (int): The size of the blocks written at a time in bytes.
 
         Returns:
             float: Size of the created file in megabytes.
@@ -169,8 +390,9 @@ class Benchmark(object):
         """
         location = path_expand(path)
         size = 1048576 * n  # size in bytes
-        with open(path, "wb") as f:
-            f.write(os.urandom(size))
+        with open(location, "wb") as f:
+            for chunk in Benchmark.stream(size, block=block):
+                f.write(chunk)
 
         s = os.path.getsize(location)
         # try:
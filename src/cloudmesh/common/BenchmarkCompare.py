@@ -0,0 +1,309 @@
+"""Compares StopWatch benchmark results and flags regressions.
+
+A result set is the output of one or more benchmark runs. It can be given
+as a log file with the "# csv" lines written by StopWatch.benchmark, as a
+json or yaml file with the dict returned by StopWatch.get_benchmark, as
+such a dict or as a list of them. Each run adds one sample per timer, so
+a set loaded from many runs contains the repeated measurements of each
+timer.
+
+Every set is compared against the first one, the baseline. For each timer
+the relative change of the mean is reported together with a bootstrap
+confidence interval. A timer is flagged as regression if the whole
+interval lies above the threshold and as improvement if it lies below
+the negative threshold. With a single run per set the interval collapses
+to the measured change.
+
+Example:
+
+    from cloudmesh.common.BenchmarkCompare import BenchmarkCompare
+
+    compare = BenchmarkCompare(threshold=0.05)
+    compare.add("nightly", ["run1.log", "run2.log", "run3.log"])
+    compare.add("today", ["run4.log", "run5.log", "run6.log"])
+    print(compare.report())
+    if compare.regressions():
+        ...
+
+From the command line, where files separated by commas belong to the
+same set and the exit code is 1 if a regression is found:
+
+    python -m cloudmesh.common.BenchmarkCompare run1.log,run2.log run3.log,run4.log
+"""
+
+import argparse
+import json
+import random
+import sys
+
+import yaml
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.Tabulate import Printer
+from cloudmesh.common.util import path_expand
+
+
+class BenchmarkCompare(object):
+    """Compares the timers of benchmark result sets against a baseline."""
+
+    def __init__(
+        self,
+        metric="time",
+        threshold=0.05,
+        confidence=0.95,
+        samples=1000,
+        seed=None,
+    ):
+        """creates the comparison
+
+        Args:
+            metric (str): the column that is compared, e.g. time, sum,
+                mean or p95
+            threshold (float): the relative change of the mean above which
+                a timer is flagged, 0.05 is 5%
+            confidence (float): the confidence level of the interval
+            samples (int): the number of bootstrap samples
+            seed (int): the seed of the random generator for reproducible
+                intervals
+        """
+        self.metric = metric
+        self.threshold = threshold
+        self.confidence = confidence
+        self.samples = samples
+        self.random = random.Random(seed)
+        self.sets = {}
+
+    @staticmethod
+    def _runs(source):
+        """returns the runs of a source as lists of timer entries
+
+        Args:
+            source (str, dict or list): a file name, a get_benchmark dict
+                or a list of them
+
+        Returns:
+            list: a list of runs, each a list of dicts with a timer key
+        """
+        if isinstance(source, (list, tuple)):
+            runs = []
+            for element in source:
+                runs.extend(BenchmarkCompare._runs(element))
+            return runs
+        if isinstance(source, dict):
+            benchmark = source.get("benchmark", source)
+            return [
+                [
+                    dict(entry, timer=entry.get("timer", name))
+                    for name, entry in benchmark.items()
+                ]
+            ]
+        filename = path_expand(source)
+        if filename.endswith(".json"):
+            with open(filename) as f:
+                return BenchmarkCompare._runs(json.load(f))
+        if filename.endswith((".yaml", ".yml")):
+            with open(filename) as f:
+                return BenchmarkCompare._runs(yaml.safe_load(f))
+        return [list(StopWatch.read_csv(filename, convert=True))]
+
+    def add(self, label, source):
+        """adds the runs of a source to the result set with the given label
+
+        Args:
+            label (str): the name of the result set
+            source (str, dict or list): a file name, a get_benchmark dict
+                or a list of them
+        """
+        values = self.sets.setdefault(label, {})
+        for run in BenchmarkCompare._runs(source):
+            for entry in run:
+                value = entry.get(self.metric)
+                if entry.get("timer") is None or value is None:
+                    continue
+                try:
+                    values.setdefault(entry["timer"], []).append(float(value))
+                except (TypeError, ValueError):
+                    pass
+
+    @staticmethod
+    def _mean(values):
+        return sum(values) / len(values)
+
+    def interval(self, baseline, candidate):
+        """computes a bootstrap confidence interval of the relative change
+        of the mean from baseline to candidate
+
+        Args:
+            baseline (list): the measurements of the baseline
+            candidate (list): the measurements of the candidate
+
+        Returns:
+            tuple: the lower and upper bound of the interval
+        """
+        if len(baseline) < 2 and len(candidate) < 2:
+            change = self._mean(candidate) / self._mean(baseline) - 1
+            return change, change
+        choices = self.random.choices
+        changes = []
+        for i in range(self.samples):
+            base = self._mean(choices(baseline, k=len(baseline)))
+            if base == 0:
+                continue
+            after = self._mean(choices(candidate, k=len(candidate)))
+            changes.append(after / base - 1)
+        if not changes:
+            return None, None
+        changes.sort()
+        alpha = (1 - self.confidence) / 2
+        low = changes[int(alpha * (len(changes) - 1))]
+        high = changes[int(round((1 - alpha) * (len(changes) - 1)))]
+        return low, high
+
+    def compare(self):
+        """compares all result sets against the first one
+
+        Returns:
+            list: a dict per timer and set with the baseline and candidate
+                means, the relative change, its confidence interval and the
+                status regression, improvement, ok, new or missing
+        """
+        labels = list(self.sets)
+        if len(labels) < 2:
+            raise ValueError("BenchmarkCompare: at least two result sets required")
+        baseline_label = labels[0]
+        baseline = self.sets[baseline_label]
+        results = []
+        for label in labels[1:]:
+            candidate = self.sets[label]
+            for timer in sorted(set(baseline) | set(candidate)):
+                entry = {
+                    "timer": timer,
+                    "baseline": baseline_label,
+                    "candidate": label,
+                    "n": f"{len(baseline.get(timer, []))}"
+                    f"/{len(candidate.get(timer, []))}",
+                    "before": None,
+                    "after": None,
+                    "change": None,
+                    "low": None,
+                    "high": None,
+                }
+                if timer not in candidate:
+                    entry["status"] = "missing"
+                elif timer not in baseline:
+                    entry["status"] = "new"
+                else:
+                    before = self._mean(baseline[timer])
+                    after = self._mean(candidate[timer])
+                    entry["before"] = before
+                    entry["after"] = after
+                    if before == 0:
+                        entry["status"] = "ok"
+                    else:
+                        low, high = self.interval(baseline[timer], candidate[timer])
+                        entry["change"] = after / before - 1
+                        entry["low"] = low
+                        entry["high"] = high
+                        if low is not None and low > self.threshold:
+                            entry["status"] = "regression"
+                        elif high is not None and high < -self.threshold:
+                            entry["status"] = "improvement"
+                        else:
+                            entry["status"] = "ok"
+                results.append(entry)
+        return results
+
+    def regressions(self):
+        """returns the comparisons flagged as regression
+
+        Returns:
+            list: the entries of compare with status regression
+        """
+        return [entry for entry in self.compare() if entry["status"] == "regression"]
+
+    def report(self, output="table", results=None):
+        """formats the comparison
+
+        Args:
+            output (str): table, csv, json or yaml
+            results (list): the result of compare, computed if not given
+
+        Returns:
+            str: the formatted comparison
+        """
+        results = results if results is not None else self.compare()
+        if output in ["json", "yaml"]:
+            return Printer.write(results, output=output)
+        table = []
+        for entry in results:
+            row = dict(entry)
+            for key in ["before", "after"]:
+                if row[key] is not None:
+                    row[key] = round(row[key], StopWatch.digits)
+            for key in ["change", "low", "high"]:
+                if row[key] is not None:
+                    row[key] = f"{row[key] * 100:+.1f}%"
+            table.append(row)
+        return Printer.write(
+            table,
+            order=[
+                "timer",
+                "candidate",
+                "n",
+                "before",
+                "after",
+                "change",
+                "low",
+                "high",
+                "status",
+            ],
+            output=output,
+        )
+
+
+def main(argv=None):
+    """compares benchmark result sets given on the command line
+
+    Args:
+        argv (list): the arguments, by default sys.argv[1:]
+
+    Returns:
+        int: 1 if a regression is found, otherwise 0
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m cloudmesh.common.BenchmarkCompare",
+        description="compares StopWatch benchmark results against the first set",
+    )
+    parser.add_argument(
+        "sets",
+        nargs="+",
+        help="result sets, files of repeated runs separated by commas",
+    )
+    parser.add_argument("--metric", default="time")
+    parser.add_argument("--threshold", type=float, default=0.05)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--output", default="table", choices=["table", "csv", "json", "yaml"]
+    )
+    args = parser.parse_args(argv)
+    if len(args.sets) < 2:
+        parser.error("at least two result sets required")
+
+    compare = BenchmarkCompare(
+        metric=args.metric,
+        threshold=args.threshold,
+        confidence=args.confidence,
+        samples=args.samples,
+        seed=args.seed,
+    )
+    for files in args.sets:
+        compare.add(files, files.split(","))
+    results = compare.compare()
+    print(compare.report(output=args.output, results=results))
+    regressions = [entry for entry in results if entry["status"] == "regression"]
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""Measures the throughput of reading and writing files.
+
+The suite writes and reads a file of a given size one block at a time
+for a sweep of block sizes. Blocks are accessed sequentially or in a
+random order and with one of the modes
+
+* buffered: os.read and os.write through the page cache
+* direct: O_DIRECT with aligned buffers where the platform and the file
+  system support it, otherwise the result has the status unsupported
+* mmap: the file is mapped into memory and the blocks are copied
+
+Writes are made durable according to an fsync policy: none, end (one
+fsync after the last block) or block (an fsync after every block).
+Before a file is read its pages are dropped from the page cache with
+posix_fadvise where available, so the reads reach the disk.
+
+Every measurement is recorded as StopWatch timer "io write" or "io read"
+with the labels pattern, mode, block and fsync and with the bytes moved,
+so the benchmark table shows the throughput in MB/s.
+
+Example:
+
+    from cloudmesh.common.BenchmarkIO import BenchmarkIO
+    from cloudmesh.common.StopWatch import StopWatch
+
+    suite = BenchmarkIO(directory="/scratch", size=256 * 1048576)
+    suite.run(blocks=[4096, 1048576], modes=["buffered", "direct", "mmap"])
+    StopWatch.benchmark()
+
+From the command line:
+
+    python -m cloudmesh.common.BenchmarkIO --size 256M --block 4k,64k,1M
+"""
+
+import argparse
+import mmap
+import os
+import random
+import sys
+import tempfile
+
+from cloudmesh.common.Benchmark import Benchmark
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.Tabulate import Printer
+from cloudmesh.common.util import path_expand
+
+
+class BenchmarkIO(object):
+    """A suite of file read and write throughput benchmarks."""
+
+    modes = ("buffered", "direct", "mmap")
+    patterns = ("sequential", "random")
+    policies = ("none", "end", "block")
+    # the alignment of the buffers, offsets and block sizes for O_DIRECT
+    alignment = 4096
+
+    def __init__(
+        self, directory=None, size=64 * 1048576, seed=None, drop_cache=True
+    ):
+        """creates the suite
+
+        Args:
+            directory (str): the directory of the test files, by default
+                the temporary directory
+            size (int): the size of the test files in bytes
+            seed (int): the seed of the random block order
+            drop_cache (bool): if True the pages of a file are dropped from
+                the page cache before it is read
+        """
+        self.directory = path_expand(directory) if directory else None
+        self.size = size
+        self.random = random.Random(seed)
+        self.drop_cache = drop_cache
+
+    def _offsets(self, size, block, pattern):
+        offsets = list(range(0, size, block))
+        if pattern == "random":
+            self.random.shuffle(offsets)
+        elif pattern != "sequential":
+            raise ValueError(f"BenchmarkIO: unknown pattern {pattern}")
+        return offsets
+
+    def _size(self, block):
+        return max(block, self.size // block * block)
+
+    def _buffer(self, block, mode):
+        """returns a block of random data, aligned for O_DIRECT"""
+        data = next(Benchmark.stream(block, block=block))
+        if mode != "direct":
+            return data
+        buffer = mmap.mmap(-1, block)
+        buffer.write(data)
+        return buffer
+
+    def _open(self, path, mode, write):
+        flags = os.O_RDWR | os.O_CREAT if write else os.O_RDONLY
+        if write and mode != "mmap":
+            flags |= os.O_TRUNC
+        flags |= getattr(os, "O_BINARY", 0)
+        if mode == "direct":
+            flags |= os.O_DIRECT
+        return os.open(path, flags, 0o644)
+
+    def _supported(self, mode, block):
+        return mode != "direct" or (
+            hasattr(os, "O_DIRECT") and block % self.alignment == 0
+        )
+
+    @staticmethod
+    def _result(op, pattern, mode, block, policy, size, elapsed_ns, status):
+        mb_s = None
+        if elapsed_ns:
+            mb_s = round(size / 1e6 / (elapsed_ns / 1e9), 3)
+        return {
+            "op": op,
+            "pattern": pattern,
+            "mode": mode,
+            "block": block,
+            "fsync": policy,
+            "bytes": size,
+            "time": None if elapsed_ns is None else elapsed_ns / 1e9,
+            "mb_s": mb_s,
+            "status": status,
+        }
+
+    def _unsupported(self, op, pattern, mode, block, policy, size):
+        return self._result(op, pattern, mode, block, policy, size, None, "unsupported")
+
+    def write(
+        self, path, block, mode="buffered", pattern="sequential", fsync="end"
+    ):
+        """writes a file of the size of the suite and records the time as
+        timer "io write"
+
+        Args:
+            path (str): the file
+            block (int): the size of the blocks in bytes
+            mode (str): buffered, direct or mmap
+            pattern (str): sequential or random
+            fsync (str): none, end or block
+
+        Returns:
+            dict: op, pattern, mode, block, fsync, bytes, time, mb_s and
+            status ok or unsupported
+        """
+        if fsync not in self.policies:
+            raise ValueError(f"BenchmarkIO: unknown fsync policy {fsync}")
+        size = self._size(block)
+        if not self._supported(mode, block):
+            return self._unsupported("write", pattern, mode, block, fsync, size)
+        offsets = self._offsets(size, block, pattern)
+        data = self._buffer(block, mode)
+        labels = {"pattern": pattern, "mode": mode, "block": block, "fsync": fsync}
+        timer = None
+        try:
+            fd = self._open(path, mode, write=True)
+        except OSError:
+            return self._unsupported("write", pattern, mode, block, fsync, size)
+        try:
+            if mode == "mmap":
+                os.ftruncate(fd, size)
+                view = mmap.mmap(fd, size)
+                # flush of a range needs an offset aligned to the pages
+                ranged = block % mmap.ALLOCATIONGRANULARITY == 0
+                timer = StopWatch.start("io write", labels=labels)
+                for offset in offsets:
+                    view[offset : offset + block] = data
+                    if fsync == "block":
+                        if ranged:
+                            view.flush(offset, block)
+                        else:
+                            view.flush()
+                if fsync == "end":
+                    view.flush()
+                StopWatch.stop(timer)
+                view.close()
+            else:
+                timer = StopWatch.start("io write", labels=labels)
+                for offset in offsets:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    os.write(fd, data)
+                    if fsync == "block":
+                        os.fsync(fd)
+                if fsync == "end":
+                    os.fsync(fd)
+                StopWatch.stop(timer)
+        except OSError:
+            # e.g. a file system that accepts O_DIRECT on open but not on write
+            if timer is not None:
+                StopWatch.stop(timer, state=False)
+            return self._unsupported("write", pattern, mode, block, fsync, size)
+        finally:
+            os.close(fd)
+        StopWatch.add_bytes("io write", size, labels=labels)
+        return self._result(
+            "write", pattern, mode, block, fsync, size, timer.elapsed_ns, "ok"
+        )
+
+    def _uncache(self, path):
+        if not self.drop_cache or not hasattr(os, "posix_fadvise"):
+            return
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def read(self, path, block, mode="buffered", pattern="sequential"):
+        """reads a file written with write and records the time as timer
+        "io read"
+
+        Args:
+            path (str): the file
+            block (int): the size of the blocks in bytes
+            mode (str): buffered, direct or mmap
+            pattern (str): sequential or random
+
+        Returns:
+            dict: op, pattern, mode, block, fsync, bytes, time, mb_s and
+            status ok or unsupported
+        """
+        size = min(self._size(block), os.path.getsize(path) // block * block)
+        if not self._supported(mode, block) or size == 0:
+            return self._unsupported("read", pattern, mode, block, None, size)
+        offsets = self._offsets(size, block, pattern)
+        labels = {"pattern": pattern, "mode": mode, "block": block}
+        self._uncache(path)
+        timer = None
+        try:
+            fd = self._open(path, mode, write=False)
+        except OSError:
+            return self._unsupported("read", pattern, mode, block, None, size)
+        try:
+            if mode == "mmap":
+                view = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+                timer = StopWatch.start("io read", labels=labels)
+                for offset in offsets:
+                    view[offset : offset + block]
+                StopWatch.stop(timer)
+                view.close()
+            elif mode == "direct":
+                buffer = mmap.mmap(-1, block)
+                timer = StopWatch.start("io read", labels=labels)
+                for offset in offsets:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    os.readv(fd, [buffer])
+                StopWatch.stop(timer)
+            else:
+                timer = StopWatch.start("io read", labels=labels)
+                for offset in offsets:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    os.read(fd, block)
+                StopWatch.stop(timer)
+        except OSError:
+            if timer is not None:
+                StopWatch.stop(timer, state=False)
+            return self._unsupported("read", pattern, mode, block, None, size)
+        finally:
+            os.close(fd)
+        StopWatch.add_bytes("io read", size, labels=labels)
+        return self._result(
+            "read", pattern, mode, block, None, size, timer.elapsed_ns, "ok"
+        )
+
+    def run(
+        self,
+        blocks=(4096, 65536, 1048576),
+        modes=modes,
+        patterns=patterns,
+        fsync=("end",),
+        output=True,
+    ):
+        """writes and reads a test file for every combination of block
+        size, mode and pattern. The file is written once per fsync policy
+        and read afterwards.
+
+        Args:
+            blocks (list): the block sizes in bytes
+            modes (list): the modes
+            patterns (list): the access patterns
+            fsync (list): the fsync policies of the writes
+            output (bool): if True the results are printed as table
+
+        Returns:
+            list: the result of each write and read
+        """
+        results = []
+        for block in blocks:
+            for mode in modes:
+                for pattern in patterns:
+                    descriptor, path = tempfile.mkstemp(
+                        prefix="cloudmesh-io-", dir=self.directory
+                    )
+                    os.close(descriptor)
+                    try:
+                        written = False
+                        for policy in fsync:
+                            result = self.write(path, block, mode, pattern, policy)
+                            results.append(result)
+                            written = written or result["status"] == "ok"
+                        if written:
+                            results.append(self.read(path, block, mode, pattern))
+                        else:
+                            size = self._size(block)
+                            result = self._unsupported(
+                                "read", pattern, mode, block, None, size
+                            )
+                            results.append(result)
+                    finally:
+                        os.remove(path)
+        if output:
+            print(self.report(results))
+        return results
+
+    @staticmethod
+    def report(results, output="table"):
+        """formats the results of run
+
+        Args:
+            results (list): the results
+            output (str): table, csv, json or yaml
+
+        Returns:
+            str: the formatted results
+        """
+        return Printer.write(
+            results,
+            order=[
+                "op",
+                "pattern",
+                "mode",
+                "block",
+                "fsync",
+                "bytes",
+                "time",
+                "mb_s",
+                "status",
+            ],
+            header=[
+                "Op",
+                "Pattern",
+                "Mode",
+                "Block",
+                "Fsync",
+                "Bytes",
+                "Time",
+                "MB/s",
+                "Status",
+            ],
+            output=output,
+        )
+
+    @staticmethod
+    def parse_size(value):
+        """converts a size such as 4096, 4k, 64K, 1M or 2G to bytes, the
+        suffixes are binary
+
+        Args:
+            value (str): the size
+
+        Returns:
+            int: the size in bytes
+        """
+        value = str(value).strip()
+        factors = {"k": 1024, "m": 1024**2, "g": 1024**3}
+        factor = factors.get(value[-1:].lower())
+        if factor is None:
+            return int(value)
+        return int(float(value[:-1]) * factor)
+
+
+def main(argv=None):
+    """runs the I/O benchmark suite with the options given on the command line
+
+    Args:
+        argv (list): the arguments, by default sys.argv[1:]
+
+    Returns:
+        int: 0
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m cloudmesh.common.BenchmarkIO",
+        description="measures the file read and write throughput",
+    )
+    parser.add_argument("--directory", default=None)
+    parser.add_argument("--size", default="64M")
+    parser.add_argument("--block", default="4k,64k,1M")
+    parser.add_argument("--mode", default=",".join(BenchmarkIO.modes))
+    parser.add_argument("--pattern", default=",".join(BenchmarkIO.patterns))
+    parser.add_argument("--fsync", default="end")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--benchmark", action="store_true", help="print the StopWatch benchmark"
+    )
+    args = parser.parse_args(argv)
+
+    suite = BenchmarkIO(
+        directory=args.directory,
+        size=BenchmarkIO.parse_size(args.size),
+        seed=args.seed,
+    )
+    suite.run(
+        blocks=[BenchmarkIO.parse_size(block) for block in args.block.split(",")],
+        modes=args.mode.split(","),
+        patterns=args.pattern.split(","),
+        fsync=args.fsync.split(","),
+    )
+    if args.benchmark:
+        StopWatch.benchmark()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""Buffered event sink that writes events in batches from a background thread.
+
+Writing a log line for every timer is I/O bound when millions of events
+are recorded. An EventSink buffers the events in a bounded ring buffer
+and a background thread writes them in batches. The batch is written
+when it reaches the configured size or when the interval has passed,
+whatever comes first. The remaining events are written when the sink is
+closed, when the program exits and when one of the given signals is
+received.
+
+Events are formatted in the background thread. Strings are written as
+they are, tuples are written in the form
+
+    # value1, value2, ...
+
+which is the format used by StopWatchBlock. A custom formatter or a
+writer that receives the whole batch can be passed along.
+
+Example:
+
+    from cloudmesh.common.EventSink import EventSink
+    from cloudmesh.common.StopWatch import StopWatch
+    from cloudmesh.common.StopWatch import StopWatchBlock
+
+    sink = EventSink(filename="events.log", size=1000, interval=1.0)
+    StopWatch.sink = sink
+
+    for i in range(1000000):
+        with StopWatchBlock("step", data={"i": i}):
+            ...
+
+    sink.close()
+"""
+
+import atexit
+import collections
+import os
+import signal
+import threading
+
+from cloudmesh.common.console import Console
+from cloudmesh.common.util import path_expand
+
+
+class EventSink(object):
+    """Buffers events and writes them in batches from a background thread."""
+
+    def __init__(
+        self,
+        filename=None,
+        mode="a",
+        stream=None,
+        writer=None,
+        formatter=None,
+        size=1000,
+        interval=1.0,
+        capacity=1000000,
+        overflow="block",
+        signals=(signal.SIGTERM,),
+    ):
+        """creates the sink and starts its background thread
+
+        Args:
+            filename (str): the file the events are written to
+            mode (str): the mode used to open the file
+            stream (object): a stream the events are written to instead
+                of a file, e.g. sys.stdout
+            writer (function): a function that is called with the list of
+                events of a batch instead of writing to a file or stream
+            formatter (function): converts an event into a line, by
+                default EventSink.format
+            size (int): the number of events that triggers a write
+            interval (float): the maximal time in seconds between writes
+            capacity (int): the maximal number of buffered events
+            overflow (str): block waits until events are written if the
+                buffer is full, drop discards the oldest events
+            signals (tuple): signals on which the buffer is written before
+                the previous signal handler is called
+        """
+        if overflow not in ["block", "drop"]:
+            raise ValueError(f"EventSink: unknown overflow {overflow}")
+        self.size = size
+        self.interval = interval
+        self.capacity = capacity
+        self.overflow = overflow
+        self.formatter = formatter or EventSink.format
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+
+        self.file = None
+        self.stream = stream
+        self.writer = writer
+        if writer is None and stream is None:
+            if filename is None:
+                raise ValueError("EventSink: filename, stream or writer required")
+            self.file = open(path_expand(filename), mode)
+            self.stream = self.file
+
+        self._buffer = collections.deque(
+            maxlen=capacity if overflow == "drop" else None
+        )
+        self._write_lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._space = threading.Condition()
+        self._handlers = {}
+
+        self._thread = threading.Thread(
+            target=self._run, name="EventSink", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+        for signum in signals or []:
+            self._install(signum)
+
+    @staticmethod
+    def format(event):
+        """converts an event into a line
+
+        Args:
+            event (object): a string, a tuple or any object
+
+        Returns:
+            str: the line
+        """
+        if isinstance(event, str):
+            return event
+        if isinstance(event, tuple):
+            return "# " + ", ".join(str(value) for value in event)
+        return str(event)
+
+    def emit(self, event):
+        """adds an event to the buffer. The event is formatted and written
+        later by the background thread, so it should not be modified by
+        the caller afterwards.
+
+        Args:
+            event (object): the event
+        """
+        if self.closed:
+            raise ValueError("EventSink: emit on closed sink")
+        buffer = self._buffer
+        if self.overflow == "drop":
+            if len(buffer) == self.capacity:
+                self.dropped += 1
+        elif len(buffer) >= self.capacity:
+            with self._space:
+                while len(buffer) >= self.capacity and not self.closed:
+                    self._wakeup.set()
+                    self._space.wait(self.interval)
+        buffer.append(event)
+        if len(buffer) >= self.size:
+            self._wakeup.set()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def _run(self):
+        while not self.closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """writes all buffered events"""
+        with self._write_lock:
+            buffer = self._buffer
+            while buffer:
+                batch = []
+                try:
+                    while len(batch) < self.size:
+                        batch.append(buffer.popleft())
+                except IndexError:
+                    pass
+                self._write(batch)
+                with self._space:
+                    self._space.notify_all()
+
+    def _write(self, batch):
+        if self.writer is not None:
+            self.writer(batch)
+        else:
+            lines = [self.formatter(event) for event in batch]
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        self.written += len(batch)
+
+    def _install(self, signum):
+        """installs a handler that writes the buffer on the given signal
+        and then calls the previous handler
+
+        Args:
+            signum (int): the signal number
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        try:
+            self._handlers[signum] = signal.signal(signum, self._on_signal)
+        except (ValueError, OSError):
+            pass
+
+    def _on_signal(self, signum, frame):
+        self.flush()
+        previous = self._handlers.get(signum)
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    def close(self):
+        """writes the remaining events, stops the background thread and
+        closes the file
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._wakeup.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        with self._space:
+            self._space.notify_all()
+        if self.dropped:
+            Console.warning(f"EventSink: dropped {self.dropped} events")
+        for signum, previous in self._handlers.items():
+            try:
+                if signal.getsignal(signum) == self._on_signal:
+                    signal.signal(signum, previous)
+            except (ValueError, OSError, TypeError):
+                pass
+        self._handlers.clear()
+        if self.file is not None:
+            self.file.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -1,13 +1,19 @@
+import asyncio
+import functools
 import os
 import platform as platform_module
 import subprocess
 import textwrap
+import time
 from multiprocessing import Pool
 from pprint import pprint
 
 from cloudmesh.common.DateTime import DateTime
 from cloudmesh.common.Printer import Printer
+from cloudmesh.common.SharedTimerTable import SharedTimerTable
+from cloudmesh.common.StopWatch import StopWatch
 from cloudmesh.common.parameter import Parameter
+from cloudmesh.common.ssh.ssh_pool import SSHPool
 from cloudmesh.common.systeminfo import os_is_windows
 from cloudmesh.common.util import path_expand
 from cloudmesh.common.util import readfile
@@ -129,6 +135,17 @@ class Host(object):
         Returns:
 
         """
+        stopwatch = args.get("stopwatch") and os.getpid() != args.get("parent")
+        if stopwatch:
+            StopWatch.clear()
+            StopWatch.start(f"Host.run {args.get('host')}")
+        row = None
+        if args.get("table") is not None:
+            table = SharedTimerTable.attach(args["table"])
+            row = table.row(args["row"])
+            started = time.time()
+            start = time.perf_counter_ns()
+            row.write(f"Host.run {args.get('host')}", True, 0, started, 0, 0)
         try:
             # experimental sleep as we get a block on ssh commands
 
@@ -156,25 +173,336 @@ class Host(object):
                 returncode = result.returncode
                 stdout = result.stdout
 
-            data = {
-                "host": args.get("host"),
-                "command": args.get("command"),
-                "execute": args.get("execute"),
-                "stdout": stdout,
-                "stderr": stderr,
-                "returncode": returncode,
-                "success": returncode == 0,
-                "date": DateTime.now(),
-                "cmd": " ".join(args.get("command")),
-            }
+            data = Host._result(args, stdout, stderr, returncode)
         except Exception as e:
             print(e)
             data = None
+        if row is not None:
+            elapsed = time.perf_counter_ns() - start
+            row.write(
+                f"Host.run {args.get('host')}", False, 1, started, elapsed, elapsed
+            )
+            table.close()
+        if stopwatch:
+            name = f"Host.run {args.get('host')}"
+            StopWatch.stop(name)
+            StopWatch.status(name, data is not None and data["success"])
+            if data is not None:
+                data["stopwatch"] = StopWatch.snapshot(clear=True)
         return data
 
+    @staticmethod
+    def _result(args, stdout, stderr, returncode):
+        """returns the result dict of the command of a host
+
+        Args:
+            args: command dict
+            stdout: the output of the command
+            stderr: the error output of the command
+            returncode: the return code of the command
+
+        Returns:
+            dict: host, command, execute, stdout, stderr, returncode,
+            success, date and cmd
+        """
+        return {
+            "host": args.get("host"),
+            "command": args.get("command"),
+            "execute": args.get("execute"),
+            "stdout": stdout,
+            "stderr": stderr,
+            "returncode": returncode,
+            "success": returncode == 0,
+            "date": DateTime.now(),
+            "cmd": " ".join(args.get("command")),
+        }
+
+    @staticmethod
+    async def _run_coroutine(args, semaphore, table=None, index=None):
+        """executes the command of a host like _run, but as subprocess of
+        the event loop, so a single process can wait for many commands
+
+        Args:
+            args: command dict
+            semaphore: the semaphore limiting the running commands
+            table: the SharedTimerTable the state is written to
+            index: the row of the host in the table
+
+        Returns:
+            dict: the result of the command or None
+        """
+        async with semaphore:
+            name = f"Host.run {args.get('host')}"
+            if args.get("stopwatch"):
+                StopWatch.start(name)
+            if table is not None:
+                row = table.row(index)
+                started = time.time()
+                start = time.perf_counter_ns()
+                row.write(name, True, 0, started, 0, 0)
+            try:
+                hostname = platform_module.uname()[1]
+                host = args.get("host")
+
+                if host == hostname:
+                    # like subprocess.getoutput
+                    process = await asyncio.create_subprocess_shell(
+                        args.get("execute"),
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT,
+                    )
+                    result, _ = await process.communicate()
+                    stdout = result.decode("utf-8", "ignore")
+                    if stdout[-1:] == "\n":
+                        stdout = stdout[:-1]
+                    stderr = ""
+                    returncode = 0
+                else:
+                    command = args.get("command")
+                    if not args.get("shell"):
+                        process = await asyncio.create_subprocess_exec(
+                            *command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                        )
+                    elif os_is_windows():
+                        process = await asyncio.create_subprocess_shell(
+                            subprocess.list2cmdline(command),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                        )
+                    else:
+                        # like subprocess.run with a list and shell=True
+                        process = await asyncio.create_subprocess_exec(
+                            "/bin/sh",
+                            "-c",
+                            *command,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                        )
+                    result, error = await process.communicate()
+                    stdout = result.decode("utf-8", "ignore").strip()
+                    stderr = None if error == b"" else error
+                    returncode = process.returncode
+
+                data = Host._result(args, stdout, stderr, returncode)
+            except Exception as e:
+                print(e)
+                data = None
+            if table is not None:
+                elapsed = time.perf_counter_ns() - start
+                row.write(name, False, 1, started, elapsed, elapsed)
+            if args.get("stopwatch"):
+                StopWatch.stop(name)
+                StopWatch.status(name, data is not None and data["success"])
+            return data
+
+    @staticmethod
+    def _arguments(hosts, command, execute, shell, stopwatch, **kwargs):
+        """returns the command dicts of the hosts"""
+        return [
+            {
+                "command": [c.format(host=host, **kwargs) for c in command],
+                "shell": shell,
+                "host": host,
+                "execute": execute,
+                "stopwatch": stopwatch,
+                "parent": os.getpid(),
+            }
+            for host in Parameter.expand(hosts)
+        ]
+
+    @staticmethod
+    def _run_indexed(executor, entry):
+        """calls the executor with the args of entry and returns the result
+        with the index of entry, so results in completion order can be put
+        back into the order of the hosts"""
+        index, args = entry
+        return index, executor(args)
+
+    @staticmethod
+    async def _as_completed(args, processors):
+        """yields the index and the result of each command dict in the
+        order in which the commands finish"""
+        semaphore = asyncio.Semaphore(processors)
+
+        async def run(index, entry):
+            return index, await Host._run_coroutine(entry, semaphore)
+
+        tasks = [asyncio.ensure_future(run(i, e)) for i, e in enumerate(args)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _completed(args, processors, executor=None, callback=None):
+        """yields the index and the result of each command dict in the
+        order in which the commands finish and calls callback with each
+        result. The timers of the workers are merged before the callback.
+        Leaving the loop early terminates the commands still running.
+
+        Args:
+            args: the command dicts
+            processors: the number of commands running at the same time
+            executor: "asyncio", a function replacing Host._run or None
+            callback: a function called with each result
+
+        Returns:
+            generator: tuples of index and result
+        """
+        if executor == "asyncio":
+            loop = asyncio.new_event_loop()
+            results = Host._as_completed(args, processors)
+            try:
+                while True:
+                    try:
+                        index, data = loop.run_until_complete(results.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    if callback is not None:
+                        callback(data)
+                    yield index, data
+            finally:
+                loop.run_until_complete(results.aclose())
+                loop.close()
+            return
+
+        _executor = executor if callable(executor) else Host._run
+        with Pool(processors) as p:
+            for index, data in p.imap_unordered(
+                functools.partial(Host._run_indexed, _executor), enumerate(args)
+            ):
+                if data is not None and "stopwatch" in data:
+                    StopWatch.merge_snapshot(data.pop("stopwatch"))
+                if callback is not None:
+                    callback(data)
+                yield index, data
+
+    @staticmethod
+    def run_iter(
+        hosts=None,
+        command=None,
+        execute=None,
+        processors=3,
+        shell=False,
+        stopwatch=False,
+        executor=None,
+        callback=None,
+        **kwargs,
+    ):
+        """Executes the command on all hosts like Host.run, but yields the
+        result of each host as soon as its command is done. Results are
+        returned in the order of completion, so failures show up before
+        the slowest host is done and the results of all hosts do not
+        have to be kept in memory.
+
+        Example:
+
+            for result in Host.run_iter(hosts="red[01-99]", command=command):
+                if not result["success"]:
+                    print(result["host"], result["stderr"])
+
+        Args:
+            callback: a function called with each result before it is
+                yielded
+            the other arguments are the arguments of Host.run
+
+        Returns:
+            generator: the result dicts of Host.run in completion order
+        """
+        args = Host._arguments(hosts, command, execute, shell, stopwatch, **kwargs)
+        for index, data in Host._completed(args, processors, executor, callback):
+            yield data
+
+    @staticmethod
+    async def run_async_iter(
+        hosts=None,
+        command=None,
+        execute=None,
+        processors=3,
+        shell=False,
+        stopwatch=False,
+        callback=None,
+        **kwargs,
+    ):
+        """The asynchronous iterator of Host.run_iter. It runs the commands
+        from the event loop of the calling process like Host.run_async.
+
+        Example:
+
+            async for result in Host.run_async_iter(hosts=hosts, command=command):
+                print(result["host"], result["stdout"])
+
+        Returns:
+            async generator: the result dicts of Host.run in completion order
+        """
+        args = Host._arguments(hosts, command, execute, shell, stopwatch, **kwargs)
+        results = Host._as_completed(args, processors)
+        try:
+            async for index, data in results:
+                if callback is not None:
+                    callback(data)
+                yield data
+        finally:
+            await results.aclose()
+
+    @staticmethod
+    async def run_async(
+        hosts=None,
+        command=None,
+        execute=None,
+        processors=3,
+        shell=False,
+        stopwatch=False,
+        live=None,
+        interval=1.0,
+        **kwargs,
+    ):
+        """Executes the command on all hosts from the event loop of the
+        calling process. It takes the arguments of Host.run, but
+        processors is the number of commands running at the same time and
+        the timers of stopwatch are recorded directly. Use it with await
+        where an event loop is already running, otherwise use
+        Host.run(..., executor="asyncio").
+
+        Returns:
+            list: the result dicts of Host.run in the order of the hosts
+        """
+        args = Host._arguments(hosts, command, execute, shell, stopwatch, **kwargs)
+        semaphore = asyncio.Semaphore(processors)
+        table = SharedTimerTable(len(args), columns=1) if live else None
+        try:
+            results = asyncio.gather(
+                *[
+                    Host._run_coroutine(entry, semaphore, table, index)
+                    for index, entry in enumerate(args)
+                ]
+            )
+            if callable(live):
+                while not results.done():
+                    live(table.read())
+                    await asyncio.wait({results}, timeout=interval)
+                live(table.read())
+            return await results
+        finally:
+            if table is not None:
+                table.close()
+
     @staticmethod
     def run(
-        hosts=None, command=None, execute=None, processors=3, shell=False, **kwargs
+        hosts=None,
+        command=None,
+        execute=None,
+        processors=3,
+        shell=False,
+        stopwatch=False,
+        live=None,
+        interval=1.0,
+        executor=None,
+        callback=None,
+        **kwargs,
     ):
         """Executes the command on all hosts. The key values
         specified in **kwargs will be replaced prior to the
@@ -190,34 +518,107 @@ class Host(object):
             processors: The number of parallel processes used
             shell: Set to Tue if the current context of the shell is to
                 be used. It is by default True
+            stopwatch: if True the command of each host is timed in the
+                worker as timer "Host.run {host}" and merged into the
+                StopWatch of the calling process
+            live: if set the state of the command of each host is written
+                into a SharedTimerTable with one row per host. If it is a
+                function, it is called with the entries of the table every
+                interval seconds and when all commands are done
+            interval: the seconds between the calls of live
+            executor: "asyncio" runs the commands as subprocesses of an
+                event loop in this process, with up to processors
+                commands at the same time. This scales to thousands of
+                hosts. A function replaces Host._run in the processes of
+                the pool. By default a pool of processors processes runs
+                Host._run
+            callback: a function called in this process with the result
+                of each host as soon as its command is done. It can not
+                be combined with live. To process the results without
+                keeping them use Host.run_iter
             **kwargs: The key value pairs to be replaced in the command
 
         Returns:
 
         """
+        if callback is not None:
+            if live:
+                raise ValueError("callback and live can not be combined")
+            args = Host._arguments(hosts, command, execute, shell, stopwatch, **kwargs)
+            res = [None] * len(args)
+            for index, data in Host._completed(args, processors, executor, callback):
+                res[index] = data
+            return res
+
+        if executor == "asyncio":
+            return asyncio.run(
+                Host.run_async(
+                    hosts=hosts,
+                    command=command,
+                    execute=execute,
+                    processors=processors,
+                    shell=shell,
+                    stopwatch=stopwatch,
+                    live=live,
+                    interval=interval,
+                    **kwargs,
+                )
+            )
 
-        hosts = Parameter.expand(hosts)
-        args = [
-            {
-                "command": [c.format(host=host, **kwargs) for c in command],
-                "shell": shell,
-                "host": host,
-                "execute": execute,
-            }
-            for host in hosts
-        ]
+        args = Host._arguments(hosts, command, execute, shell, stopwatch, **kwargs)
 
-        if "executor" not in args:
-            _executor = Host._run
+        _executor = executor if callable(executor) else Host._run
         # from pprint import pprint
         # os.sync()
         # pprint(args)
         with Pool(processors) as p:
-            res = p.map(_executor, args)
+            if live:
+                table = SharedTimerTable(len(args), columns=1)
+                for index, entry in enumerate(args):
+                    entry["table"] = table.filename
+                    entry["row"] = index
+                try:
+                    result = p.map_async(_executor, args)
+                    while not result.ready():
+                        if callable(live):
+                            live(table.read())
+                        result.wait(interval)
+                    if callable(live):
+                        live(table.read())
+                    res = result.get()
+                finally:
+                    table.close()
+            else:
+                res = p.map(_executor, args)
             p.close()
             p.join()
+        for entry in res:
+            if entry is not None and "stopwatch" in entry:
+                StopWatch.merge_snapshot(entry.pop("stopwatch"))
         return res
 
+    @staticmethod
+    def _used(pool, key, callback=None):
+        """returns a callback that records the master connection of a host
+        in the pool once a command ran over it and then calls callback
+
+        Args:
+            pool (SSHPool): the pool
+            key (str): the identity file
+            callback: the function called with each result
+
+        Returns:
+            function: the callback for Host.run
+        """
+
+        def used(entry):
+            if entry is not None:
+                pool.use(entry["host"], key=key)
+            if callback is not None:
+                callback(entry)
+
+        return used
+
     @staticmethod
     def ssh(
         hosts=None,
@@ -227,6 +628,7 @@ class Host(object):
         processors=3,
         dryrun=False,  # notused
         executor=None,
+        callback=None,
         verbose=False,  # not used
         **kwargs,
     ):
@@ -241,6 +643,10 @@ class Host(object):
             username: the usernames for the hosts
             key: the key for logging in
             processors: the number of parallel checks
+            executor: "asyncio" runs the commands from an event loop, see
+                Host.run
+            callback: a function called with the result of each host as
+                soon as it is done, see Host.run
 
         Returns:
             list of dicts representing the ping result
@@ -250,8 +656,11 @@ class Host(object):
 
         key = path_expand(key)
 
+        pool = SSHPool.default()
+
         ssh_command = [
             "ssh",
+            *pool.options(key=key),
             "-o",
             "StrictHostKeyChecking=no",
             "-o",
@@ -263,14 +672,23 @@ class Host(object):
             "{host}",
             f"{command}",
         ]
+        live = kwargs.get("live")
         result = Host.run(
             hosts=hosts,
             command=ssh_command,
             execute=command,
+            processors=processors,
             shell=False,
             executor=executor,
+            callback=callback if live else Host._used(pool, key, callback),
             **kwargs,
         )
+        if live:
+            # callback can not be combined with live, so the masters are
+            # recorded once all commands are done
+            used = Host._used(pool, key)
+            for entry in result:
+                used(entry)
 
         return result
 
@@ -285,6 +703,8 @@ class Host(object):
         processors=3,
         dryrun=False,
         verbose=False,
+        executor=None,
+        callback=None,
     ):
         """
         Args:
@@ -293,6 +713,10 @@ class Host(object):
             username: the usernames for the hosts
             key: the key for logging in
             processors: the number of parallel checks
+            executor: "asyncio" runs the commands from an event loop, see
+                Host.run
+            callback: a function called with the result of each host as
+                soon as it is done, see Host.run
 
         Returns:
             list of dicts representing the ping result
@@ -302,8 +726,11 @@ class Host(object):
 
         key = path_expand(key)
 
+        pool = SSHPool.default()
+
         command = [
             "scp",
+            *pool.options(key=key),
             "-o",
             "StrictHostKeyChecking=no",
             "-o",
@@ -320,14 +747,24 @@ class Host(object):
             hosts=hosts,
             command=command,
             execute=execute,
+            processors=processors,
             destination=destination,
             shell=False,
+            executor=executor,
+            callback=Host._used(pool, key, callback),
         )
 
         return result
 
     @staticmethod
-    def check(hosts=None, username=None, key="~/.ssh/id_rsa", processors=3):
+    def check(
+        hosts=None,
+        username=None,
+        key="~/.ssh/id_rsa",
+        processors=3,
+        executor=None,
+        callback=None,
+    ):
         #
         # BUG: this code has a bug and does not deal with different
         #  usernames on the host to be checked.
@@ -338,6 +775,10 @@ class Host(object):
             username: the usernames for the hosts
             key: the key for logging in
             processors: the number of parallel checks
+            executor: "asyncio" runs the commands from an event loop, see
+                Host.run
+            callback: a function called with the result of each host as
+                soon as it is done, see Host.run
 
         Returns:
             list of dicts representing the ping result
@@ -350,6 +791,8 @@ class Host(object):
             username=username,
             key=key,
             processors=processors,
+            executor=executor,
+            callback=callback,
         )
 
         return result
@@ -405,13 +848,15 @@ class Host(object):
         return data
 
     @staticmethod
-    def ping(hosts=None, count=1, processors=3):
+    def ping(hosts=None, count=1, processors=3, callback=None):
         """ping a list of given ip addresses
 
         Args:
             hosts: a list of ip addresses
             count: number of pings to run per ip
             processors: number of processors to Pool
+            callback: a function called with the result of each ip as
+                soon as its ping is done
 
         Returns:
             list of dicts representing the ping result
@@ -424,7 +869,15 @@ class Host(object):
         args = [{"ip": ip, "count": count} for ip in hosts]
 
         with Pool(processors) as p:
-            res = p.map(Host._ping, args)
+            if callback is None:
+                res = p.map(Host._ping, args)
+            else:
+                res = [None] * len(args)
+                for index, data in p.imap_unordered(
+                    functools.partial(Host._run_indexed, Host._ping), enumerate(args)
+                ):
+                    callback(data)
+                    res[index] = data
             p.close()
             p.join()
 
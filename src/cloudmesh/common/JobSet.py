@@ -1,13 +1,18 @@
 import os
 import platform
+import shlex
 import subprocess
+import time
 from collections import OrderedDict
 from multiprocessing import Pool
 from pprint import pprint
 
+from cloudmesh.common.SharedTimerTable import SharedTimerTable
+from cloudmesh.common.StopWatch import StopWatch
 from cloudmesh.common.Tabulate import Printer
 from cloudmesh.common.dotdict import dotdict
 from cloudmesh.common.parameter import Parameter
+from cloudmesh.common.ssh.ssh_pool import SSHPool
 from cloudmesh.common.util import path_expand
 from cloudmesh.common.util import readfile
 
@@ -60,17 +65,37 @@ class JobSet:
         t.run(parallel=3)
         t.Print()
 
+    StopWatch timers recorded by an executor in a worker process are sent
+    back with the result and merged into the StopWatch of the process
+    calling run, with the host:pid of the worker as source.
+
+    With run(live=True) the state of each job and of the timers of its
+    executor is written into a SharedTimerTable with one row per job. The
+    table is available as self.table while the jobs run. If live is a
+    function, it is called with the entries of the table every interval
+    seconds and once more when all jobs are done:
+
+        def progress(entries):
+            running = [e["timer"] for e in entries if e["running"]]
+            print(len(running), "running:", running)
+
+        t.run(parallel=8, live=progress)
+
     """
 
     def __init__(self, name, executor=None):
         self.name = name
         self.job = OrderedDict({})
         self.executor = executor or JobSet.execute
+        self.pid = os.getpid()
+        self.table = None
 
     def reset(self, name, executor=None):
         self.name = name
         self.job = OrderedDict({})
         self.executor = executor or JobSet.execute
+        self.pid = os.getpid()
+        self.table = None
 
     @staticmethod
     def ssh(spec):
@@ -97,8 +122,13 @@ class JobSet:
         if "key" not in spec:
             spec.key = path_expand("~/.ssh/id_rsa.pub")
 
+        pool = SSHPool.default()
+        options = " ".join(
+            shlex.quote(option)
+            for option in pool.options(key=spec.key)
+        )
         ssh = (
-            f"ssh"
+            f"ssh {options}"
             f" -o StrictHostKeyChecking=no"
             f" -o UserKnownHostsFile=/dev/null"
             f" -i {spec.key} {spec.host}"
@@ -181,15 +211,59 @@ class JobSet:
         self.job[name]["executor"] = spec.get("executor") or executor or self.executor
 
     def _run(self, spec):
+        worker = os.getpid() != self.pid
+        if worker:
+            # the timers inherited from the parent are not sent back
+            StopWatch.clear()
         result = dict(spec)
         result["status"] = "running"
         executor = spec["executor"]
         res = executor(spec)
         result.update(res)
         result["status"] = "done"
+        if worker:
+            result["stopwatch"] = StopWatch.snapshot(clear=True)
         return result
 
-    def run(self, parallel=3):
+    def _run_live(self, args):
+        """runs a job while writing its state and the timers of its
+        executor into a row of the shared timer table
+
+        Args:
+            args (tuple): the spec of the job, the file of the table and
+                the index of the row
+
+        Returns:
+            dict: the result of the job
+        """
+        spec, filename, index = args
+        table = SharedTimerTable.attach(filename)
+        row = table.row(index)
+        name = f"job {spec['name']}"
+        started = time.time()
+        start = time.perf_counter_ns()
+        row.write(name, True, 0, started, 0, 0)
+        StopWatch.shared = row
+        try:
+            return self._run(spec)
+        finally:
+            StopWatch.shared = None
+            elapsed = time.perf_counter_ns() - start
+            row.write(name, False, 1, started, elapsed, elapsed)
+            table.close()
+
+    def run(self, parallel=3, live=None, interval=1.0):
+        """runs the jobs
+
+        Args:
+            parallel (int): the number of jobs run at the same time
+            live (bool or function): if set the jobs write their state
+                into self.table, a function is called with its entries
+            interval (float): the seconds between the calls of live
+
+        Returns:
+            list: the results of the jobs
+        """
         if len(self.job) == 0:
             res = None
         elif len(self.job) == 1:
@@ -197,21 +271,65 @@ class JobSet:
             job = self.job[id]
             res = self._run(job)
             self.job[id].update(res)
+            JobSet._used(res)
         else:
             joblist = [self.job[x] for x in self.job]
             # VERBOSE(joblist)
             with Pool(parallel) as p:
-                res = p.map(self._run, joblist)
+                if live:
+                    self.table = SharedTimerTable(len(joblist))
+                    try:
+                        result = p.map_async(
+                            self._run_live,
+                            [
+                                (job, self.table.filename, index)
+                                for index, job in enumerate(joblist)
+                            ],
+                        )
+                        while not result.ready():
+                            if callable(live):
+                                live(self.table.read())
+                            result.wait(interval)
+                        if callable(live):
+                            live(self.table.read())
+                        res = result.get()
+                    finally:
+                        self.table.close()
+                        self.table = None
+                else:
+                    res = p.map(self._run, joblist)
                 p.close()
                 p.join()
 
             for entry in res:
+                snapshot = entry.pop("stopwatch", None)
+                if snapshot is not None:
+                    StopWatch.merge_snapshot(snapshot)
                 name = entry["name"]
                 for a in entry:
                     self.job[name].update(entry)
+                JobSet._used(entry)
 
         return res
 
+    @staticmethod
+    def _used(entry):
+        """records the master connection of a job run with JobSet.ssh in
+        the ssh pool of this process, as the job ran in a worker
+
+        Args:
+            entry (dict): the result of the job
+        """
+        if entry.get("executor") is JobSet.ssh and entry.get("host"):
+            key = path_expand(entry.get("key") or "~/.ssh/id_rsa.pub")
+            SSHPool.default().use(entry["host"], key=key)
+
+    def __getstate__(self):
+        # the workers attach to the table by its file name
+        state = dict(self.__dict__)
+        state["table"] = None
+        return state
+
     def __len__(self):
         return len(self.job)
 
@@ -0,0 +1,257 @@
+"""A table of timers in shared memory for watching worker processes.
+
+The table is a file mapped into memory with mmap, so every process that
+opens the file sees the same memory. It has a fixed number of rows with
+a fixed number of timer slots each. A row is written by a single worker,
+e.g. the worker running the i-th job of a JobSet, while the parent reads
+all rows at any time without sending messages to the workers. Each slot
+is protected by a sequence counter, so a reader never returns a slot
+that is half written.
+
+Example:
+
+    table = SharedTimerTable(rows=len(jobs))
+
+    # in the worker running job i
+    row = SharedTimerTable.attach(table.filename).row(i)
+    StopWatch.shared = row
+    StopWatch.start("download")
+    ...
+
+    # in the parent
+    for entry in table.read():
+        print(entry["row"], entry["timer"], entry["running"], entry["elapsed"])
+
+    table.close()
+
+JobSet.run and Host.run create the table and the rows when called with
+live=True or with a function that receives the entries periodically.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+
+class SharedTimerRow(object):
+    """The slots of one row of a SharedTimerTable written by one worker."""
+
+    def __init__(self, table, index):
+        """creates the row
+
+        Args:
+            table (SharedTimerTable): the table
+            index (int): the index of the row
+        """
+        self.table = table
+        self.index = index
+        self.columns = {}
+        self.lock = threading.Lock()
+
+    def write(self, name, running, count, started, elapsed_ns, sum_ns):
+        """writes the state of a timer into its slot. Timers that do not
+        fit into the row anymore are ignored.
+
+        Args:
+            name (str): the name of the timer
+            running (bool): True if the timer is running
+            count (int): the number of completed intervals
+            started (float): the wall clock time of the last start
+            elapsed_ns (int): the time of the last completed interval
+            sum_ns (int): the sum of the completed intervals
+        """
+        table = self.table
+        with self.lock:
+            column = self.columns.get(name)
+            if column is None:
+                if len(self.columns) >= table.columns:
+                    return
+                column = self.columns[name] = len(self.columns)
+            offset = table._offset(self.index, column)
+            data = table.map
+            sequence = struct.unpack_from("<Q", data, offset)[0] + 1
+            if sequence & 1 == 0:
+                sequence += 1
+            struct.pack_into("<Q", data, offset, sequence)
+            table.slot.pack_into(
+                data,
+                offset,
+                sequence,
+                os.getpid(),
+                count,
+                started or 0.0,
+                elapsed_ns or 0,
+                sum_ns,
+                2 if running else 1,
+                name.encode("utf-8")[: table.name_size],
+            )
+            struct.pack_into("<Q", data, offset, sequence + 1)
+
+    def update(self, timer, running):
+        """writes the state of a StopWatch timer
+
+        Args:
+            timer (Timer): the timer record
+            running (bool): True if the timer was started
+        """
+        from cloudmesh.common.StopWatch import StopWatch
+
+        self.write(
+            StopWatch.label_name(timer.name),
+            running,
+            timer.stats.count,
+            timer.started,
+            timer.elapsed_ns,
+            timer.sum_ns,
+        )
+
+
+class SharedTimerTable(object):
+    """A fixed size table of timer slots in a memory mapped file."""
+
+    magic = b"CMTIMER1"
+    header = struct.Struct("<8sII")
+    # sequence, pid, count, started, elapsed_ns, sum_ns, state, name
+    slot = struct.Struct("<QqQdqqB63s")
+    name_size = 63
+
+    def __init__(self, rows, columns=8, filename=None):
+        """creates the table in a new file
+
+        Args:
+            rows (int): the number of rows, e.g. one per job
+            columns (int): the number of timers per row
+            filename (str): the file, by default a temporary file in
+                /dev/shm if it exists
+        """
+        if filename is None:
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+            descriptor, filename = tempfile.mkstemp(
+                prefix="cloudmesh-timers-", dir=directory
+            )
+            os.close(descriptor)
+        self.filename = filename
+        self.rows = rows
+        self.columns = columns
+        self.owner = True
+        size = self.header.size + rows * columns * self.slot.size
+        with open(filename, "wb") as f:
+            f.write(self.header.pack(self.magic, rows, columns))
+            f.truncate(size)
+        self._open()
+
+    def _open(self):
+        self.file = open(self.filename, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    @staticmethod
+    def attach(filename):
+        """opens a table created by another process
+
+        Args:
+            filename (str): the file of the table
+
+        Returns:
+            SharedTimerTable: the table
+        """
+        table = SharedTimerTable.__new__(SharedTimerTable)
+        table.filename = filename
+        table.owner = False
+        table._open()
+        magic, table.rows, table.columns = table.header.unpack_from(table.map, 0)
+        if magic != SharedTimerTable.magic:
+            table.close()
+            raise ValueError(f"SharedTimerTable: {filename} is not a timer table")
+        return table
+
+    def _offset(self, row, column):
+        if not 0 <= row < self.rows:
+            raise IndexError(f"SharedTimerTable: row {row} out of range")
+        return self.header.size + (row * self.columns + column) * self.slot.size
+
+    def row(self, index):
+        """returns a row to write to
+
+        Args:
+            index (int): the index of the row
+
+        Returns:
+            SharedTimerRow: the row
+        """
+        self._offset(index, 0)
+        return SharedTimerRow(self, index)
+
+    def _read_slot(self, offset, retries=100):
+        """reads a slot, retrying while it is written
+
+        Returns:
+            tuple: the values of the slot or None
+        """
+        data = self.map
+        for i in range(retries):
+            before = struct.unpack_from("<Q", data, offset)[0]
+            if before & 1:
+                time.sleep(0)
+                continue
+            values = self.slot.unpack_from(data, offset)
+            after = struct.unpack_from("<Q", data, offset)[0]
+            if before == after == values[0]:
+                return values
+        return None
+
+    def read(self):
+        """returns the timers written to the table
+
+        Returns:
+            list: a dict per timer with row, pid, timer, running, count,
+            started, elapsed and sum in seconds. The elapsed time of a
+            running timer is the time since its start
+        """
+        now = time.time()
+        entries = []
+        for row in range(self.rows):
+            for column in range(self.columns):
+                values = self._read_slot(self._offset(row, column))
+                if values is None or values[6] == 0:
+                    continue
+                sequence, pid, count, started, elapsed_ns, sum_ns, state, name = values
+                running = state == 2
+                entries.append(
+                    {
+                        "row": row,
+                        "pid": pid,
+                        "timer": name.rstrip(b"\0").decode("utf-8", "ignore"),
+                        "running": running,
+                        "count": count,
+                        "started": started,
+                        "elapsed": now - started if running else elapsed_ns / 1e9,
+                        "sum": sum_ns / 1e9,
+                    }
+                )
+        return entries
+
+    def close(self, remove=None):
+        """closes the table
+
+        Args:
+            remove (bool): if True the file is removed, by default it is
+                removed by the process that created the table
+        """
+        if self.map is not None:
+            self.map.close()
+            self.file.close()
+            self.map = None
+        if remove or (remove is None and self.owner):
+            try:
+                os.remove(self.filename)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -1875,11 +1875,7 @@ class Shell(object):
             _lines = lines.splitlines()
         else:
             _lines = lines
-        result = []
-        for line in _lines:
-            if what in line:
-                result = result + [line]
-        return result
+        return [line for line in _lines if what in line]
 
     @classmethod
     def find_lines_from(cls, lines, what):
@@ -84,23 +84,225 @@ unique name.
     # We also showcase how to add a message to timers
     )
 
+## Clock
+
+The elapsed times are measured with a monotonic clock that returns
+integer nanoseconds. By default this is time.perf_counter_ns, so the
+timers are not affected by NTP adjustments of the wall clock. The wall
+clock is only used for the human readable start and end columns. The
+clock can be replaced with any of the names in StopWatch.clocks or a
+function returning integer nanoseconds.
+
+    StopWatch.set_clock("monotonic")
+    StopWatch.set_clock(time.process_time_ns)
+
+## Threads and asyncio tasks
+
+By default all timers are kept in class level dicts without locking.
+To time the same named region from several threads or asyncio tasks,
+enable the concurrent mode. Each thread and task then records into its
+own context, which is merged into the global view when timers are
+read, e.g. by StopWatch.get, StopWatch.benchmark or StopWatch.merge.
+
+    StopWatch.set_concurrent(True)
+
+    def load(i):
+        StopWatch.start("load")
+        ...
+        StopWatch.stop("load")
+
+    with ThreadPoolExecutor(8) as pool:
+        pool.map(load, range(100))
+
+    print(StopWatch.sum("load"))
+
+## Statistics
+
+Each duration of a timer is added to a bounded memory histogram, so
+timers that are started and stopped many times also report count, min,
+max, mean, stddev and the p50, p95 and p99 percentiles. They are shown
+in the benchmark table and csv lines and can be obtained with
+
+    StopWatch.statistics("load")
+
+## Overhead
+
+Each timer is kept in a single Timer record in StopWatch.registry.
+StopWatch.start returns the record, which can be passed to
+StopWatch.stop to avoid the name lookup. In tight loops the record
+can be obtained once and started and stopped directly
+
+    t = StopWatch.timer("step")
+    for batch in batches:
+        t.start()
+        ...
+        t.stop()
+
+The budget for the overhead of a start/stop pair is 10 µs on the
+classmethod API and on the record, which is checked by
+tests/test_stopwatch.py. The timer_* dicts of earlier versions are
+still available as views on the records.
+
+## Loading benchmark logs
+
+The "# csv" lines written by benchmark can be read from large logs
+without loading the file into memory. read_csv yields a dict per timer,
+load_csv returns the selected columns as lists or a pandas DataFrame
+
+    for entry in StopWatch.read_csv("benchmark.log", columns=["timer", "time"]):
+        ...
+
+    data = StopWatch.load_csv("benchmark.log", columns=["timer", "time"])
+
+## Nested timers
+
+In nested mode StopWatch records which timers run within other timers
+of the same thread or task, e.g. from nested StopWatchBlocks or
+functions decorated with @benchmark. The call tree reports the count
+and the inclusive and exclusive time of each node as table, json or
+in the folded stack format used by flamegraph tools.
+
+    StopWatch.set_nested(True)
+    with StopWatchBlock("epoch"):
+        with StopWatchBlock("load"):
+            ...
+        with StopWatchBlock("forward"):
+            ...
+    StopWatch.tree_report(output="table")
+    StopWatch.tree_report(output="folded", filename="epoch.folded")
+
+## Event sink
+
+For long running jobs with many blocks and events the lines can be
+written in batches from a background thread with an EventSink, so the
+timed code does not wait for the I/O. See cloudmesh.common.EventSink.
+
+    StopWatch.sink = EventSink(filename="events.log")
+
+## Processes and nodes
+
+The timers of a process can be turned into a snapshot that is sent to
+another process and merged there. JobSet.run does this for the workers
+of its pool, so timers recorded by the executors appear in the
+benchmark of the parent with the host:pid of the worker as source.
+
+    snapshot = StopWatch.snapshot()        # in the worker
+    StopWatch.merge_snapshot(snapshot)     # in the parent
+
+To watch the workers while they run, StopWatch.shared can be set to a
+row of a SharedTimerTable. Every start and stop of a timer then writes
+its state into the row, which the parent reads from shared memory.
+JobSet.run(live=True) and Host.run(live=True) set this up per job.
+
+## Resource usage
+
+StopWatch can record the CPU time, the peak RSS and the bytes read and
+written by the process while a timer runs. The usage is summed over all
+intervals of a timer and shown as additional columns in the benchmark.
+As the counters belong to the process, timers running at the same time
+in other threads share them.
+
+    StopWatch.set_resources(True)          # for all timers
+    StopWatch.start("preprocess", resources=True)
+    with StopWatchBlock("load", resources=True):
+        ...
+
+## Memory
+
+With memory=True a timer records the memory allocated by python while
+it runs with tracemalloc, which is started when needed. The net
+allocated bytes, the peak above the memory at the start and optionally
+the top allocation sites are shown as additional benchmark columns.
+Tracing allocations slows down python considerably, so it is meant for
+finding memory regressions and not for timing.
+
+    StopWatch.set_memory(True, sites=3)    # for all timers
+    with StopWatchBlock("load", memory=True):
+        ...
+
+## Throughput
+
+Timers that move data can count the bytes with StopWatch.add_bytes.
+The benchmark then shows the bytes and the throughput in MB/s (10^6
+bytes per second) computed from the sum of the timer.
+
+    StopWatch.start("upload")
+    ...
+    StopWatch.stop("upload")
+    StopWatch.add_bytes("upload", len(data))
+
+## Timelines
+
+While tracing is enabled every interval of a timer, StopWatchBlock and
+event is recorded with host, pid and thread id. The records are shipped
+with the snapshots of JobSet and Host workers and can be written in the
+Chrome trace event format, which is loaded by chrome://tracing and
+https://ui.perfetto.dev to show the overlap of the timers of all
+processes and threads. Nested timers are shown within each other.
+
+    StopWatch.set_trace(True)
+    ...
+    StopWatch.write_trace("trace.json")
+
+## Retention
+
+Timers named per file or per batch make the number of records grow
+without bound. A retention policy limits the number of timers. When a
+new timer exceeds the limit, the least recently used timer that is not
+running is evicted. It is either discarded or rolled up into an
+aggregate timer whose sum, count and statistics include all evicted
+timers of the same name prefix
+
+    StopWatch.set_retention(10000, rollup=" ")   # "file 17" -> "file *"
+
+## Labels
+
+Instead of encoding dimensions into the timer name, a dict of labels
+can be passed to start, stop and event. The timer is stored under the
+key (name, labels) and shown as "name key=value ..." in the benchmark.
+StopWatch.group aggregates sums, counts and percentiles of the labelled
+timers over any subset of the labels
+
+    StopWatch.start("train", labels={"epoch": 3, "gpu": 1})
+    StopWatch.stop("train", labels={"epoch": 3, "gpu": 1})
+    StopWatch.group("train", by=["gpu"])
+    StopWatch.group_report("train", by=["gpu"])
+
 """
 
+import asyncio
+import collections
 import datetime
+import functools
+import inspect
+import itertools
+import json
+import math
 import os
+import platform
 import pprint
 import sys
+import threading
 import time
+import tracemalloc
+import weakref
+from collections.abc import MutableMapping
 from typing import Union
 
+import psutil
 from cloudmesh.common.DateTime import DateTime
 from cloudmesh.common.Tabulate import Printer
 from cloudmesh.common.systeminfo import systeminfo as cm_systeminfo
 from cloudmesh.common.util import appendfile
 from cloudmesh.common.util import banner
-from cloudmesh.common.util import readfile
+from cloudmesh.common.util import path_expand
 from cloudmesh.common.util import writefile
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 def progress(
     filename=None,  # +
@@ -117,167 +319,1980 @@ def progress(
 ):
     """Creates a printed line of the form
 
-        "# cloudmesh status=ready progress=0 pid=$$ time='2022-08-05 16:29:40.228901'"
+        "# cloudmesh status=ready progress=0 pid=$$ time='2022-08-05 16:29:40.228901'"
+
+    If the pid is omitted it will give the current process pid
+    If PID contains the string SLURM it will give the SLURM_TASK_ID
+    Otherwise it will take the value passed along in pid
+
+    Args:
+        status (str): String representation of the status
+        progress (int | str): Progress in value from 0 to 100
+        pid (int): Process ID. If not specified, it used the underlaying
+            PID from the OS, or the task id from SLURM or LSF if
+            submitted through a queueing system.
+        time (str): current time
+        stdout (bool): if TRue Prints the progress, if False does not
+            pring, defaut is print
+        filename (str): where to write the progress as a file
+        **kwargs (dict): additional arguments as key=value
+
+    Returns:
+        str: progress string
+    """
+    if type(progress) in ["int", "float"]:
+        progress = str(progress)
+    if pid is None:
+        if "SLURM_JOB_ID" in os.environ:
+            pid = os.environ["SLURM_JOB_ID"]
+        elif "LSB_JOBID" in os.environ:
+            pid = os.environ["LSB_JOBID"]
+        else:
+            pid = os.getpid()
+    variables = ""
+    msg = f"# cloudmesh status={status} progress={progress} pid={pid}\n"
+    if time:
+        t = str(DateTime.now())
+        msg = msg + f" time='{t}'"
+    if kwargs:
+        for name, value in kwargs.items():
+            variables = variables + f" {name}={value}"
+        msg = msg + variables
+    if append is not None:
+        msg = msg + " " + append
+    if stdout:
+        if with_banner:
+            banner(msg)
+        print(msg, file=sys.stdout)
+    if stderr:
+        print(msg, file=sys.stderr)
+    if filename is not None:
+        appendfile(filename, msg)
+    return msg
+
+
+def rename(newname):
+    """decorator to rename a function
+
+    Args:
+        newname (str): function name
+
+    Returns:
+        object: renamed function
+    """
+
+    def decorator(f):
+        f.__name__ = newname
+        return f
+
+    return decorator
+
+
+def benchmark(func=None, name=None, sample=1, labels=None):
+    """decorator to benchmark a function with a timer named after the
+    function. It can be used as @benchmark or with arguments as
+    @benchmark(name="step", sample=100).
+
+    Functions and coroutines are timed from the call until they return,
+    the return value is passed along. Generators and async generators
+    are timed from the request of the first item until they are
+    exhausted or closed, the time until the first item is recorded in
+    the timer "{name} first". If an exception is raised the status of
+    the timer is set to False and the exception is raised again.
+
+    Args:
+        func (object): function, coroutine or generator function
+        name (str): the name of the timer, by default the name of the
+            function
+        sample (int): only one in sample calls is timed, which reduces
+            the overhead on hot functions. The sum and the count of the
+            timer only include the timed calls
+        labels (dict): the labels of the timer
+
+    Returns:
+        object: function with benchmarks based on the name of the
+        function
+    """
+    if func is None:
+        return lambda f: benchmark(f, name=name, sample=sample, labels=labels)
+
+    name = name or func.__name__
+    first = f"{name} first"
+    calls = itertools.count()
+
+    def timed():
+        return sample <= 1 or next(calls) % sample == 0
+
+    if inspect.isasyncgenfunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            timer = first_timer = None
+            if timed():
+                timer = StopWatch.start(name, labels=labels)
+                first_timer = StopWatch.start(first, labels=labels)
+            state = False
+            try:
+                value = await generator.__anext__()
+                if first_timer is not None:
+                    StopWatch.stop(first_timer)
+                    first_timer = None
+                while True:
+                    try:
+                        sent = yield value
+                    except GeneratorExit:
+                        state = True
+                        await generator.aclose()
+                        raise
+                    except BaseException as e:
+                        value = await generator.athrow(e)
+                    else:
+                        value = await generator.asend(sent)
+            except StopAsyncIteration:
+                state = True
+            finally:
+                if first_timer is not None:
+                    StopWatch.stop(first_timer, state)
+                if timer is not None:
+                    StopWatch.stop(timer, state)
+
+    elif inspect.isgeneratorfunction(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            if not timed():
+                return (yield from generator)
+            timer = StopWatch.start(name, labels=labels)
+            first_timer = StopWatch.start(first, labels=labels)
+            state = False
+            try:
+                value = next(generator)
+                StopWatch.stop(first_timer)
+                first_timer = None
+                while True:
+                    try:
+                        sent = yield value
+                    except GeneratorExit:
+                        state = True
+                        generator.close()
+                        raise
+                    except BaseException as e:
+                        value = generator.throw(e)
+                    else:
+                        value = generator.send(sent)
+            except StopIteration as e:
+                state = True
+                return e.value
+            finally:
+                if first_timer is not None:
+                    StopWatch.stop(first_timer, state)
+                StopWatch.stop(timer, state)
+
+    elif inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not timed():
+                return await func(*args, **kwargs)
+            timer = StopWatch.start(name, labels=labels)
+            state = False
+            try:
+                result = await func(*args, **kwargs)
+                state = True
+                return result
+            finally:
+                StopWatch.stop(timer, state)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not timed():
+                return func(*args, **kwargs)
+            timer = StopWatch.start(name, labels=labels)
+            state = False
+            try:
+                result = func(*args, **kwargs)
+                state = True
+                return result
+            finally:
+                StopWatch.stop(timer, state)
+
+    return wrapper
+
+
+class TimerHistogram(object):
+    """A bounded memory histogram of durations in integer nanoseconds.
+
+    Values are counted in log-linear buckets similar to an HDR histogram.
+    Values below 2**precision are counted exactly, larger values keep the
+    leading precision bits, which bounds the relative error of a
+    percentile to 2**(1 - precision) while the number of buckets only
+    grows with the logarithm of the largest value. Count, min, max, mean
+    and the variance are exact as the sum and the sum of squares are kept
+    as integers. Histograms can be merged, so they can be combined across
+    threads and processes.
+
+    Example:
+        h = TimerHistogram()
+        for value in [100, 200, 300]:
+            h.add(value)
+        h.percentile(50)
+    """
+
+    __slots__ = ("precision", "buckets", "count", "total", "squares", "min", "max")
+
+    def __init__(self, precision=7):
+        """initializes an empty histogram
+
+        Args:
+            precision (int): the number of significant bits kept per value
+        """
+        self.precision = precision
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.min = None
+        self.max = None
+
+    def _value(self, key):
+        """returns the midpoint of the bucket with the given key"""
+        if key < (1 << self.precision):
+            return key
+        shift = key >> self.precision
+        mantissa = key & ((1 << self.precision) - 1)
+        return ((mantissa << shift) + ((mantissa + 1) << shift) - 1) / 2
+
+    def add(self, value):
+        """adds a value to the histogram
+
+        Args:
+            value (int): the duration in ns
+        """
+        if value < 0:
+            value = 0
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        shift = value.bit_length() - self.precision
+        key = value if shift <= 0 else (shift << self.precision) | (value >> shift)
+        buckets = self.buckets
+        buckets[key] = buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        """adds the values of another histogram to this histogram
+
+        Args:
+            other (TimerHistogram): the histogram to merge
+
+        Returns:
+            TimerHistogram: this histogram
+        """
+        if other.count == 0:
+            return self
+        if other.precision != self.precision:
+            raise ValueError("TimerHistogram: precision mismatch")
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        return self
+
+    def copy(self):
+        """returns a copy of the histogram. The buckets are copied in a
+        single step, so a histogram can be copied while another thread
+        adds values to it.
+
+        Returns:
+            TimerHistogram: the copy
+        """
+        histogram = TimerHistogram(precision=self.precision)
+        histogram.buckets = self.buckets.copy()
+        histogram.count = sum(histogram.buckets.values())
+        histogram.total = self.total
+        histogram.squares = self.squares
+        histogram.min = self.min
+        histogram.max = self.max
+        return histogram
+
+    def to_dict(self):
+        """returns the histogram as a dict that can be serialized as json
+
+        Returns:
+            dict: the histogram
+        """
+        return {
+            "precision": self.precision,
+            "count": self.count,
+            "total": self.total,
+            "squares": self.squares,
+            "min": self.min,
+            "max": self.max,
+            "buckets": sorted(self.buckets.items()),
+        }
+
+    @staticmethod
+    def from_dict(data):
+        """creates a histogram from a dict created with to_dict
+
+        Args:
+            data (dict): the histogram as dict
+
+        Returns:
+            TimerHistogram: the histogram
+        """
+        histogram = TimerHistogram(precision=data["precision"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.squares = data["squares"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.buckets = {int(key): n for key, n in data["buckets"]}
+        return histogram
+
+    @property
+    def mean(self):
+        """the mean in ns"""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def stddev(self):
+        """returns the sample standard deviation in ns"""
+        if self.count < 2:
+            return 0.0
+        variance = (self.count * self.squares - self.total * self.total) / (
+            self.count * (self.count - 1)
+        )
+        return math.sqrt(max(variance, 0))
+
+    def percentile(self, q):
+        """returns an estimate of the q-th percentile in ns
+
+        Args:
+            q (float): the percentile between 0 and 100
+
+        Returns:
+            float: the estimated value or None if the histogram is empty
+        """
+        if self.count == 0:
+            return None
+        rank = q / 100.0 * self.count
+        cumulative = 0
+        for key in sorted(self.buckets):
+            cumulative += self.buckets[key]
+            if cumulative >= rank:
+                break
+        return min(max(self._value(key), self.min), self.max)
+
+    def statistics(self, scale=1e-9, digits=None):
+        """returns count, min, max, mean, stddev, p50, p95 and p99
+
+        Args:
+            scale (float): factor applied to the values, by default the
+                values are converted from ns to seconds
+            digits (int): the number of digits to round to
+
+        Returns:
+            dict: the statistics
+        """
+
+        def value(v):
+            if v is None:
+                return None
+            v = v * scale
+            return v if digits is None else round(v, digits)
+
+        return {
+            "count": self.count,
+            "min": value(self.min),
+            "max": value(self.max),
+            "mean": value(self.mean),
+            "stddev": value(self.stddev()),
+            "p50": value(self.percentile(50)),
+            "p95": value(self.percentile(95)),
+            "p99": value(self.percentile(99)),
+        }
+
+
+class TimerUsage(object):
+    """The resource usage of the process summed over the intervals of a
+    timer: CPU user and system time in seconds, the peak and the growth of
+    the RSS and the bytes read and written. The I/O counters are None on
+    platforms that do not provide them.
+    """
+
+    __slots__ = (
+        "cpu_user",
+        "cpu_system",
+        "rss_peak",
+        "rss_delta",
+        "read_bytes",
+        "write_bytes",
+    )
+
+    _process = None
+
+    def __init__(self):
+        self.cpu_user = 0.0
+        self.cpu_system = 0.0
+        self.rss_peak = 0
+        self.rss_delta = 0
+        self.read_bytes = None
+        self.write_bytes = None
+
+    @staticmethod
+    def snapshot():
+        """returns the current usage counters of the process
+
+        Returns:
+            tuple: user time, system time, peak rss, read bytes and
+            written bytes
+        """
+        process = TimerUsage._process
+        if process is None or process.pid != os.getpid():
+            process = TimerUsage._process = psutil.Process()
+        if resource is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            user, system = usage.ru_utime, usage.ru_stime
+            # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+            rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            times = process.cpu_times()
+            user, system = times.user, times.system
+            memory = process.memory_info()
+            rss = getattr(memory, "peak_wset", memory.rss)
+        try:
+            io = process.io_counters()
+            read, write = io.read_bytes, io.write_bytes
+        except (AttributeError, psutil.Error):
+            read = write = None
+        return user, system, rss, read, write
+
+    def add(self, start, end):
+        """adds the usage between two snapshots
+
+        Args:
+            start (tuple): the snapshot taken when the timer started
+            end (tuple): the snapshot taken when the timer stopped
+        """
+        self.cpu_user += end[0] - start[0]
+        self.cpu_system += end[1] - start[1]
+        self.rss_peak = max(self.rss_peak, end[2])
+        self.rss_delta += end[2] - start[2]
+        if start[3] is not None and end[3] is not None:
+            self.read_bytes = (self.read_bytes or 0) + end[3] - start[3]
+            self.write_bytes = (self.write_bytes or 0) + end[4] - start[4]
+
+    def merge(self, other):
+        """adds the usage recorded by another timer
+
+        Args:
+            other (TimerUsage): the usage to add
+        """
+        self.cpu_user += other.cpu_user
+        self.cpu_system += other.cpu_system
+        self.rss_peak = max(self.rss_peak, other.rss_peak)
+        self.rss_delta += other.rss_delta
+        if other.read_bytes is not None:
+            self.read_bytes = (self.read_bytes or 0) + other.read_bytes
+            self.write_bytes = (self.write_bytes or 0) + other.write_bytes
+
+    def to_dict(self, digits=None):
+        """returns the usage as dict
+
+        Args:
+            digits (int): the number of digits the CPU times are rounded
+                to, by default they are not rounded
+
+        Returns:
+            dict: the usage
+        """
+        data = {attribute: getattr(self, attribute) for attribute in self.__slots__}
+        if digits is not None:
+            data["cpu_user"] = round(self.cpu_user, digits)
+            data["cpu_system"] = round(self.cpu_system, digits)
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """creates the usage from a dict returned by to_dict
+
+        Args:
+            data (dict): the usage
+
+        Returns:
+            TimerUsage: the usage
+        """
+        usage = TimerUsage()
+        for attribute in TimerUsage.__slots__:
+            setattr(usage, attribute, data[attribute])
+        return usage
+
+
+class TimerMemory(object):
+    """The memory allocated by python while a timer runs as traced by
+    tracemalloc: the net allocated bytes summed over the intervals, the
+    largest peak above the traced memory at the start of an interval and
+    the bytes allocated per source line if the allocation sites are
+    recorded.
+    """
+
+    __slots__ = ("allocated", "peak", "sites")
+
+    def __init__(self):
+        self.allocated = 0
+        self.peak = 0
+        self.sites = {}
+
+    def add(self, start, end):
+        """adds an interval
+
+        Args:
+            start (list): the traced memory, the peak and the snapshot at
+                the start of the interval
+            end (tuple): the traced memory, the peak and the allocation
+                sites at the end of the interval
+        """
+        self.allocated += end[0] - start[0]
+        self.peak = max(self.peak, end[1] - start[0])
+        for site, size in end[2]:
+            self.sites[site] = self.sites.get(site, 0) + size
+
+    def merge(self, other):
+        """adds the memory recorded by another timer
+
+        Args:
+            other (TimerMemory): the memory to add
+        """
+        self.allocated += other.allocated
+        self.peak = max(self.peak, other.peak)
+        for site, size in other.sites.items():
+            self.sites[site] = self.sites.get(site, 0) + size
+
+    def top(self, n=3):
+        """returns the sites that allocated the most memory
+
+        Args:
+            n (int): the number of sites
+
+        Returns:
+            str: the sites as file:line=bytes separated by ;
+        """
+        sites = sorted(self.sites.items(), key=lambda item: -abs(item[1]))[:n]
+        return "; ".join(f"{site}={size}" for site, size in sites)
+
+    def to_dict(self):
+        """returns the memory as dict
+
+        Returns:
+            dict: the memory
+        """
+        return {"allocated": self.allocated, "peak": self.peak, "sites": self.sites}
+
+    @staticmethod
+    def from_dict(data):
+        """creates the memory from a dict returned by to_dict
+
+        Args:
+            data (dict): the memory
+
+        Returns:
+            TimerMemory: the memory
+        """
+        memory = TimerMemory()
+        memory.allocated = data["allocated"]
+        memory.peak = data["peak"]
+        memory.sites = dict(data["sites"])
+        return memory
+
+
+class Timer(object):
+    """The record of a single named timer.
+
+    StopWatch keeps one record per timer name in StopWatch.registry.
+    StopWatch.start returns the record, which can be used as a handle to
+    stop the timer without looking up its name again. In tight loops the
+    record can be obtained once with StopWatch.timer and started and
+    stopped directly.
+
+    Example:
+        t = StopWatch.timer("step")
+        for i in range(1000):
+            t.start()
+            ...
+            t.stop()
+    """
+
+    __slots__ = (
+        "name",
+        "started",
+        "start_ns",
+        "end_ns",
+        "sum_ns",
+        "status",
+        "msg",
+        "values",
+        "stats",
+        "lock",
+        "sources",
+        "usage",
+        "usage_start",
+        "memory",
+        "memory_start",
+        "bytes",
+    )
+
+    def __init__(self, name, lock=None):
+        """initializes an empty timer
+
+        Args:
+            name (str): the name of the timer
+            lock (threading.Lock): the lock of the context owning the
+                timer in concurrent mode
+        """
+        self.name = name
+        self.started = None
+        self.start_ns = None
+        self.end_ns = None
+        self.sum_ns = 0
+        self.status = None
+        self.msg = None
+        self.values = None
+        self.stats = TimerHistogram()
+        self.lock = lock
+        self.sources = None
+        self.usage = None
+        self.usage_start = None
+        self.memory = None
+        self.memory_start = None
+        self.bytes = None
+
+    def start(self, values=None, resources=None, memory=None):
+        """starts the timer
+
+        Args:
+            values (object): any python object with a __str__ method to
+                record with the timer
+            resources (bool): if True the resource usage is recorded, by
+                default StopWatch.resources
+            memory (bool): if True the allocated memory is recorded, by
+                default StopWatch.trace_memory
+
+        Returns:
+            Timer: the timer
+        """
+        if self.lock is not None:
+            with self.lock:
+                return self._start(values, resources, memory)
+        return self._start(values, resources, memory)
+
+    def _start(self, values, resources=None, memory=None):
+        self.started = time.time()
+        self.end_ns = None
+        self.status = None
+        self.msg = None
+        if values:
+            self.values = values
+        if resources or (resources is None and StopWatch.resources):
+            self.usage_start = TimerUsage.snapshot()
+        else:
+            self.usage_start = None
+        if memory or (memory is None and StopWatch.trace_memory):
+            self.memory_start = StopWatch._memory_start()
+        else:
+            self.memory_start = None
+        if StopWatch.nested:
+            StopWatch._push(self.name)
+        if StopWatch.shared is not None:
+            StopWatch.shared.update(self, True)
+        self.start_ns = StopWatch.clock()
+        return self
+
+    def stop(self, state=True, values=None):
+        """stops the timer
+
+        Args:
+            state (bool): the status of the timer
+            values (object): any python object with a __str__ method to
+                record with the timer
+
+        Returns:
+            Timer: the timer
+        """
+        end = StopWatch.clock()
+        if self.lock is not None:
+            with self.lock:
+                return self._stop(end, state, values)
+        return self._stop(end, state, values)
+
+    def _stop(self, end, state, values, phase="X"):
+        if self.start_ns is None:
+            raise KeyError(f"StopWatch: the timer {self.name!r} was not started")
+        elapsed = end - self.start_ns
+        self.end_ns = end
+        self.sum_ns += elapsed
+        self.status = state
+        if values:
+            self.values = values
+        self.stats.add(elapsed)
+        if self.usage_start is not None:
+            if self.usage is None:
+                self.usage = TimerUsage()
+            self.usage.add(self.usage_start, TimerUsage.snapshot())
+            self.usage_start = None
+        if self.memory_start is not None:
+            if self.memory is None:
+                self.memory = TimerMemory()
+            end = StopWatch._memory_stop(self.memory_start)
+            self.memory.add(self.memory_start, end)
+            self.memory_start = None
+        if StopWatch.tracing:
+            StopWatch.trace.append(
+                (
+                    self.name,
+                    phase,
+                    self.started,
+                    elapsed,
+                    StopWatch._host,
+                    os.getpid(),
+                    threading.get_native_id(),
+                    self.values,
+                )
+            )
+        if StopWatch.nested:
+            StopWatch._pop(self.name, elapsed)
+        if StopWatch.shared is not None:
+            StopWatch.shared.update(self, False)
+        return self
+
+    def add(self, elapsed_ns, state=True):
+        """records an interval that was measured elsewhere as if the timer
+        ran for it and stopped now, e.g. the time per call of a loop
+
+        Args:
+            elapsed_ns (int): the duration of the interval in ns
+            state (bool): the status of the timer
+
+        Returns:
+            Timer: the timer
+        """
+        if self.lock is not None:
+            with self.lock:
+                return self._add(elapsed_ns, state)
+        return self._add(elapsed_ns, state)
+
+    def _add(self, elapsed_ns, state):
+        end = StopWatch.clock()
+        self.started = time.time() - elapsed_ns / 1e9
+        self.start_ns = end - elapsed_ns
+        self.end_ns = end
+        self.sum_ns += elapsed_ns
+        self.status = state
+        self.stats.add(elapsed_ns)
+        return self
+
+    @property
+    def stopped(self):
+        """the wall clock time at which the timer stopped. It is derived
+        from the start time and the elapsed time, so stop does not need to
+        read the wall clock.
+        """
+        if self.end_ns is None or self.started is None:
+            return None
+        return self.started + (self.end_ns - self.start_ns) / 1e9
+
+    @stopped.setter
+    def stopped(self, value):
+        if value is None:
+            self.end_ns = None
+        else:
+            self.end_ns = self.start_ns + int((value - self.started) * 1e9)
+
+    @property
+    def elapsed_ns(self):
+        """the time of the last interval in ns or None if it is running"""
+        if self.end_ns is None or self.start_ns is None:
+            return None
+        return self.end_ns - self.start_ns
+
+    def __repr__(self):
+        return f"Timer({self.name!r}, elapsed_ns={self.elapsed_ns}, sum_ns={self.sum_ns})"
+
+
+class TimerNode(object):
+    """A node of the call tree recorded by StopWatch in nested mode. The
+    node is identified by the path of timer names from the root.
+    """
+
+    __slots__ = ("path", "count", "inclusive_ns", "children_ns")
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.inclusive_ns = 0
+        self.children_ns = 0
+
+    @property
+    def exclusive_ns(self):
+        """the time spent in the timer but not in its child timers"""
+        return self.inclusive_ns - self.children_ns
+
+
+class _TimerView(MutableMapping):
+    """A dict like view on one attribute of the timer records. It keeps
+    the timer_* dicts of earlier versions of StopWatch working.
+    """
+
+    def __init__(self, registry, attribute, seconds=False):
+        self.registry = registry
+        self.attribute = attribute
+        self.seconds = seconds
+
+    def __getitem__(self, name):
+        value = getattr(self.registry[name], self.attribute)
+        if self.seconds:
+            return value / 1e9
+        return value
+
+    def __setitem__(self, name, value):
+        timer = self.registry.get(name)
+        if timer is None:
+            timer = self.registry[name] = Timer(name)
+        if self.seconds:
+            value = int(value * 1e9)
+        setattr(timer, self.attribute, value)
+
+    def __delitem__(self, name):
+        del self.registry[name]
+
+    def __iter__(self):
+        return iter(self.registry)
+
+    def __len__(self):
+        return len(self.registry)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class _StackMarker(object):
+    """A marker kept per thread while the thread has a stack of nested
+    timers."""
+
+
+class _TimerContext(object):
+    """The timers of a single thread or asyncio task in concurrent mode."""
+
+    def __init__(self, thread=None):
+        self.lock = threading.Lock()
+        self.registry = {}
+        # the thread of the context, None for the context of a task
+        self.thread = thread
+
+    def finished(self):
+        """returns True if the thread of the context has ended and none of
+        its timers is running"""
+        if self.thread is None or self.thread.is_alive():
+            return False
+        return all(timer.end_ns is not None for timer in self.registry.values())
+
+    def timer(self, name):
+        """returns the timer record with the given name
+
+        Args:
+            name (str): the name of the timer
+        """
+        timer = self.registry.get(name)
+        if StopWatch.retention is None:
+            if timer is None:
+                timer = self.registry[name] = Timer(name, lock=self.lock)
+            return timer
+        if timer is None:
+            if len(self.registry) >= StopWatch.retention:
+                StopWatch._evict_context(self)
+            timer = Timer(name, lock=self.lock)
+        with self.lock:
+            # reinserting the record keeps the registry in LRU order
+            self.registry.pop(name, None)
+            self.registry[name] = timer
+        return timer
+
+
+class StopWatch(object):
+    """A class to measure times between events."""
+
+    debug = False
+    verbose = True
+    # the timer records by name
+    registry = {}
+    # Timer start dict
+    timer_start = _TimerView(registry, "started")
+    # Timer end dict
+    timer_end = _TimerView(registry, "stopped")
+    # Timer diff
+    timer_elapsed = {}
+    # records a status
+    timer_status = _TimerView(registry, "status")
+    # records a dt
+    timer_sum = _TimerView(registry, "sum_ns", seconds=True)
+    # msg
+    timer_msg = _TimerView(registry, "msg")
+    # mllogger
+    timer_values = _TimerView(registry, "values")
+    # monotonic start in ns
+    timer_start_ns = _TimerView(registry, "start_ns")
+    # monotonic end in ns
+    timer_end_ns = _TimerView(registry, "end_ns")
+    # sum in ns
+    timer_sum_ns = _TimerView(registry, "sum_ns")
+    # histogram of the durations
+    timer_stats = _TimerView(registry, "stats")
+
+    # clock returning integer nanoseconds used to measure elapsed times
+    clock = staticmethod(time.perf_counter_ns)
+    clocks = {
+        "perf_counter": time.perf_counter_ns,
+        "monotonic": time.monotonic_ns,
+        "process_time": time.process_time_ns,
+        "thread_time": time.thread_time_ns,
+        "time": time.time_ns,
+    }
+    # digits used for the times in the benchmark tables and csv output
+    digits = 6
+
+    # if True each thread and asyncio task records into its own context
+    concurrent = False
+    # contexts of the threads and tasks in concurrent mode
+    _contexts = {}
+    _lock = threading.RLock()
+
+    # EventSink receiving the lines of events and StopWatchBlocks
+    sink = None
+
+    # SharedTimerRow receiving the state of the timers when they start
+    # and stop, see cloudmesh.common.SharedTimerTable
+    shared = None
+
+    # if True the resource usage of the process is recorded for all timers
+    resources = False
+    # the usage columns of timers without recorded usage
+    _no_usage = dict.fromkeys(TimerUsage.__slots__)
+
+    # if True the memory allocated by python is recorded for all timers
+    trace_memory = False
+    # the number of top allocation sites recorded, 0 records none
+    memory_sites = 0
+    # the states of the running timers recording memory
+    _memory_active = []
+    # True if tracemalloc was started by StopWatch
+    _memory_tracing = False
+    # the allocations of tracemalloc and StopWatch are not shown as sites
+    _memory_filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]
+    # the memory columns of timers without recorded memory
+    _no_memory = dict.fromkeys(["mem_allocated", "mem_peak", "mem_sites"])
+    # the throughput columns of timers without counted bytes
+    _no_throughput = dict.fromkeys(["bytes", "mb_s"])
+
+    # the maximal number of timers or None, see set_retention
+    retention = None
+    # None, True, a separator or a function naming the roll-up timer
+    rollup = None
+    # the names of the roll-up timers
+    _buckets = set()
+    # the number of evicted timers
+    evicted = 0
+    # the interned (name, labels) keys of labelled timers
+    _interned = {}
+
+    # if True every interval is recorded in StopWatch.trace
+    tracing = False
+    # the recorded intervals and events for the timeline
+    trace = collections.deque()
+    _host = platform.node()
+
+    # if True the nesting of the timers is recorded in StopWatch.tree
+    nested = False
+    # the call tree nodes by the path of timer names
+    tree = {}
+    # the stacks of running timers of the threads and tasks in nested mode
+    _stacks = {}
+    # holds a marker per thread, its finalizer removes the stack of the
+    # thread when the thread ends
+    _stack_owner = threading.local()
+
+    # @classmethod
+    # def progress(cls, percent, status="running", pid=None):
+    #     if pid is None:
+    #         pid = os.getpid()
+    #     if "SLURM_JOB_ID" in os.environ:
+    #         pid = os.environ["SLURM_JOB_ID"] #TODO - may need to be updated (monitor of long running jobs)
+    #     print(f"# cloudmesh status={status} progress={percent} pid={pid}")
+
+    # @classmethod
+    # def progress(cls,
+    #              percent: Union[int, str],
+    #              status="running",
+    #              pid=None,
+    #              variable=None,
+    #              filename=None):
+    #     """Prints progress of an event, recording against a pid and providing additional variable.
+    #
+    #     :param percent: 0-100 value
+    #     :type percent: int | str
+    #     :param status: Message to associate to the recording, default - running
+    #     :param pid: The associated Process ID for this event.
+    #     :param variable: Any valid python type with a __str__ method.
+    #
+    #     :return: The progress message as a string
+    #     """
+    #     if type(percent) == 'int':
+    #         percent = str(percent)
+    #     if pid is None:
+    #         pid = os.getpid()
+    #     if "SLURM_JOB_ID" in os.environ:
+    #         # TODO - may need to be updated (monitor of long running jobs)
+    #         pid = os.environ["SLURM_JOB_ID"]
+    #     msg = f"# cloudmesh status={status} progress={percent} pid={pid}"
+    #     if variable is not None:
+    #         msg = msg + f" variable={variable}"
+    #     print(msg)
+    #     if filename is not None:
+    #         appendfile(filename, msg)
+    #     return msg
+    #
+    #     try:
+    #         config = yaml.safe_load(readfile(configfile).strip())
+    #     except:  # noqa: E722
+    #         config = {
+    #             "benchmark": {}
+    #         }
+    #     config["benchmark"].update(argv)
+
+    @classmethod
+    def set_clock(cls, clock="perf_counter"):
+        """sets the clock used to measure the elapsed time of the timers
+
+        Args:
+            clock (str | function): the name of a clock in
+                StopWatch.clocks or a function returning integer
+                nanoseconds
+
+        Returns:
+            function: the clock that is used
+        """
+        if isinstance(clock, str):
+            try:
+                clock = cls.clocks[clock]
+            except KeyError:
+                raise ValueError(
+                    f"StopWatch: unknown clock {clock}, use one of {list(cls.clocks)}"
+                )
+        cls.clock = staticmethod(clock)
+        return clock
+
+    @classmethod
+    def set_concurrent(cls, value=True):
+        """enables or disables the concurrent mode.
+
+        In concurrent mode each thread and asyncio task records its timers
+        in its own context. The contexts are merged into the global view
+        when the timers are read or when StopWatch.merge() is called.
+
+        Args:
+            value (bool): if True the concurrent mode is enabled
+        """
+        if cls.concurrent and not value:
+            cls.merge()
+        cls.concurrent = value
+
+    @staticmethod
+    def _key():
+        """returns a key for the current thread and asyncio task"""
+        try:
+            task = id(asyncio.current_task())
+        except RuntimeError:
+            task = None
+        return threading.get_ident(), task
+
+    @classmethod
+    def _context(cls):
+        """returns the timer context of the current thread or asyncio task.
+        The context of a task is merged and removed when the task is done,
+        the context of a thread by the first merge after the thread ended.
+
+        Returns:
+            _TimerContext: the context
+        """
+        key = cls._key()
+        context = cls._contexts.get(key)
+        if context is None:
+            with cls._lock:
+                context = cls._contexts.get(key)
+                if context is None:
+                    if key[1] is None:
+                        context = _TimerContext(threading.current_thread())
+                    else:
+                        context = _TimerContext()
+                        asyncio.current_task().add_done_callback(
+                            functools.partial(cls._release, key)
+                        )
+                    cls._contexts[key] = context
+        return context
+
+    @classmethod
+    def _release(cls, key, task=None):
+        """merges the context of a done task into the global view and
+        removes it
+
+        Args:
+            key (tuple): the key of the context
+            task (asyncio.Task): the task
+        """
+        with cls._lock:
+            context = cls._contexts.pop(key, None)
+            if context is not None:
+                with context.lock:
+                    for timer in context.registry.values():
+                        cls._merge_timer(timer)
+
+    @classmethod
+    def merge(cls):
+        """merges the timers of all thread and task contexts into the
+        global view. Sums and statistics of the same timer recorded in
+        different contexts are added up, the last completed interval
+        determines the start, end, status and message of the timer. The
+        contexts of ended threads are removed.
+        """
+        with cls._lock:
+            for key, context in list(cls._contexts.items()):
+                with context.lock:
+                    for timer in context.registry.values():
+                        cls._merge_timer(timer)
+                    if context.finished():
+                        del cls._contexts[key]
+
+    @classmethod
+    def _merge_timer(cls, timer):
+        """merges the timer of a context into the global view. The sum and
+        statistics are moved, so the context only keeps what was recorded
+        since the last merge.
+
+        Args:
+            timer (Timer): the timer of a context
+        """
+        total = cls.timer(timer.name, local=False)
+        total.sum_ns += timer.sum_ns
+        timer.sum_ns = 0
+        if timer.stats.count:
+            total.stats.merge(timer.stats)
+            timer.stats = TimerHistogram()
+        if timer.values is not None:
+            total.values = timer.values
+            timer.values = None
+        if timer.usage is not None:
+            if total.usage is None:
+                total.usage = TimerUsage()
+            total.usage.merge(timer.usage)
+            timer.usage = None
+        if timer.memory is not None:
+            if total.memory is None:
+                total.memory = TimerMemory()
+            total.memory.merge(timer.memory)
+            timer.memory = None
+        if timer.bytes is not None:
+            total.bytes = (total.bytes or 0) + timer.bytes
+            timer.bytes = None
+        if timer.end_ns is None:
+            if total.started is None:
+                total.started = timer.started
+                total.start_ns = timer.start_ns
+            return
+        if total.end_ns is None or timer.end_ns >= total.end_ns:
+            total.started = timer.started
+            total.start_ns = timer.start_ns
+            total.end_ns = timer.end_ns
+            total.status = timer.status
+            total.msg = timer.msg
+
+    @classmethod
+    def timer(cls, name, local=True):
+        """returns the record of the timer with the given name and creates
+        it if it does not exist. In concurrent mode the record of the
+        current thread or task is returned.
+
+        Args:
+            name (string): the name of the timer
+            local (bool): if False the global record is returned also in
+                concurrent mode
+
+        Returns:
+            Timer: the timer record
+        """
+        if local and cls.concurrent:
+            return cls._context().timer(name)
+        registry = cls.registry
+        timer = registry.get(name)
+        if cls.retention is None:
+            if timer is None:
+                timer = registry[name] = Timer(name)
+            return timer
+        if timer is None:
+            if len(registry) - len(cls._buckets) >= cls.retention:
+                cls._evict()
+            timer = Timer(name)
+        else:
+            # reinserting the record keeps the registry in LRU order
+            del registry[name]
+        registry[name] = timer
+        return timer
+
+    @classmethod
+    def key(cls, name, labels=None):
+        """returns the key of a timer with labels. The key is the tuple of
+        the name and the sorted label items, the same tuple object is
+        returned for equal names and labels.
+
+        Args:
+            name (str): the name of the timer
+            labels (dict): the labels, e.g. {"epoch": 3, "gpu": 1}
+
+        Returns:
+            str | tuple: the name if there are no labels, otherwise the
+            (name, labels) tuple
+        """
+        if not labels:
+            return name
+        key = (name, tuple(sorted(labels.items())))
+        return cls._interned.setdefault(key, key)
+
+    @staticmethod
+    def label_name(key):
+        """returns the name of a timer as it is shown in the benchmark
+
+        Args:
+            key (str | tuple): the name or the (name, labels) key
+
+        Returns:
+            str: the name followed by the labels as key=value
+        """
+        if type(key) is tuple:
+            name, labels = key
+            return " ".join([name] + [f"{label}={value}" for label, value in labels])
+        return key
+
+    @classmethod
+    def group(cls, name=None, by=None, digits=None):
+        """aggregates the labelled timers by a subset of their labels. The
+        histograms of the timers of a group are merged, so the
+        percentiles are computed over all their durations.
+
+        Args:
+            name (str): the name of the timers, by default all labelled
+                timers grouped by name
+            by (list): the labels to group by, by default no label, which
+                aggregates all timers of a name
+            digits (int): the number of digits, by default StopWatch.digits
+
+        Returns:
+            list: a dict per group with the timer name, the values of the
+            labels in by, sum, count, mean, stddev, min, max, p50, p95
+            and p99
+        """
+        digits = cls.digits if digits is None else digits
+        by = list(by or [])
+        groups = {}
+        for key in cls.keys():
+            if type(key) is not tuple or (name is not None and key[0] != name):
+                continue
+            labels = dict(key[1])
+            values = tuple(labels.get(label) for label in by)
+            group = groups.get((key[0], values))
+            if group is None:
+                group = groups[(key[0], values)] = [0, TimerHistogram()]
+            timer = cls.registry[key]
+            group[0] += timer.sum_ns
+            group[1].merge(timer.stats)
+        result = []
+        for (timer, values), (sum_ns, stats) in groups.items():
+            entry = {"timer": timer}
+            entry.update(zip(by, values))
+            entry["sum"] = round(sum_ns / 1e9, digits)
+            entry.update(stats.statistics(digits=digits))
+            result.append(entry)
+        return result
+
+    @classmethod
+    def group_report(cls, name=None, by=None, output="table", digits=None):
+        """prints the labelled timers aggregated by a subset of their labels
+
+        Args:
+            name (str): the name of the timers, by default all
+            by (list): the labels to group by
+            output (str): table, csv, json or yaml
+            digits (int): the number of digits
+
+        Returns:
+            str: the report
+        """
+        by = list(by or [])
+        order = ["timer"] + by
+        order += ["sum", "count", "mean", "stddev", "min", "max", "p50", "p95", "p99"]
+        content = Printer.write(
+            cls.group(name=name, by=by, digits=digits), order=order, output=output
+        )
+        print(content)
+        return content
+
+    @classmethod
+    def set_retention(cls, size=None, rollup=None):
+        """limits the number of timers. If a new timer exceeds the limit,
+        the least recently used timer that is not running is evicted. The
+        evicted timer is discarded or, if rollup is given, added to a
+        roll-up timer.
+
+        Args:
+            size (int): the maximal number of timers, None for no limit.
+                In concurrent mode the limit applies to each thread and
+                task as well as to the merged timers
+            rollup (bool | str | function): True adds all evicted timers
+                to the timer "other", a separator adds them to the timer
+                named by the prefix up to the separator followed by the
+                separator and "*", a function is called with the name
+                and returns the name of the roll-up timer
+        """
+        cls.retention = size
+        cls.rollup = rollup
+
+    @classmethod
+    def _bucket(cls, name):
+        """returns the name of the roll-up timer of a timer
+
+        Args:
+            name (str): the name of the evicted timer
+
+        Returns:
+            str: the name of the roll-up timer
+        """
+        rollup = cls.rollup
+        if callable(rollup):
+            return rollup(name)
+        if rollup is True:
+            return "other"
+        return name.split(rollup, 1)[0] + rollup + "*"
+
+    @classmethod
+    def _evict(cls):
+        """evicts the least recently used timer that is not running"""
+        registry = cls.registry
+        buckets = cls._buckets
+        for name, timer in registry.items():
+            if name not in buckets and (
+                timer.started is None or timer.end_ns is not None
+            ):
+                break
+        else:
+            return
+        del registry[name]
+        cls._interned.pop(name, None)
+        cls.evicted += 1
+        if cls.rollup is None or timer.started is None:
+            return
+        bucket = cls._bucket(cls.label_name(name))
+        buckets.add(bucket)
+        total = cls.timer(bucket, local=False)
+        total.sum_ns += timer.sum_ns
+        total.stats.merge(timer.stats)
+        if timer.usage is not None:
+            if total.usage is None:
+                total.usage = TimerUsage()
+            total.usage.merge(timer.usage)
+        if timer.memory is not None:
+            if total.memory is None:
+                total.memory = TimerMemory()
+            total.memory.merge(timer.memory)
+        if timer.bytes is not None:
+            total.bytes = (total.bytes or 0) + timer.bytes
+        if total.end_ns is None or total.stopped <= timer.stopped:
+            total.started = timer.started
+            total.start_ns = timer.start_ns
+            total.end_ns = timer.end_ns
+            total.status = timer.status
+            total.msg = timer.msg
+
+    @classmethod
+    def _evict_context(cls, context):
+        """merges the least recently used stopped timer of a thread or task
+        context into the global view and removes it from the context
+
+        Args:
+            context (_TimerContext): the context of a thread or task
+        """
+        with cls._lock:
+            with context.lock:
+                for name, timer in context.registry.items():
+                    if timer.end_ns is not None:
+                        break
+                else:
+                    return
+                cls._merge_timer(timer)
+                del context.registry[name]
+
+    @classmethod
+    def set_resources(cls, value=True):
+        """enables or disables the recording of the CPU time, peak RSS and
+        I/O of the process for all timers that are started afterwards.
+
+        Args:
+            value (bool): if True the resource usage is recorded
+        """
+        cls.resources = value
+
+    @classmethod
+    def set_memory(cls, value=True, sites=0):
+        """enables or disables the recording of the memory allocated by
+        python for all timers that are started afterwards. tracemalloc is
+        started when the first timer records memory and stopped when the
+        recording is disabled, if it was started by StopWatch. Without
+        set_memory a timer started with memory=True stops it again at the
+        end of the last interval recording memory.
+
+        Args:
+            value (bool): if True the allocated memory is recorded
+            sites (int): the number of top allocation sites shown, which
+                takes a tracemalloc snapshot at the start and the end of
+                every interval
+        """
+        cls.trace_memory = value
+        cls.memory_sites = sites
+        if not value and cls._memory_tracing and not cls._memory_active:
+            tracemalloc.stop()
+            cls._memory_tracing = False
+
+    @classmethod
+    def _memory_start(cls):
+        """returns the state of the memory at the start of an interval
+
+        Returns:
+            list: the traced memory, the peak so far and the snapshot
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            cls._memory_tracing = True
+        snapshot = None
+        if cls.memory_sites:
+            snapshot = tracemalloc.take_snapshot().filter_traces(cls._memory_filters)
+        with cls._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, "reset_peak"):
+                # the peak of the enclosing intervals is kept in their state
+                for state in cls._memory_active:
+                    state[1] = max(state[1], peak)
+                tracemalloc.reset_peak()
+            state = [current, current, snapshot]
+            cls._memory_active.append(state)
+        return state
+
+    @classmethod
+    def _memory_stop(cls, state):
+        """returns the memory at the end of an interval
+
+        Args:
+            state (list): the state returned by _memory_start
+
+        Returns:
+            tuple: the traced memory, the peak and the allocation sites
+        """
+        with cls._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            active = cls._memory_active
+            for i in range(len(active)):
+                if active[i] is state:
+                    del active[i]
+                    break
+        sites = []
+        if state[2] is not None and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(cls._memory_filters)
+            for stat in snapshot.compare_to(state[2], "lineno")[: cls.memory_sites]:
+                frame = stat.traceback[0]
+                sites.append((f"{frame.filename}:{frame.lineno}", stat.size_diff))
+        with cls._lock:
+            if cls._memory_tracing and not cls.trace_memory and not active:
+                tracemalloc.stop()
+                cls._memory_tracing = False
+        return current, max(state[1], peak), sites
+
+    @classmethod
+    def memory(cls, name):
+        """returns the memory recorded for a timer.
+
+        Args:
+            name (string): the name of the timer
+
+        Returns:
+            dict: mem_allocated and mem_peak in bytes and the top
+            allocation sites in mem_sites or None if no memory was
+            recorded
+        """
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        if timer is None or timer.memory is None:
+            return None
+        return {
+            "mem_allocated": timer.memory.allocated,
+            "mem_peak": timer.memory.peak,
+            "mem_sites": timer.memory.top(cls.memory_sites or 3),
+        }
+
+    @classmethod
+    def add_bytes(cls, name, count, labels=None):
+        """adds to the bytes moved by a timer, which are shown with the
+        throughput in the benchmark.
+
+        Args:
+            name (string): the name of the timer
+            count (int): the number of bytes
+            labels (dict): the labels of the timer
+        """
+        timer = cls.timer(cls.key(name, labels))
+        timer.bytes = (timer.bytes or 0) + count
+
+    @classmethod
+    def throughput(cls, name, digits=None):
+        """returns the bytes counted for a timer and the throughput.
+
+        Args:
+            name (string): the name of the timer
+            digits (int): the number of digits to round the throughput to
+
+        Returns:
+            dict: bytes and mb_s, the throughput in MB/s over the sum of
+            the timer, or None if no bytes were counted
+        """
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        if timer is None or timer.bytes is None:
+            return None
+        mb_s = None
+        if timer.sum_ns > 0:
+            mb_s = timer.bytes / 1e6 / (timer.sum_ns / 1e9)
+            if digits is not None:
+                mb_s = round(mb_s, digits)
+        return {"bytes": timer.bytes, "mb_s": mb_s}
+
+    @classmethod
+    def usage(cls, name, digits=None):
+        """returns the resource usage recorded for a timer.
+
+        Args:
+            name (string): the name of the timer
+            digits (int): the number of digits to round the CPU times to
+
+        Returns:
+            dict: cpu_user, cpu_system, rss_peak, rss_delta, read_bytes
+            and write_bytes or None if no usage was recorded
+        """
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        if timer is None or timer.usage is None:
+            return None
+        return timer.usage.to_dict(digits=digits)
+
+    @classmethod
+    def set_trace(cls, value=True, size=None):
+        """enables or disables the recording of every interval and event
+        for the timeline written by StopWatch.write_trace.
+
+        Args:
+            value (bool): if True the intervals are recorded
+            size (int): the maximal number of records kept, the oldest are
+                discarded first. By default all records are kept
+        """
+        cls.tracing = value
+        if size != cls.trace.maxlen:
+            cls.trace = collections.deque(cls.trace, maxlen=size)
+
+    @classmethod
+    def trace_events(cls):
+        """returns the recorded intervals and events in the Chrome trace
+        event format. Each host:pid is shown as a process.
+
+        Returns:
+            list: the trace events
+        """
+        events = []
+        processes = {}
+        pids = set()
+        for name, phase, started, elapsed, host, pid, tid, values in list(cls.trace):
+            process = processes.get((host, pid))
+            if process is None:
+                # the same pid can be used on different hosts
+                process = pid
+                while process in pids:
+                    process += 1 << 22
+                pids.add(process)
+                processes[(host, pid)] = process
+            event = {
+                "name": cls.label_name(name),
+                "cat": "stopwatch",
+                "ph": phase,
+                "ts": started * 1e6,
+                "pid": process,
+                "tid": tid,
+            }
+            if phase == "X":
+                event["dur"] = elapsed / 1e3
+            else:
+                event["s"] = "t"
+            args = {}
+            if type(name) is tuple:
+                args.update(name[1])
+            if values is not None:
+                args["values"] = str(values)
+            if args:
+                event["args"] = args
+            events.append(event)
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": process,
+                "tid": 0,
+                "args": {"name": f"{host}:{pid}"},
+            }
+            for (host, pid), process in processes.items()
+        ]
+        return metadata + events
+
+    @classmethod
+    def write_trace(cls, filename):
+        """writes the recorded intervals and events as Chrome trace event
+        json file
+
+        Args:
+            filename (str): the name of the file
+        """
+        content = {"traceEvents": cls.trace_events(), "displayTimeUnit": "ms"}
+        writefile(path_expand(filename), json.dumps(content))
+
+    @classmethod
+    def set_nested(cls, value=True):
+        """enables or disables the recording of nested timers.
+
+        In nested mode StopWatch keeps a stack of the running timers of
+        each thread and asyncio task. When a timer stops, its time is
+        added to the node of the call tree identified by the names of the
+        enclosing timers. See StopWatch.tree for the report.
+
+        Args:
+            value (bool): if True the nesting is recorded
+        """
+        cls.nested = value
+
+    @classmethod
+    def _push(cls, name):
+        """adds a started timer to the stack of the current thread or task
+
+        Args:
+            name (string): the name of the timer
+        """
+        key = cls._key()
+        stack = cls._stacks.get(key)
+        if stack is None:
+            stack = cls._stacks.setdefault(key, [])
+            release = functools.partial(cls._drop_stack, key, stack)
+            if key[1] is None:
+                marker = cls._stack_owner.marker = _StackMarker()
+                weakref.finalize(marker, release)
+            else:
+                asyncio.current_task().add_done_callback(release)
+        stack.append(name)
+
+    @classmethod
+    def _drop_stack(cls, key, stack, task=None):
+        """removes the stack of a thread or task if it is still the stack
+        registered for the key, as thread idents and task ids are reused
 
-    If the pid is omitted it will give the current process pid
-    If PID contains the string SLURM it will give the SLURM_TASK_ID
-    Otherwise it will take the value passed along in pid
+        Args:
+            key (tuple): the key of the stack
+            stack (list): the stack
+            task (asyncio.Task): the done task
+        """
+        if cls._stacks.get(key) is stack:
+            cls._stacks.pop(key, None)
 
-    Args:
-        status (str): String representation of the status
-        progress (int | str): Progress in value from 0 to 100
-        pid (int): Process ID. If not specified, it used the underlaying
-            PID from the OS, or the task id from SLURM or LSF if
-            submitted through a queueing system.
-        time (str): current time
-        stdout (bool): if TRue Prints the progress, if False does not
-            pring, defaut is print
-        filename (str): where to write the progress as a file
-        **kwargs (dict): additional arguments as key=value
+    @classmethod
+    def _pop(cls, name, elapsed):
+        """removes a stopped timer from the stack of the current thread or
+        task and adds its time to the call tree. Timers started within it
+        that are not stopped are removed from the stack as well.
 
-    Returns:
-        str: progress string
-    """
-    if type(progress) in ["int", "float"]:
-        progress = str(progress)
-    if pid is None:
-        if "SLURM_JOB_ID" in os.environ:
-            pid = os.environ["SLURM_JOB_ID"]
-        elif "LSB_JOBID" in os.environ:
-            pid = os.environ["LSB_JOBID"]
-        else:
-            pid = os.getpid()
-    variables = ""
-    msg = f"# cloudmesh status={status} progress={progress} pid={pid}\n"
-    if time:
-        t = str(DateTime.now())
-        msg = msg + f" time='{t}'"
-    if kwargs:
-        for name, value in kwargs.items():
-            variables = variables + f" {name}={value}"
-        msg = msg + variables
-    if append is not None:
-        msg = msg + " " + append
-    if stdout:
-        if with_banner:
-            banner(msg)
-        print(msg, file=sys.stdout)
-    if stderr:
-        print(msg, file=sys.stderr)
-    if filename is not None:
-        appendfile(filename, msg)
-    return msg
+        Args:
+            name (string): the name of the timer
+            elapsed (int): the elapsed time in ns
+        """
+        key = cls._key()
+        stack = cls._stacks.get(key)
+        if not stack or name not in stack:
+            return
+        index = len(stack) - 1 - stack[::-1].index(name)
+        path = tuple(stack[: index + 1])
+        del stack[index:]
+        if not stack:
+            cls._drop_stack(key, stack)
+        with cls._lock:
+            node = cls.tree.get(path)
+            if node is None:
+                node = cls.tree[path] = TimerNode(path)
+            node.count += 1
+            node.inclusive_ns += elapsed
+            if len(path) > 1:
+                parent = cls.tree.get(path[:-1])
+                if parent is None:
+                    parent = cls.tree[path[:-1]] = TimerNode(path[:-1])
+                parent.children_ns += elapsed
 
+    @classmethod
+    def get_tree(cls, digits=None):
+        """returns the call tree of the nested timers. Siblings are
+        ordered by their inclusive time.
 
-def rename(newname):
-    """decorator to rename a function
+        Args:
+            digits (int): the number of digits of the times, by default
+                StopWatch.digits
 
-    Args:
-        newname (str): function name
+        Returns:
+            list: the root nodes as dicts with timer, path, count,
+            inclusive, exclusive and children
+        """
+        digits = cls.digits if digits is None else digits
+        entries = {}
+        roots = []
+        with cls._lock:
+            nodes = [cls.tree[path] for path in sorted(cls.tree, key=len)]
+        for node in nodes:
+            entry = {
+                "timer": cls.label_name(node.path[-1]),
+                "path": "/".join(cls.label_name(name) for name in node.path),
+                "count": node.count,
+                "inclusive": round(node.inclusive_ns / 1e9, digits),
+                "exclusive": round(node.exclusive_ns / 1e9, digits),
+                "inclusive_ns": node.inclusive_ns,
+                "exclusive_ns": node.exclusive_ns,
+                "children": [],
+            }
+            entries[node.path] = entry
+            parent = entries.get(node.path[:-1])
+            if parent is None:
+                roots.append(entry)
+            else:
+                parent["children"].append(entry)
 
-    Returns:
-        object: renamed function
-    """
+        def order(siblings):
+            siblings.sort(key=lambda entry: -entry["inclusive_ns"])
+            for entry in siblings:
+                order(entry["children"])
 
-    def decorator(f):
-        f.__name__ = newname
-        return f
+        order(roots)
+        return roots
 
-    return decorator
+    @classmethod
+    def tree_report(cls, output="table", digits=None, filename=None):
+        """prints the call tree of the nested timers
 
+        The folded output has one line per node with the path separated
+        by ; and the exclusive time in microseconds, which is the input
+        format of flamegraph.pl and speedscope.
 
-def benchmark(func):
-    """decorator to benchmark a function
+        Args:
+            output (str): table, json or folded
+            digits (int): the number of digits of the times in the table
+            filename (str): if specified the report is also written to
+                the file
 
-    Args:
-        func (object): function
+        Returns:
+            str: the report
+        """
+        roots = cls.get_tree(digits=digits)
+
+        def walk(entries):
+            for entry in entries:
+                yield entry
+                yield from walk(entry["children"])
+
+        if output == "json":
+            content = json.dumps(roots, indent=4)
+        elif output == "folded":
+            lines = []
+            for entry in walk(roots):
+                value = entry["exclusive_ns"] // 1000
+                if value > 0:
+                    lines.append(entry["path"].replace("/", ";") + f" {value}")
+            content = "\n".join(lines)
+        elif output == "table":
+            total = sum(entry["inclusive_ns"] for entry in roots) or 1
+            rows = []
+            for entry in walk(roots):
+                rows.append(
+                    {
+                        "timer": entry["path"],
+                        "count": entry["count"],
+                        "inclusive": entry["inclusive"],
+                        "exclusive": entry["exclusive"],
+                        "percent": round(100.0 * entry["inclusive_ns"] / total, 2),
+                    }
+                )
+            content = Printer.write(
+                rows,
+                order=["timer", "count", "inclusive", "exclusive", "percent"],
+                header=["Timer", "Count", "Inclusive", "Exclusive", "%"],
+                output="table",
+            )
+        else:
+            raise ValueError(f"StopWatch: unknown tree output {output}")
 
-    Returns:
-        object: function with benchmarks based on the name of the
-        function
-    """
+        print(content)
+        if filename:
+            writefile(filename, content)
+        return content
 
-    @rename(func.__name__)
-    def wrapper(*args, **kwargs):
-        StopWatch.start(func.__name__)
-        func(*args, **kwargs)
-        StopWatch.stop(func.__name__)
+    @classmethod
+    def snapshot(cls, clear=False):
+        """returns the timers as a dict that can be pickled and, if the
+        values of the timers allow it, serialized as json. It can be sent
+        from a worker process or another node to be merged with
+        StopWatch.merge_snapshot.
 
-    return wrapper
+        Args:
+            clear (bool): if True the timers are cleared afterwards
 
+        Returns:
+            dict: host, pid and the timers
+        """
+        timers = {}
+        for name in cls.keys():
+            timer = cls.registry[name]
+            timers[cls.label_name(name)] = {
+                "name": name if type(name) is not tuple else name[0],
+                "labels": None if type(name) is not tuple else dict(name[1]),
+                "started": timer.started,
+                "elapsed_ns": timer.elapsed_ns,
+                "sum_ns": timer.sum_ns,
+                "status": timer.status,
+                "msg": timer.msg,
+                "values": timer.values,
+                "stats": timer.stats.to_dict(),
+                "usage": None if timer.usage is None else timer.usage.to_dict(),
+                "memory": None if timer.memory is None else timer.memory.to_dict(),
+                "bytes": timer.bytes,
+            }
+        snapshot = {
+            "host": platform.node(),
+            "pid": os.getpid(),
+            "timers": timers,
+            "trace": [
+                [cls.label_name(record[0])] + list(record[1:]) for record in cls.trace
+            ],
+        }
+        if clear:
+            cls.clear()
+        return snapshot
 
-class StopWatch(object):
-    """A class to measure times between events."""
+    @classmethod
+    def merge_snapshot(cls, snapshot, separate=False):
+        """merges the timers of a snapshot into the timers of this process.
+        Sums and statistics are added up, the last interval of the timer
+        is the one that stopped last. The host and pid of the snapshot
+        are recorded as source of the timer and shown in the benchmark.
 
-    debug = False
-    verbose = True
-    # Timer start dict
-    timer_start = {}
-    # Timer end dict
-    timer_end = {}
-    # Timer diff
-    timer_elapsed = {}
-    # records a status
-    timer_status = {}
-    # records a dt
-    timer_sum = {}
-    # msg
-    timer_msg = {}
-    # mllogger
-    timer_values = {}
+        Args:
+            snapshot (dict): a snapshot created with StopWatch.snapshot
+            separate (bool): if True the timers are not merged with the
+                local timers but recorded as "name [host:pid]"
+        """
+        source = f"{snapshot['host']}:{snapshot['pid']}"
+        if cls.concurrent:
+            cls.merge()
+        with cls._lock:
+            for name, data in snapshot["timers"].items():
+                name = data.get("name", name)
+                if separate:
+                    name = f"{name} [{source}]"
+                name = cls.key(name, data.get("labels"))
+                timer = cls.timer(name, local=False)
+                timer.sum_ns += data["sum_ns"]
+                timer.stats.merge(TimerHistogram.from_dict(data["stats"]))
+                if timer.sources is None:
+                    timer.sources = set()
+                timer.sources.add(source)
+                if data["values"] is not None:
+                    timer.values = data["values"]
+                if data.get("usage") is not None:
+                    if timer.usage is None:
+                        timer.usage = TimerUsage()
+                    timer.usage.merge(TimerUsage.from_dict(data["usage"]))
+                if data.get("memory") is not None:
+                    if timer.memory is None:
+                        timer.memory = TimerMemory()
+                    timer.memory.merge(TimerMemory.from_dict(data["memory"]))
+                if data.get("bytes") is not None:
+                    timer.bytes = (timer.bytes or 0) + data["bytes"]
+                if timer.start_ns is not None and timer.end_ns is None:
+                    # the timer is running in this process, its interval
+                    # is completed by stop
+                    continue
+                elapsed = data["elapsed_ns"]
+                stopped = None if elapsed is None else data["started"] + elapsed / 1e9
+                if timer.started is None or (
+                    stopped is not None and (timer.stopped or 0) <= stopped
+                ):
+                    timer.started = data["started"]
+                    timer.start_ns = 0
+                    timer.end_ns = elapsed
+                    timer.status = data["status"]
+                    timer.msg = data["msg"]
+            for record in snapshot.get("trace", []):
+                cls.trace.append(tuple(record))
 
-    # @classmethod
-    # def progress(cls, percent, status="running", pid=None):
-    #     if pid is None:
-    #         pid = os.getpid()
-    #     if "SLURM_JOB_ID" in os.environ:
-    #         pid = os.environ["SLURM_JOB_ID"] #TODO - may need to be updated (monitor of long running jobs)
-    #     print(f"# cloudmesh status={status} progress={percent} pid={pid}")
+    @classmethod
+    def get_source(cls, name):
+        """returns the host:pid sources of a timer merged from snapshots
 
-    # @classmethod
-    # def progress(cls,
-    #              percent: Union[int, str],
-    #              status="running",
-    #              pid=None,
-    #              variable=None,
-    #              filename=None):
-    #     """Prints progress of an event, recording against a pid and providing additional variable.
-    #
-    #     :param percent: 0-100 value
-    #     :type percent: int | str
-    #     :param status: Message to associate to the recording, default - running
-    #     :param pid: The associated Process ID for this event.
-    #     :param variable: Any valid python type with a __str__ method.
-    #
-    #     :return: The progress message as a string
-    #     """
-    #     if type(percent) == 'int':
-    #         percent = str(percent)
-    #     if pid is None:
-    #         pid = os.getpid()
-    #     if "SLURM_JOB_ID" in os.environ:
-    #         # TODO - may need to be updated (monitor of long running jobs)
-    #         pid = os.environ["SLURM_JOB_ID"]
-    #     msg = f"# cloudmesh status={status} progress={percent} pid={pid}"
-    #     if variable is not None:
-    #         msg = msg + f" variable={variable}"
-    #     print(msg)
-    #     if filename is not None:
-    #         appendfile(filename, msg)
-    #     return msg
-    #
-    #     try:
-    #         config = yaml.safe_load(readfile(configfile).strip())
-    #     except:  # noqa: E722
-    #         config = {
-    #             "benchmark": {}
-    #         }
-    #     config["benchmark"].update(argv)
+        Args:
+            name (string): the name of the timer
+
+        Returns:
+            str: comma separated sources or an empty string
+        """
+        timer = cls.registry.get(name)
+        if timer is None or not timer.sources:
+            return ""
+        return ",".join(sorted(timer.sources))
 
     @classmethod
     def keys(cls):
         """returns the names of the timers"""
-        return list(cls.timer_end.keys())
+        if cls.concurrent:
+            cls.merge()
+        return [name for name, timer in cls.registry.items() if timer.started is not None]
 
     @classmethod
     def status(cls, name, value):
@@ -289,7 +2304,7 @@ class StopWatch(object):
         """
         if cls.debug:
             print("Timer", name, "status", value)
-        cls.timer_status[name] = value
+        cls.timer(name).status = value
 
     @classmethod
     def get_message(cls, name):
@@ -298,7 +2313,9 @@ class StopWatch(object):
         Args:
             name (string): the name of the timer
         """
-        return cls.timer_msg[name]
+        if cls.concurrent:
+            cls.merge()
+        return cls.registry[name].msg
 
     @classmethod
     def message(cls, name, value):
@@ -308,10 +2325,12 @@ class StopWatch(object):
             name (string): the name of the timer
             value (bool): the value of the message
         """
-        cls.timer_msg[name] = value
+        cls.timer(name).msg = value
 
     @classmethod
-    def event(cls, name, msg=None, values=None, value=None, stack_offset=2):
+    def event(
+        cls, name, msg=None, values=None, value=None, stack_offset=2, labels=None
+    ):
         """Adds an event with a given name, where start and stop is the same time.
 
         Args:
@@ -319,77 +2338,98 @@ class StopWatch(object):
             msg (string): a message to attach to this event
             values (object): data that is associated with the event that
                 is converted to a string
+            labels (dict): the labels of the timer
 
         Returns:
             None: None
         """
         values = values or value
 
-        StopWatch.start(name)
-        StopWatch.stop(name)
-        StopWatch.timer_end[name] = StopWatch.timer_start[name]
-        if values:
-            StopWatch.timer_values[name] = values
+        timer = cls.timer(cls.key(name, labels) if labels else name)
+        timer.start(values)
+        end = cls.clock()
+        if timer.lock is not None:
+            with timer.lock:
+                timer._stop(end, True, None, "i")
+        else:
+            timer._stop(end, True, None, "i")
+        timer.end_ns = timer.start_ns
 
         if msg is not None:
-            StopWatch.message(name, str(msg))
+            timer.msg = str(msg)
+
+        if cls.sink is not None:
+            start = datetime.datetime.fromtimestamp(timer.started)
+            if values:
+                if isinstance(values, dict):
+                    values = dict(values)
+                cls.sink.emit((name, 0.0, start, start, values))
+            else:
+                cls.sink.emit((name, 0.0, start, start))
 
         if cls.debug:
             print("Timer", name, "event ...")
 
     @classmethod
-    def start(cls, name, values=None, value=None):
+    def start(
+        cls, name, values=None, value=None, resources=None, labels=None, memory=None
+    ):
         """starts a timer with the given name.
 
         Args:
             name (string): the name of the timer
             values (object): any python object with a __str__ method to
                 record with the event.
+            resources (bool): if True the CPU time, peak RSS and I/O of
+                the process are recorded, by default StopWatch.resources
+            labels (dict): the labels of the timer, see StopWatch.key
+            memory (bool): if True the memory allocated by python is
+                recorded, by default StopWatch.trace_memory
 
         Returns:
-            None: None
+            Timer: the timer record, which can be passed to stop
         """
-        values = values or value
-
-        if cls.debug:
-            print("Timer", name, "started ...")
-        if name not in cls.timer_sum:
-            cls.timer_sum[name] = 0.0
-        cls.timer_start[name] = time.time()
-        cls.timer_end[name] = None
-        cls.timer_status[name] = None
-        cls.timer_msg[name] = None
-        if values:
-            StopWatch.timer_values[name] = values
-
         if cls.debug:
             print("Timer", name, "start ...")
+        if labels:
+            name = cls.key(name, labels)
+        return cls.timer(name).start(values or value, resources, memory)
 
     @classmethod
-    def stop(cls, name, state=True, values=None, value=None):
+    def stop(cls, name, state=True, values=None, value=None, labels=None):
         """stops the timer with a given name.
 
         Args:
-            name (string): the name of the timer
+            name (string | Timer): the name of the timer or the record
+                returned by start
             state (bool): When true, updates the status of the timer.
+            labels (dict): the labels the timer was started with
 
         Returns:
-            None: None
-        """
-        values = values or value
+            Timer: the timer record
 
-        cls.timer_end[name] = time.time()
-        # if cumulate:
-        #    cls.timer_end[name] = cls.timer_end[name] + cls.timer_last[name]
-        cls.timer_sum[name] = (
-            cls.timer_sum[name] + cls.timer_end[name] - cls.timer_start[name]
-        )
-        cls.timer_status[name] = state
-        if values:
-            StopWatch.timer_values[name] = values
+        Raises:
+            KeyError: if the timer was not started
+        """
+        end = cls.clock()
+        if type(name) is Timer:
+            timer = name
+        else:
+            name = cls.key(name, labels) if labels else name
+            # a timer that was never started is not created
+            registry = cls._context().registry if cls.concurrent else cls.registry
+            if name not in registry:
+                raise KeyError(f"StopWatch: the timer {name!r} was not started")
+            timer = cls.timer(name)
+        if timer.lock is not None:
+            with timer.lock:
+                timer._stop(end, state, values or value)
+        else:
+            timer._stop(end, state, values or value)
 
         if cls.debug:
-            print("Timer", name, "stopped ...")
+            print("Timer", timer.name, "stopped ...")
+        return timer
 
     @classmethod
     def get_status(cls, name):
@@ -398,7 +2438,57 @@ class StopWatch(object):
         Args:
             name (string): the name of the timer
         """
-        return cls.timer_status[name]
+        if cls.concurrent:
+            cls.merge()
+        return cls.registry[name].status
+
+    @classmethod
+    def get_ns(cls, name):
+        """returns the time of the timer in integer nanoseconds.
+
+        Args:
+            name (string): the name of the timer
+
+        Returns:
+            int: the elapsed time in ns or None if the timer is not stopped
+        """
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        return None if timer is None else timer.elapsed_ns
+
+    @classmethod
+    def sum_ns(cls, name):
+        """returns the sum of the timer in integer nanoseconds.
+
+        Args:
+            name (string): the name of the timer
+
+        Returns:
+            int: the summed time in ns or None if the timer does not exist
+        """
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        return None if timer is None else timer.sum_ns
+
+    @classmethod
+    def statistics(cls, name, digits=None):
+        """returns the statistics of all durations recorded for a timer.
+
+        Args:
+            name (string): the name of the timer
+            digits (int): the number of digits to round to
+
+        Returns:
+            dict: count, min, max, mean, stddev, p50, p95 and p99 in
+            seconds
+        """
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        histogram = TimerHistogram() if timer is None else timer.stats
+        return histogram.statistics(digits=digits)
 
     # noinspection PyPep8
     @classmethod
@@ -407,22 +2497,25 @@ class StopWatch(object):
 
         Args:
             name (string): the name of the timer
+            digits (int): the number of digits to round to, if None the
+                time is not rounded
 
         Returns:
             the elapsed time
         """
-        if name in cls.timer_end:
-            try:
-                diff = cls.timer_end[name] - cls.timer_start[name]
-                if round is not None:
-                    cls.timer_elapsed[name] = round(diff, digits)
-                else:
-                    cls.timer_elapsed[name] = diff
-                return cls.timer_elapsed[name]
-            except:  # noqa: E722
-                return None
-        else:
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        if timer is None:
             return "undefined"
+        elapsed = timer.elapsed_ns
+        if elapsed is None:
+            return None
+        diff = elapsed / 1e9
+        if digits is not None:
+            diff = round(diff, digits)
+        cls.timer_elapsed[name] = diff
+        return diff
 
     @classmethod
     def sum(cls, name, digits=4):
@@ -430,31 +2523,36 @@ class StopWatch(object):
 
         Args:
             name (string): the name of the timer
+            digits (int): the number of digits to round to, if None the
+                time is not rounded
 
         Returns:
             the elapsed time
         """
-        if name in cls.timer_end:
-            try:
-                diff = cls.timer_sum[name]
-                if round is not None:
-                    return round(diff, digits)
-                else:
-                    return diff
-            except:  # noqa: E722
-                return None
-        else:
+        if cls.concurrent:
+            cls.merge()
+        timer = cls.registry.get(name)
+        if timer is None:
             return "undefined"
+        diff = timer.sum_ns / 1e9
+        if digits is not None:
+            return round(diff, digits)
+        return diff
 
     @classmethod
     def clear(cls):
         """clear start and end timer_start"""
-        cls.timer_start.clear()
-        cls.timer_end.clear()
-        cls.timer_sum.clear()
-        cls.timer_status.clear()
+        cls.registry.clear()
         cls.timer_elapsed.clear()
-        cls.timer_msg.clear()
+        with cls._lock:
+            cls._contexts.clear()
+            cls.tree.clear()
+            cls._stacks.clear()
+            cls.trace.clear()
+            cls._buckets.clear()
+            cls.evicted = 0
+            cls._interned.clear()
+            cls._memory_active.clear()
 
     @classmethod
     def print(cls, *args):
@@ -491,10 +2589,12 @@ class StopWatch(object):
         Returns:
             str: string of the StopWatch
         """
+        if cls.concurrent:
+            cls.merge()
         s = ""
-        for t in cls.timer_end:
+        for t in cls.keys():
             data = {
-                "label": t,
+                "label": cls.label_name(t),
                 "start": str(cls.timer_start[t]),
                 "end": str(cls.timer_end[t]),
                 "status": str(cls.timer_status[t]),
@@ -534,6 +2634,7 @@ class StopWatch(object):
         node=None,
         user=None,
         total=False,
+        digits=None,
     ):
         """prints out all timers in a convenient benchmark table
 
@@ -547,16 +2648,19 @@ class StopWatch(object):
             node (str): overwrites the name of the node
             user (str): overwrites the name of the user
             attributes (list): list of additional attributes to print
+            digits (int): the number of digits for time and sum, by
+                default StopWatch.digits
 
         Returns:
             stdout: prints the information
         """
+        digits = cls.digits if digits is None else digits
 
         #
         # PRINT PLATFORM
         #
 
-        data_platform = cm_systeminfo(user=user, node=node)
+        data_platform = cm_systeminfo(user=user, node=node, dynamic=sysinfo)
         if sysinfo:
             print(Printer.attribute(data_platform, output="table"))
 
@@ -572,20 +2676,30 @@ class StopWatch(object):
         if len(timers) > 0:
             data_timers = {}
             for timer in timers:
-                data_timers[timer] = {
+                label = cls.label_name(timer)
+                data_timers[label] = {
                     "start": time.strftime(
                         "%Y-%m-%d %H:%M:%S", time.gmtime(StopWatch.timer_start[timer])
                     ),
                     "stop": time.strftime(
                         "%Y-%m-%d %H:%M:%S", time.gmtime(StopWatch.timer_end[timer])
                     ),
-                    "time": StopWatch.get(timer, digits=3),
-                    "sum": StopWatch.sum(timer, digits=3),
+                    "time": StopWatch.get(timer, digits=digits),
+                    "sum": StopWatch.sum(timer, digits=digits),
                     "status": StopWatch.get_status(timer),
                     "msg": StopWatch.get_message(timer),
-                    "timer": timer,
+                    "timer": label,
                     "tag": tag or "",
+                    "source": StopWatch.get_source(timer),
                 }
+                data_timers[label].update(StopWatch.statistics(timer, digits=digits))
+                data_timers[label].update(
+                    StopWatch.usage(timer, digits=digits) or cls._no_usage
+                )
+                data_timers[label].update(StopWatch.memory(timer) or cls._no_memory)
+                data_timers[label].update(
+                    StopWatch.throughput(timer, digits=digits) or cls._no_throughput
+                )
                 total_time = total_time + StopWatch.get(timer)
 
             # print(Printer.attribute(data_timers, header=["Command", "Time/s"]))
@@ -627,6 +2741,7 @@ class StopWatch(object):
         attributes=None,
         total=False,
         filename=None,
+        digits=None,
     ):
         """prints out all timers in a convenient benchmark table
 
@@ -640,17 +2755,20 @@ class StopWatch(object):
             node (str): overwrites the name of the node
             user (str): overwrites the name of the user
             attributes (list): list of additional attributes to print
+            digits (int): the number of digits for time and sum, by
+                default StopWatch.digits
 
         Returns:
             stdout: prints the information
         """
+        digits = cls.digits if digits is None else digits
 
         #
         # PRINT PLATFORM
         #
         content = "\n"
 
-        data_platform = cm_systeminfo(user=user, node=node)
+        data_platform = cm_systeminfo(user=user, node=node, dynamic=sysinfo)
         if sysinfo:
             content = content + Printer.attribute(
                 data_platform, order=["Machine Attribute", "Value"], output="table"
@@ -666,18 +2784,33 @@ class StopWatch(object):
             if len(timers) > 0:
                 data_timers = {}
                 for timer in timers:
-                    data_timers[timer] = {
+                    label = cls.label_name(timer)
+                    data_timers[label] = {
                         "start": time.strftime(
                             "%Y-%m-%d %H:%M:%S",
                             time.gmtime(StopWatch.timer_start[timer]),
                         ),
-                        "time": StopWatch.get(timer, digits=3),
-                        "sum": StopWatch.sum(timer, digits=3),
+                        "time": StopWatch.get(timer, digits=digits),
+                        "sum": StopWatch.sum(timer, digits=digits),
                         "status": StopWatch.get_status(timer),
                         "msg": StopWatch.get_message(timer),
-                        "timer": timer,
+                        "timer": label,
                         "tag": tag or "",
+                        "source": StopWatch.get_source(timer),
                     }
+                    data_timers[label].update(
+                        StopWatch.statistics(timer, digits=digits)
+                    )
+                    data_timers[label].update(
+                        StopWatch.usage(timer, digits=digits) or cls._no_usage
+                    )
+                    data_timers[label].update(
+                        StopWatch.memory(timer) or cls._no_memory
+                    )
+                    data_timers[label].update(
+                        StopWatch.throughput(timer, digits=digits)
+                        or cls._no_throughput
+                    )
                     try:
                         total_time = total_time + StopWatch.get(timer)
                     except:  # noqa: E722
@@ -691,14 +2824,14 @@ class StopWatch(object):
                         "sys.platform",
                     ]:
                         if attribute == "user" and user is not None:
-                            data_timers[timer][attribute] = user
+                            data_timers[label][attribute] = user
                         elif attribute == "uname.node" and node is not None:
-                            data_timers[timer][attribute] = node
+                            data_timers[label][attribute] = node
                         else:
-                            data_timers[timer][attribute] = data_platform[attribute]
+                            data_timers[label][attribute] = data_platform[attribute]
 
                     if version is not None:
-                        data_timers[timer]["platform.version"] = version
+                        data_timers[label]["platform.version"] = version
 
                 # print(Printer.attribute(data_timers, header=["Command", "Time/s"]))
 
@@ -723,6 +2856,14 @@ class StopWatch(object):
                         "status",
                         "time",
                         "sum",
+                        "count",
+                        "mean",
+                        "stddev",
+                        "min",
+                        "max",
+                        "p50",
+                        "p95",
+                        "p99",
                         "start",
                         "tag",
                         "msg",
@@ -737,6 +2878,14 @@ class StopWatch(object):
                         "Status",
                         "Time",
                         "Sum",
+                        "Count",
+                        "Mean",
+                        "Stddev",
+                        "Min",
+                        "Max",
+                        "P50",
+                        "P95",
+                        "P99",
                         "Start",
                         "tag",
                         "msg",
@@ -745,6 +2894,42 @@ class StopWatch(object):
                         "OS",
                         "Version",
                     ]
+                    if any(
+                        data_timers[key]["bytes"] is not None for key in data_timers
+                    ):
+                        position = order.index("sum") + 1
+                        order[position:position] = list(cls._no_throughput)
+                        header[position:position] = ["Bytes", "MB/s"]
+                    if any(data_timers[key]["source"] for key in data_timers):
+                        order.insert(order.index("tag") + 1, "source")
+                        header.insert(header.index("tag") + 1, "Source")
+                    if any(
+                        data_timers[key]["rss_peak"] is not None
+                        for key in data_timers
+                    ):
+                        position = order.index("p99") + 1
+                        order[position:position] = list(cls._no_usage)
+                        header[position:position] = [
+                            "User CPU",
+                            "System CPU",
+                            "Peak RSS",
+                            "RSS Delta",
+                            "Read",
+                            "Written",
+                        ]
+                    if any(
+                        data_timers[key]["mem_peak"] is not None
+                        for key in data_timers
+                    ):
+                        position = order.index("p99") + 1
+                        while order[position] in cls._no_usage:
+                            position += 1
+                        order[position:position] = list(cls._no_memory)
+                        header[position:position] = [
+                            "Allocated",
+                            "Peak Memory",
+                            "Allocation Sites",
+                        ]
                 elif attributes == "short":
                     order = ["timer", "status", "time"]
 
@@ -788,6 +2973,135 @@ class StopWatch(object):
         if filename:
             writefile(filename, content)
 
+    #: columns of the "# csv" lines that are converted to numbers
+    csv_types = {
+        "time": float,
+        "sum": float,
+        "count": int,
+        "mean": float,
+        "stddev": float,
+        "min": float,
+        "max": float,
+        "p50": float,
+        "p95": float,
+        "p99": float,
+        "cpu_user": float,
+        "cpu_system": float,
+        "rss_peak": int,
+        "rss_delta": int,
+        "read_bytes": int,
+        "write_bytes": int,
+        "mem_allocated": int,
+        "mem_peak": int,
+        "bytes": int,
+        "mb_s": float,
+    }
+
+    @staticmethod
+    def read_csv(filename, columns=None, convert=False, prefix="# csv"):
+        """Reads the "# csv" lines written by benchmark one line at a time
+        and yields a dict for each timer. The file is never read as a
+        whole, so it can be used for logs that do not fit into memory. A
+        log can contain the output of many benchmarks. The first line of
+        each block of "# csv" lines is the header and defines the columns
+        of the lines that follow it.
+
+        Example:
+            for entry in StopWatch.read_csv(logfile, columns=["timer", "time"]):
+                print(entry["timer"], entry["time"])
+
+        Args:
+            filename (str): the name of the log file
+            columns (list): the names of the columns that are returned, by
+                default all columns. Missing columns are returned as None
+            convert (bool): if True the time, sum and statistics columns
+                are converted to numbers, values that can not be converted
+                are returned as None
+            prefix (str): the prefix of the csv lines
+
+        Returns:
+            generator: a dict for each timer
+        """
+        types = StopWatch.csv_types
+        marker = prefix + ","
+        header = None
+        index = None
+        block = False
+        with open(path_expand(filename), "r") as f:
+            for line in f:
+                position = line.find(marker)
+                if position < 0:
+                    block = False
+                    continue
+                values = line[position + len(marker) :].rstrip("\r\n").split(",")
+                first, block = not block, True
+                if first or values[0] == "timer":
+                    header = values
+                    names = columns or header
+                    index = [
+                        header.index(name) if name in header else None
+                        for name in names
+                    ]
+                    converters = [
+                        types.get(name) if convert else None for name in names
+                    ]
+                    fields = list(zip(names, index, converters))
+                    continue
+                if header is None or len(values) < len(header):
+                    continue
+                entry = {}
+                for name, i, converter in fields:
+                    value = None if i is None else values[i]
+                    if converter is not None:
+                        try:
+                            value = converter(value)
+                        except (TypeError, ValueError):
+                            value = None
+                    entry[name] = value
+                yield entry
+
+    @staticmethod
+    def load_csv(
+        filename, columns=None, convert=True, output="columns", prefix="# csv"
+    ):
+        """Loads the "# csv" lines written by benchmark into columns.
+
+        Example:
+            data = StopWatch.load_csv(logfile, columns=["timer", "time", "uname.node"])
+            print(sum(data["time"]))
+
+        Args:
+            filename (str): the name of the log file
+            columns (list): the names of the columns, by default the
+                columns of the first header in the file
+            convert (bool): if True the time, sum and statistics columns
+                are converted to numbers
+            output (str): columns returns a dict of lists, dataframe a
+                pandas DataFrame which requires pandas to be installed
+            prefix (str): the prefix of the csv lines
+
+        Returns:
+            dict or DataFrame: the columns
+        """
+        if output not in ["columns", "dataframe"]:
+            raise ValueError(f"StopWatch: unknown output {output}")
+        data = None
+        for entry in StopWatch.read_csv(
+            filename, columns=columns, convert=convert, prefix=prefix
+        ):
+            if data is None:
+                data = {name: [] for name in entry}
+                append = [(name, data[name].append) for name in entry]
+            for name, add in append:
+                add(entry.get(name))
+        if data is None:
+            data = {name: [] for name in columns or []}
+        if output == "dataframe":
+            import pandas
+
+            return pandas.DataFrame(data)
+        return data
+
     def load(
         filename,
         label=["name"],
@@ -821,48 +3135,75 @@ class StopWatch(object):
         Returns:
 
         """
-        from cloudmesh.common.Shell import Shell
-
-        data = []
-        headers = []
-        content = readfile(filename)
-        lines = Shell.find_lines_with(content, what="# csv")
-        data_attributes = lines[0].split(",")
-        index_attributes = []
-        for attribute in attributes:
-            index_attributes.append(data_attributes.index(attribute))
-        print(index_attributes)
         headers = attributes + label
-        del lines[0]
-        for line in lines:
-            entry = line.split(",")
-            entry = [entry[i] for i in index_attributes]
+        data = []
+        for entry in StopWatch.read_csv(filename, columns=attributes):
+            entry = list(entry.values())
             label_tags = entry[0].split(label_split_char)
-            entry = entry + label_tags
-            data.append(entry)
+            data.append(entry + label_tags)
 
         return {"headers": headers, "data": data}
 
 
 class StopWatchBlock:
-    def __init__(self, name, data=None, log=sys.stdout, mode="w"):
+    """A context block that times its body with StopWatch and writes a
+    line of the form
+
+        # name, time, start, stop, data
+
+    to the log when it exits. If a sink is passed along or StopWatch.sink
+    is set and no log is specified, the line is handed to the sink, which
+    formats and writes it in a background thread. With resources=True the
+    CPU time, peak RSS and I/O of the block are recorded with the timer,
+    with memory=True the memory allocated by python.
+    """
+
+    def __init__(
+        self,
+        name,
+        data=None,
+        log=None,
+        mode="w",
+        sink=None,
+        resources=None,
+        memory=None,
+    ):
         self.name = name
         self.data = data
         self.log = log
+        self.sink = sink
+        self.resources = resources
+        self.memory = memory
         self.is_file = False
         self.start = datetime.datetime.now()
-        if type(log) == str:
-            self.is_file = True
-            self.log = open(log, mode)
+        if sink is None and log is None:
+            self.sink = StopWatch.sink
+        if self.sink is None:
+            if log is None:
+                self.log = sys.stdout
+            elif type(log) == str:
+                self.is_file = True
+                self.log = open(log, mode)
 
     def __enter__(self):
-        StopWatch.start(self.name)
-        return StopWatch.get(self.name)
+        # the elapsed time is read from the record of the block, so in
+        # concurrent mode the contexts are not merged for every block
+        self.timer = StopWatch.start(
+            self.name, resources=self.resources, memory=self.memory
+        )
+        return self.elapsed()
 
     def __exit__(self, type, value, traceback):
         self.stop = datetime.datetime.now()
-        StopWatch.stop(self.name)
-        entry = StopWatch.get(self.name)
+        StopWatch.stop(self.timer)
+        entry = self.elapsed()
+        if self.sink is not None:
+            if self.data:
+                data = dict(self.data) if isinstance(self.data, dict) else self.data
+                self.sink.emit((self.name, entry, self.start, self.stop, data))
+            else:
+                self.sink.emit((self.name, entry, self.start, self.stop))
+            return
         if self.data:
             print(
                 f"# {self.name}, {entry}, {self.start}, {self.stop}, {self.data}",
@@ -872,3 +3213,19 @@ class StopWatchBlock:
             print(f"# {self.name}, {entry}, {self.start}, {self.stop}", file=self.log)
         if self.is_file:
             self.log.close()
+
+    def elapsed(self, digits=4):
+        """returns the time of the block like StopWatch.get
+
+        Args:
+            digits (int): the number of digits to round to
+
+        Returns:
+            the elapsed time or None if the block is running
+        """
+        elapsed = self.timer.elapsed_ns
+        if elapsed is None:
+            return None
+        diff = round(elapsed / 1e9, digits)
+        StopWatch.timer_elapsed[self.name] = diff
+        return diff
@@ -0,0 +1,220 @@
+"""Serves the StopWatch timers of a running process as OpenMetrics.
+
+The exporter runs a small HTTP server from the standard library in a
+background thread. It is bound to localhost by default and serves the
+current count, sum and percentiles of every timer as an OpenMetrics
+summary at /metrics, so a Prometheus server or curl can watch a long
+running training or service process.
+
+Example:
+
+    from cloudmesh.common.StopWatchExporter import StopWatchExporter
+
+    exporter = StopWatchExporter(port=9464)
+    exporter.start()
+    ...
+    exporter.stop()
+
+    $ curl http://127.0.0.1:9464/metrics
+
+    # TYPE stopwatch_seconds summary
+    # UNIT stopwatch_seconds seconds
+    stopwatch_seconds{timer="train",quantile="0.5"} 0.12
+    stopwatch_seconds_sum{timer="train"} 1.2
+    stopwatch_seconds_count{timer="train"} 10
+    ...
+    # EOF
+
+The timers are read without stopping them. Each histogram is copied in
+a single step and summarized afterwards, so the timing of the process
+only waits for the exporter while the timers of threads and tasks in
+concurrent mode are collected.
+"""
+
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from cloudmesh.common.StopWatch import StopWatch
+
+
+class StopWatchExporter(object):
+    """An HTTP server that serves the StopWatch timers as OpenMetrics."""
+
+    content_type = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    quantiles = (0.5, 0.95, 0.99)
+
+    def __init__(self, port=9464, host="127.0.0.1", prefix="stopwatch"):
+        """creates the exporter
+
+        Args:
+            port (int): the port, 0 selects a free port
+            host (str): the address the server is bound to, by default
+                only local connections are accepted
+            prefix (str): the prefix of the metric names
+        """
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.server = None
+        self.thread = None
+
+    @staticmethod
+    def _collect():
+        """returns the name, sum, last elapsed time and a copy of the
+        histogram of every timer including the timers of the threads and
+        tasks that are not merged yet
+
+        Returns:
+            dict: (sum_ns, elapsed_ns, histogram) by timer key
+        """
+        timers = {}
+
+        def add(timer):
+            if timer.started is None:
+                return
+            entry = timers.get(timer.name)
+            stats = timer.stats.copy()
+            if entry is None:
+                timers[timer.name] = [timer.sum_ns, timer.elapsed_ns, stats]
+            else:
+                entry[0] += timer.sum_ns
+                entry[1] = timer.elapsed_ns if entry[1] is None else entry[1]
+                entry[2].merge(stats)
+
+        if StopWatch.concurrent:
+            # merge moves the values of the contexts into the global
+            # records, holding the lock avoids counting them twice
+            with StopWatch._lock:
+                for timer in list(StopWatch.registry.values()):
+                    add(timer)
+                for context in list(StopWatch._contexts.values()):
+                    for timer in list(context.registry.values()):
+                        add(timer)
+        else:
+            for timer in list(StopWatch.registry.values()):
+                add(timer)
+        return timers
+
+    @staticmethod
+    def _escape(value):
+        return (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+
+    @staticmethod
+    def _labels(key, **extra):
+        """returns the label set of a timer
+
+        Args:
+            key (str | tuple): the name or (name, labels) key of the timer
+            **extra: additional labels
+
+        Returns:
+            str: the labels in the form {timer="name",...}
+        """
+        if type(key) is tuple:
+            name, labels = key
+        else:
+            name, labels = key, ()
+        pairs = [("timer", name)]
+        for label, value in labels:
+            label = re.sub("[^a-zA-Z0-9_]", "_", str(label))
+            if label[:1].isdigit():
+                label = "_" + label
+            # the names used by the exporter are renamed
+            if label in ["timer", "quantile"]:
+                label = "label_" + label
+            pairs.append((label, value))
+        pairs.extend(extra.items())
+        return (
+            "{"
+            + ",".join(
+                f'{label}="{StopWatchExporter._escape(value)}"'
+                for label, value in pairs
+            )
+            + "}"
+        )
+
+    def metrics(self):
+        """returns the current timers in the OpenMetrics text format
+
+        Returns:
+            str: the metrics
+        """
+        seconds = f"{self.prefix}_seconds"
+        last = f"{self.prefix}_last_seconds"
+        timers = self._collect()
+        lines = [
+            f"# TYPE {seconds} summary",
+            f"# UNIT {seconds} seconds",
+            f"# HELP {seconds} Durations of the StopWatch timers.",
+        ]
+        for key, (sum_ns, elapsed_ns, stats) in timers.items():
+            for quantile in self.quantiles:
+                value = stats.percentile(quantile * 100)
+                if value is not None:
+                    labels = self._labels(key, quantile=quantile)
+                    lines.append(f"{seconds}{labels} {value / 1e9}")
+            labels = self._labels(key)
+            lines.append(f"{seconds}_sum{labels} {sum_ns / 1e9}")
+            lines.append(f"{seconds}_count{labels} {stats.count}")
+        lines += [
+            f"# TYPE {last} gauge",
+            f"# UNIT {last} seconds",
+            f"# HELP {last} Duration of the last completed interval of the timers.",
+        ]
+        for key, (sum_ns, elapsed_ns, stats) in timers.items():
+            if elapsed_ns is not None:
+                lines.append(f"{last}{self._labels(key)} {elapsed_ns / 1e9}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """starts the server in a background thread
+
+        Returns:
+            StopWatchExporter: the exporter
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ["/", "/metrics"]:
+                    self.send_error(404)
+                    return
+                body = exporter.metrics().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", exporter.content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="StopWatchExporter", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """stops the server"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
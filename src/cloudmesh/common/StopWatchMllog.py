@@ -168,8 +168,24 @@ and extracts fields that match up to the standard logging events.
 
 This method is useful when creating experiments with tools such as
 cloudmesh-sbatch.
+
+Reading mllog files
+-------------------
+
+The ":::MLLOG" lines of a log are read one at a time, so also very large
+submission logs can be analyzed. INTERVAL_START and INTERVAL_END entries
+with the same key, such as run_start and run_stop, are paired into
+durations, which are summarized with the same columns as
+StopWatch.benchmark
+
+::
+    for entry in StopWatch.read_mllog("cloudmesh_mllog.log"):
+        print(entry["key"], entry["event_type"])
+
+    print(StopWatch.mllog_benchmark("cloudmesh_mllog.log"))
 """
 import datetime
+import json
 import os
 import pathlib
 import pprint
@@ -178,11 +194,13 @@ import time
 from typing import Union
 
 import yaml
+from cloudmesh.common.StopWatch import TimerHistogram
 from cloudmesh.common.StopWatch import progress
 from cloudmesh.common.StopWatch import progress as common_progress
 from cloudmesh.common.Tabulate import Printer
 from cloudmesh.common.console import Console
 from cloudmesh.common.systeminfo import systeminfo as cm_systeminfo
+from cloudmesh.common.util import path_expand
 from cloudmesh.common.util import readfile
 from cloudmesh.common.util import writefile
 
@@ -253,15 +271,31 @@ class StopWatch(object):
     timer_values = {}
     mllogging = False
     mllogger = None
+    # EventSink that writes the mllog entries in a background thread
+    mllog_sink = None
+    # the mlperf_logging constants by name, loaded once
+    _mllog_keys = None
 
     @classmethod
-    def activate_mllog(cls, filename="cloudmesh_mllog.log", config=None, stack_offset=2):
+    def activate_mllog(cls, filename="cloudmesh_mllog.log", config=None, stack_offset=2, sink=None):
+        """activates the mllog logging
+
+        Args:
+            filename (str): the mllog file
+            config (dict): the configuration passed to mllog.config
+            stack_offset (int): the default stack offset of mllog
+            sink (EventSink | bool): if True or an EventSink is given, the
+                mllog entries are written in batches by the sink from a
+                background thread. The time of an entry is recorded when
+                it is created, but the file and lineno in its metadata
+                refer to the thread of the sink.
+        """
         # global mllog
 
         if not os.path.exists(filename):
             writefile(filename, "")
         cls._mllog_import = import_mllog()
-
+        cls._mllog_constants()
 
         if config is None:
             cms_mllog = dict(
@@ -274,6 +308,13 @@ class StopWatch(object):
 
         cls.mllogging = True
         cls.mllogger = cls._mllog_import.get_mllogger()
+        if sink is True:
+            from cloudmesh.common.EventSink import EventSink
+
+            sink = EventSink(writer=cls._mllog_write)
+        elif sink:
+            sink.writer = cls._mllog_write
+        cls.mllog_sink = sink or None
         if os.path.exists(filename):
             cls._mllog_import.config(filename=filename)
         cls._mllog_import.config(**cms_mllog
@@ -576,20 +617,10 @@ class StopWatch(object):
             if msg is not None:
                 StopWatch.message(name, str(msg))
         if cls.mllogging and not suppress_mllog:
-            if mllog_key is None:
-                key_name = cls._mllog_lookup("POINT_IN_TIME")
-            else:
-                key_name = cls._mllog_lookup(mllog_key)
             if metadata is None:
-                if values is not None:
-                    cls.mllogger.event(key=name, value=str(values), stack_offset=stack_offset)
-                else:
-                    cls.mllogger.event(key=name, stack_offset=stack_offset)
+                cls._mllog("event", values=values, key=name, stack_offset=stack_offset)
             else:
-                if values is not None:
-                    cls.mllogger.event(key=name, value=str(values), stack_offset=stack_offset, metadata=metadata)
-                else:
-                    cls.mllogger.event(key=name, stack_offset=stack_offset, metadata=metadata)
+                cls._mllog("event", values=values, key=name, stack_offset=stack_offset, metadata=metadata)
 
     @classmethod
     def log_event(cls, **kwargs):
@@ -607,11 +638,98 @@ class StopWatch(object):
             mlkey = cls._mllog_lookup(key)
             cls.event(mlkey, msg=mlkey, values=value, stack_offset=3)
 
+    @staticmethod
+    def _mllog_value(name, values):
+        """formats the value of an mllog entry. For start and stop the name
+        of the timer is added to the values, events log the values as is.
+
+        Args:
+            name (str): the name of the timer or None for events
+            values (object): the values
+
+        Returns:
+            str: the value of the entry
+        """
+        if name is None:
+            return str(values)
+        if values is None:
+            return name
+        if isinstance(values, dict):
+            return str(dict(values, name=name))
+        if isinstance(values, list):
+            return str(values + [name])
+        return f"Name: {name}, {values}"
+
+    @classmethod
+    def _mllog(cls, method, name=None, values=None, **kwargs):
+        """calls the mllogger method with the given arguments or hands it
+        to the sink, which calls it later from its background thread. The
+        value is only formatted when the entry is written, so with a sink
+        the caller does not pay for str() of the values.
+
+        Args:
+            method (str): start, end or event
+            name (str): the name of the timer added to the value of start
+                and end entries
+            values (object): the values of the entry
+            **kwargs: the arguments of the mllogger method
+        """
+        if cls.mllog_sink is None:
+            if name is not None or values is not None:
+                kwargs["value"] = cls._mllog_value(name, values)
+            # account for the frame of this method
+            offset = kwargs.get("stack_offset", cls.mllogger.default_stack_offset)
+            kwargs["stack_offset"] = offset + 1
+            getattr(cls.mllogger, method)(**kwargs)
+        else:
+            kwargs["time_ms"] = int(time.time() * 1e3)
+            # the caller may change its dict or list before it is written
+            if type(values) is dict:
+                values = dict(values)
+            elif type(values) is list:
+                values = list(values)
+            cls.mllog_sink.emit((method, name, values, kwargs))
+
+    @classmethod
+    def _mllog_write(cls, batch):
+        """writes a batch of mllog entries created by _mllog
+
+        Args:
+            batch (list): list of (method, name, values, kwargs) tuples
+        """
+        mllogger = cls.mllogger
+        for method, name, values, kwargs in batch:
+            if name is not None or values is not None:
+                kwargs["value"] = cls._mllog_value(name, values)
+            getattr(mllogger, method)(**kwargs)
+
+    @classmethod
+    def _mllog_constants(cls):
+        """loads the constants of mlperf_logging once into a dict of
+        interned strings
+
+        Returns:
+            dict: the values of the constants by name
+        """
+        if cls._mllog_keys is None:
+            try:
+                from mlperf_logging.mllog import constants as mlconst
+            except ImportError as e:
+                Console.error("You need to install mlperf_logging to use it")
+                raise e
+            cls._mllog_keys = {
+                key: sys.intern(value)
+                for key, value in vars(mlconst).items()
+                if not key.startswith("_") and isinstance(value, str)
+            }
+        return cls._mllog_keys
+
     @classmethod
     def _mllog_lookup(cls, key: str) -> str:
-        """Performs a dynamic lookup for the string representation of a
-           mlperf constant.  If the value isn't found, it will return a string
-           of the pattern mllog-event-{key}
+        """Looks up the string representation of a mlperf constant in the
+           table loaded by activate_mllog.  If the value isn't found, it will
+           return a string of the pattern mllog-event-{key}, which is added
+           to the table
 
         Args:
             key (string): The name of the constant to look up
@@ -619,15 +737,12 @@ class StopWatch(object):
         Returns:
             string: The decoded value of the constant.
         """
-        try:
-            from mlperf_logging.mllog import constants as mlconst
-        except ImportError as e:
-            Console.error("You need to install mlperf_logging to use it")
-            raise e
-        try:
-            key_str = getattr(mlconst, key)
-        except AttributeError as e:
-            key_str = f"mllog-event-{key}"
+        keys = cls._mllog_keys
+        if keys is None:
+            keys = cls._mllog_constants()
+        key_str = keys.get(key)
+        if key_str is None:
+            key_str = keys[key] = sys.intern(f"mllog-event-{key}")
         return key_str
 
     @classmethod
@@ -677,17 +792,7 @@ class StopWatch(object):
                 key = name
             else:
                 key = cls._mllog_lookup(mllog_key)
-            if values is not None:
-                if isinstance(values, dict):
-                    values['name'] = name
-                elif isinstance(values, list):
-                    values += list(name)
-                else:
-                    values = f"Name: {name}, {values}"
-
-                cls.mllogger.start(key=key, value=str(values), metadata=metadata)
-            else:
-                cls.mllogger.start(key=key, value=name, metadata=metadata)
+            cls._mllog("start", name=name, values=values, key=key, metadata=metadata)
 
     @classmethod
     def stop(cls,
@@ -735,17 +840,7 @@ class StopWatch(object):
                 key = name
             else:
                 key = cls._mllog_lookup(mllog_key)
-            if values is not None:
-                if isinstance(values, dict):
-                    values['name'] = name
-                elif isinstance(values, list):
-                    values += list(name)
-                else:
-                    values = f"Name: {name}, {values}"
-
-                cls.mllogger.end(key=key, value=str(values), metadata=metadata)
-            else:
-                cls.mllogger.end(key=key, value=name, metadata=metadata)
+            cls._mllog("end", name=name, values=values, key=key, metadata=metadata)
 
         if cls.debug and not suppress_stopwatch:
             print("Timer", name, "stopped ...")
@@ -919,7 +1014,7 @@ class StopWatch(object):
         # PRINT PLATFORM
         #
 
-        data_platform = cm_systeminfo(user=user, node=node)
+        data_platform = cm_systeminfo(user=user, node=node, dynamic=sysinfo)
         if sysinfo:
             print(Printer.attribute(
                 data_platform,
@@ -1213,9 +1308,216 @@ class StopWatch(object):
         return {"headers": headers,
                 "data": data}
 
+    @staticmethod
+    def read_mllog(filename, prefix=":::MLLOG"):
+        """Reads the entries of an mllog file one line at a time. Lines
+        without the prefix and lines that are not valid json are skipped.
+
+        Example:
+            for entry in StopWatch.read_mllog("cloudmesh_mllog.log"):
+                print(entry["key"], entry["value"])
+
+        Args:
+            filename (str): the mllog file
+            prefix (str): the prefix of the mllog lines
+
+        Yields:
+            dict: the entry with namespace, time_ms, event_type, key, value
+            and metadata
+        """
+        marker = prefix + " "
+        with open(path_expand(filename), "r") as f:
+            for line in f:
+                position = line.find(marker)
+                if position < 0:
+                    continue
+                try:
+                    yield json.loads(line[position + len(marker):])
+                except ValueError:
+                    continue
+
+    @staticmethod
+    def read_mllog_intervals(filename, prefix=":::MLLOG"):
+        """Reads an mllog file one line at a time and pairs the
+        INTERVAL_START and INTERVAL_END entries of the same key. The
+        suffixes _start and _stop are removed from the keys, so run_start
+        and run_stop are paired as the interval run. Nested intervals with
+        the same key are paired last in, first out. Events
+        are returned with a duration of 0 and starts without an end at the
+        end of the file with a duration of None.
+
+        Args:
+            filename (str): the mllog file
+            prefix (str): the prefix of the mllog lines
+
+        Yields:
+            dict: key, event_type, start in seconds since the epoch,
+            elapsed in seconds, value and metadata of the last entry
+        """
+        started = {}
+        for entry in StopWatch.read_mllog(filename, prefix=prefix):
+            key = entry.get("key")
+            event_type = entry.get("event_type")
+            time_ms = entry.get("time_ms")
+            if event_type in ["INTERVAL_START", "INTERVAL_END"]:
+                key = StopWatch._mllog_interval_key(key)
+            if event_type == "INTERVAL_START":
+                started.setdefault(key, []).append(entry)
+                continue
+            if event_type == "INTERVAL_END":
+                stack = started.get(key)
+                if not stack:
+                    continue
+                start = stack.pop()
+                elapsed = (time_ms - start.get("time_ms")) / 1e3
+                start_ms = start.get("time_ms")
+            else:
+                elapsed = 0.0
+                start_ms = time_ms
+            yield {
+                "key": key,
+                "event_type": event_type,
+                "start": start_ms / 1e3,
+                "elapsed": elapsed,
+                "value": entry.get("value"),
+                "metadata": entry.get("metadata"),
+            }
+        for key, stack in started.items():
+            for start in stack:
+                yield {
+                    "key": key,
+                    "event_type": "INTERVAL_START",
+                    "start": start.get("time_ms") / 1e3,
+                    "elapsed": None,
+                    "value": start.get("value"),
+                    "metadata": start.get("metadata"),
+                }
+
+    @staticmethod
+    def _mllog_interval_key(key):
+        """returns the name of an interval without the suffix _start or
+        _stop of the mllog constants
+
+        Args:
+            key (str): the key of an INTERVAL_START or INTERVAL_END entry
+
+        Returns:
+            str: the name of the interval
+        """
+        if isinstance(key, str):
+            for suffix in ["_start", "_stop"]:
+                if key.endswith(suffix) and len(key) > len(suffix):
+                    return key[: -len(suffix)]
+        return key
+
+    @staticmethod
+    def load_mllog(filename, prefix=":::MLLOG", digits=4):
+        """Summarizes the durations of an mllog file per key with the
+        columns of StopWatch.benchmark. Only the statistics are kept in
+        memory, so the size of the file does not matter.
+
+        Args:
+            filename (str): the mllog file
+            prefix (str): the prefix of the mllog lines
+            digits (int): the number of digits for the times
+
+        Returns:
+            dict: the summary of each key with timer, status, time, sum,
+            start, count, mean, stddev, min, max, p50, p95 and p99. The
+            status is failed if an interval of the key did not end
+        """
+        summary = {}
+        for interval in StopWatch.read_mllog_intervals(filename, prefix=prefix):
+            key = interval["key"]
+            entry = summary.get(key)
+            if entry is None:
+                entry = summary[key] = {
+                    "start": interval["start"],
+                    "time": None,
+                    "sum": 0.0,
+                    "status": True,
+                    "stats": TimerHistogram(),
+                }
+            elapsed = interval["elapsed"]
+            if elapsed is None:
+                entry["status"] = False
+                continue
+            entry["time"] = elapsed
+            entry["sum"] += elapsed
+            entry["stats"].add(int(elapsed * 1e9))
+            entry["start"] = min(entry["start"], interval["start"])
+
+        data = {}
+        for key, entry in summary.items():
+            elapsed = entry["time"]
+            data[key] = {
+                "timer": key,
+                "status": "ok" if entry["status"] else "failed",
+                "time": None if elapsed is None else round(elapsed, digits),
+                "sum": round(entry["sum"], digits),
+                "start": time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.gmtime(entry["start"])
+                ),
+            }
+            data[key].update(entry["stats"].statistics(digits=digits))
+        return data
+
+    @staticmethod
+    def mllog_benchmark(filename, prefix=":::MLLOG", digits=4, output="table"):
+        """Formats the summary of an mllog file created by load_mllog like
+        the timers of StopWatch.benchmark.
+
+        Args:
+            filename (str): the mllog file
+            prefix (str): the prefix of the mllog lines
+            digits (int): the number of digits for the times
+            output (str): table, csv, json or yaml
+
+        Returns:
+            str: the formatted summary
+        """
+        data = StopWatch.load_mllog(filename, prefix=prefix, digits=digits)
+        return Printer.write(
+            data,
+            order=[
+                "timer",
+                "status",
+                "time",
+                "sum",
+                "count",
+                "mean",
+                "stddev",
+                "min",
+                "max",
+                "p50",
+                "p95",
+                "p99",
+                "start",
+            ],
+            header=[
+                "Name",
+                "Status",
+                "Time",
+                "Sum",
+                "Count",
+                "Mean",
+                "Stddev",
+                "Min",
+                "Max",
+                "P50",
+                "P95",
+                "P99",
+                "Start",
+            ],
+            output=output,
+        )
+
     @classmethod
     def deactivate_mllog(cls):
         """Disables the mllog capabilities and closes all registered handlers."""
+        if cls.mllog_sink is not None:
+            cls.mllog_sink.close()
+            cls.mllog_sink = None
         handlers = cls.mllogger.logger.handlers.copy()
         for handler in handlers:
             try:
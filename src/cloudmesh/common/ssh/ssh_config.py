@@ -5,6 +5,7 @@ from textwrap import dedent
 
 from cloudmesh.common.Shell import Shell
 from cloudmesh.common.console import Console
+from cloudmesh.common.ssh.ssh_pool import SSHPool
 from cloudmesh.common.util import path_expand
 from cloudmesh.common.util import readfile
 from cloudmesh.common.util import writefile
@@ -123,7 +124,9 @@ class ssh_config:
         if name in ["localhost"]:
             r = "\n".join(Shell.sh("-c", command).split()[-1:])
         else:
-            r = "\n".join(Shell.ssh(name, command).split()[-1:])
+            pool = SSHPool.default()
+            r = "\n".join(Shell.ssh(*pool.options(), name, command).split()[-1:])
+            pool.use(name)
         return r
 
     def local(self, command):
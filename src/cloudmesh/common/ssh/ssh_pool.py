@@ -0,0 +1,225 @@
+"""Reuses ssh connections with the ControlMaster feature of OpenSSH.
+
+The first ssh command to a host starts a master connection that listens
+on a control socket. Later commands to the same user, host and key run
+over this connection, so they skip the TCP and key exchange handshakes.
+The pool only adds options to the ssh and scp command lines:
+
+    ssh -o ControlMaster=auto -o ControlPath=... -o ControlPersist=300 ...
+
+A master exits on its own after it was idle for persist seconds. The
+callers record a host with use() once a command ran over its connection.
+The pool closes the least recently used masters that are still alive
+with "ssh -O exit" when more than size are recorded.
+
+Example:
+
+    from cloudmesh.common.ssh.ssh_pool import SSHPool
+
+    pool = SSHPool.default()
+    command = ["ssh"] + pool.options() + ["red01", "uname -a"]
+    subprocess.run(command)
+    pool.use("red01")
+
+Host.ssh, Host.put, JobSet.ssh and ssh_config.execute use the default
+pool. It is disabled with SSHPool.enabled = False and on Windows, where
+OpenSSH does not support control sockets.
+"""
+
+import getpass
+import hashlib
+import os
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from cloudmesh.common.systeminfo import os_is_windows
+from cloudmesh.common.util import path_expand
+
+
+class SSHPool(object):
+    """A pool of OpenSSH master connections."""
+
+    # if False no options are added and no masters are used
+    enabled = not os_is_windows()
+    # the pool used by Host, JobSet and ssh_config
+    _default = None
+
+    def __init__(self, directory="~/.ssh/cloudmesh-mux", persist=300, size=64):
+        """creates the pool
+
+        Args:
+            directory (str): the directory of the control sockets, it is
+                created with permissions 0700. If it is owned by another
+                user a new private temporary directory is used
+            persist (int): the seconds a master stays open without commands
+            size (int): the maximal number of masters kept open
+        """
+        directory = path_expand(directory)
+        # the path of a unix socket is limited to about 100 characters and
+        # %C expands to 40
+        if len(directory) > 50:
+            directory = os.path.join(
+                tempfile.gettempdir(), f"cloudmesh-mux-{getpass.getuser()}"
+            )
+        self.directory = directory
+        self.persist = persist
+        self.size = size
+        self.masters = OrderedDict()
+        self.lock = threading.Lock()
+        self.prepared = False
+
+    @classmethod
+    def default(cls):
+        """returns the pool shared by Host, JobSet and ssh_config
+
+        Returns:
+            SSHPool: the pool
+        """
+        if cls._default is None:
+            cls._default = SSHPool()
+        return cls._default
+
+    def path(self, key=None):
+        """returns the ControlPath. %C is replaced by ssh with a hash of the
+        local host, remote host, port and user. The key is added as a
+        prefix, so connections with different keys do not share a master.
+
+        Args:
+            key (str): the identity file
+
+        Returns:
+            str: the path
+        """
+        tag = "default"
+        if key:
+            tag = hashlib.sha1(path_expand(key).encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.directory, f"{tag}-%C")
+
+    def _prepare(self):
+        """creates the directory of the control sockets. As other users
+        could connect through the sockets, a directory that is not owned
+        by the user is not used and replaced by a new private temporary
+        directory.
+        """
+        with self.lock:
+            if self.prepared:
+                return
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                info = os.lstat(self.directory)
+                owned = stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid()
+                if owned and stat.S_IMODE(info.st_mode) != 0o700:
+                    os.chmod(self.directory, 0o700)
+                    info = os.lstat(self.directory)
+                private = owned and stat.S_IMODE(info.st_mode) == 0o700
+            except OSError:
+                private = False
+            if not private:
+                self.directory = tempfile.mkdtemp(prefix="cloudmesh-mux-")
+            self.prepared = True
+
+    def options(self, key=None):
+        """returns the ssh options that use the pool. The options do not
+        depend on the host, so they can be used in a command template.
+
+        Args:
+            key (str): the identity file
+
+        Returns:
+            list: the options or [] if the pool is disabled
+        """
+        if not SSHPool.enabled:
+            return []
+        if not self.prepared:
+            self._prepare()
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self.path(key)}",
+            "-o",
+            f"ControlPersist={self.persist}",
+        ]
+
+    def use(self, host, user=None, key=None):
+        """records that a command ran over the connection to a host and
+        closes the least recently used masters that are still alive if
+        more than size are recorded
+
+        Args:
+            host (str): the host
+            user (str): the user on the host
+            key (str): the identity file
+        """
+        if not SSHPool.enabled:
+            return
+        now = time.time()
+        connection = (user, host, key)
+        with self.lock:
+            self.masters.pop(connection, None)
+            self.masters[connection] = now
+            self._expire(now)
+            evicted = []
+            while len(self.masters) > self.size:
+                evicted.append(self.masters.popitem(last=False)[0])
+        for user, host, key in evicted:
+            if self.check(host, user=user, key=key):
+                self.exit(host, user=user, key=key)
+
+    def _expire(self, now):
+        # the masters idle for longer than persist have exited on their own
+        for connection, used in list(self.masters.items()):
+            if now - used <= self.persist:
+                break
+            del self.masters[connection]
+
+    def _control(self, operation, host, user=None, key=None):
+        command = ["ssh", "-o", f"ControlPath={self.path(key)}", "-O", operation]
+        if user:
+            command += ["-l", user]
+        command.append(host)
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
+
+    def check(self, host, user=None, key=None):
+        """checks if a master to the host is running
+
+        Args:
+            host (str): the host
+            user (str): the user on the host
+            key (str): the identity file
+
+        Returns:
+            bool: True if the master is running
+        """
+        return self._control("check", host, user=user, key=key)
+
+    def exit(self, host, user=None, key=None):
+        """closes the master to a host
+
+        Args:
+            host (str): the host
+            user (str): the user on the host
+            key (str): the identity file
+
+        Returns:
+            bool: True if a master was closed
+        """
+        with self.lock:
+            self.masters.pop((user, host, key), None)
+        return self._control("exit", host, user=user, key=key)
+
+    def close(self):
+        """closes all masters opened through the pool"""
+        with self.lock:
+            connections = list(self.masters)
+            self.masters.clear()
+        for user, host, key in connections:
+            self._control("exit", host, user=user, key=key)
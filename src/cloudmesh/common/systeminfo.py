@@ -1,3 +1,4 @@
+import json
 import multiprocessing
 import os
 import platform
@@ -7,10 +8,11 @@ from collections import OrderedDict
 from pathlib import Path
 
 import humanize
-import pip
 import psutil
 from cloudmesh.common.DateTime import DateTime
+from cloudmesh.common.util import path_expand
 from cloudmesh.common.util import readfile
+from cloudmesh.common.util import writefile
 
 
 def os_is_windows():
@@ -115,32 +117,57 @@ def get_platform():
         return sys.platform
 
 
-def systeminfo(info=None, user=None, node=None):
-    """TODO
+_static_systeminfo = None
 
-    Args:
-        info (TODO):  TODO
-        user (str): TODO
-        node (str): TODO
 
-    Returns: dict of the info
+def boot_id():
+    """returns an id that changes when the machine is rebooted
 
+    Returns:
+        str: the boot id, or None if it can not be determined
     """
-    uname = platform.uname()
-    mem = psutil.virtual_memory()
+    try:
+        return readfile("/proc/sys/kernel/random/boot_id").strip()
+    except:  # noqa: E722
+        pass
+    try:
+        return str(psutil.boot_time())
+    except:  # noqa: E722
+        return None
 
-    # noinspection PyPep8
-    def add_binary(value):
+
+def static_systeminfo(refresh=False, filename=None):
+    """Returns the facts that do not change while the machine is running,
+    such as the CPU model, the OS release and the python version. They are
+    computed once per process. If a filename is given, they are also read
+    from and written to that file, which is only used as long as the boot
+    id and the python executable are the same.
+
+    Args:
+        refresh (bool): if True the facts are computed again
+        filename (str): the json file in which the facts are kept
+
+    Returns:
+        dict: the static facts
+    """
+    global _static_systeminfo
+    if _static_systeminfo is not None and not refresh:
+        return _static_systeminfo
+
+    key = {"boot_id": boot_id(), "python": sys.executable}
+    if filename is not None and not refresh:
         try:
-            r = humanize.naturalsize(value, binary=True)
+            with open(path_expand(filename)) as f:
+                cached = json.load(f)
+            if cached["key"] == key:
+                _static_systeminfo = cached["data"]
+                return _static_systeminfo
         except:  # noqa: E722
-            r = ""
-        return r
+            pass
 
-    try:
-        frequency = psutil.cpu_freq()
-    except:  # noqa: E722
-        frequency = None
+    import pip
+
+    uname = platform.uname()
 
     try:
         cores = psutil.cpu_count(logical=False)
@@ -179,11 +206,58 @@ def systeminfo(info=None, user=None, node=None):
             "python": sys.version,
             "python.version": sys.version.split(" ", 1)[0],
             "python.pip": pip.__version__,
-            "user": sys_user(),
-            "mem.percent": str(mem.percent) + " %",
-            "frequency": frequency,
         }
     )
+
+    if data["sys.platform"] == "darwin":
+        data["platform.version"] = platform.mac_ver()[0]
+    elif data["sys.platform"] == "win32":
+        data["platform.version"] = platform.win32_ver()
+    else:
+        data["platform.version"] = uname.version
+
+    try:
+        release_files = Path("/etc").glob("*release")
+        for filename_release in release_files:
+            content = readfile(filename_release.resolve()).splitlines()
+            for line in content:
+                if "=" in line:
+                    attribute, value = line.split("=", 1)
+                    attribute = attribute.replace(" ", "")
+                    data[attribute] = value
+    except:  # noqa: E722
+        pass
+
+    _static_systeminfo = dict(data)
+    if filename is not None:
+        try:
+            writefile(
+                path_expand(filename),
+                json.dumps({"key": key, "data": _static_systeminfo}, indent=2),
+            )
+        except:  # noqa: E722
+            pass
+    return _static_systeminfo
+
+
+def dynamic_systeminfo():
+    """Returns the facts that change while the machine is running, such as
+    the memory usage and the CPU frequency. They are computed on every call.
+
+    Returns:
+        dict: the dynamic facts
+    """
+    mem = psutil.virtual_memory()
+
+    try:
+        frequency = psutil.cpu_freq()
+    except:  # noqa: E722
+        frequency = None
+
+    data = {
+        "mem.percent": str(mem.percent) + " %",
+        "frequency": frequency,
+    }
     for attribute in [
         "total",
         "available",
@@ -200,25 +274,31 @@ def systeminfo(info=None, user=None, node=None):
         except:  # noqa: E722
             pass
     # svmem(total=17179869184, available=6552825856, percent=61.9,
+    return data
 
-    if data["sys.platform"] == "darwin":
-        data["platform.version"] = platform.mac_ver()[0]
-    elif data["sys.platform"] == "win32":
-        data["platform.version"] = platform.win32_ver()
-    else:
-        data["platform.version"] = uname.version
 
-    try:
-        release_files = Path("/etc").glob("*release")
-        for filename in release_files:
-            content = readfile(filename.resolve()).splitlines()
-            for line in content:
-                if "=" in line:
-                    attribute, value = line.split("=", 1)
-                    attribute = attribute.replace(" ", "")
-                    data[attribute] = value
-    except:  # noqa: E722
-        pass
+def systeminfo(info=None, user=None, node=None, dynamic=True):
+    """Returns information about the machine. The static facts are cached
+    per process, see static_systeminfo, the dynamic facts such as the
+    memory usage are only computed if dynamic is True.
+
+    Args:
+        info (dict): additional values that are added
+        user (str): overwrites the user
+        node (str): overwrites the node name
+        dynamic (bool): if True the memory and frequency are included
+
+    Returns: dict of the info
+
+    """
+    data = {}
+    for attribute, value in static_systeminfo().items():
+        if attribute == "platform.version":
+            data["user"] = sys_user()
+            if dynamic:
+                data.update(dynamic_systeminfo())
+        data[attribute] = value
+
     if info is not None:
         data.update(info)
     if user is not None:
@@ -226,4 +306,4 @@ def systeminfo(info=None, user=None, node=None):
     if node is not None:
         data["uname.node"] = node
     data["date"] = str(DateTime.now())
-    return dict(data)
+    return data
@@ -4,10 +4,12 @@
 # pytest -v  tests/test_benchmark.py
 ###############################################################
 
+import os
 import time
 
 import pytest
 from cloudmesh.common.Benchmark import Benchmark
+from cloudmesh.common.StopWatch import StopWatch
 from cloudmesh.common.util import HEADING
 
 
@@ -29,3 +31,34 @@ class Test_Printer:
 
         Benchmark.print(sysinfo=True, csv=True)
         assert True
+
+    def test_benchmark_run(self):
+        HEADING()
+        calls = []
+        result = Benchmark.run(
+            calls.append,
+            args=(1,),
+            name="benchmark run",
+            number=100,
+            repeat=5,
+            warmup=3,
+            seed=1,
+            output=False,
+        )
+        assert len(calls) == 3 + 5 * 100
+        assert result["statistics"]["count"] == 5
+        assert result["low"] <= result["mean"] <= result["high"]
+        assert StopWatch.statistics("benchmark run")["count"] == 5
+        assert StopWatch.get_message("benchmark run") == "number=100 repeat=5"
+        assert Benchmark.intervals["benchmark run"]["repeat"] == 5
+
+        cpu = None
+        if hasattr(os, "sched_getaffinity"):
+            cpu = next(iter(os.sched_getaffinity(0)))
+        result = Benchmark.run(
+            sum, args=([1, 2, 3],), min_time=0.001, repeat=3, cpu=cpu
+        )
+        assert result["number"] >= 1
+        assert result["timer"] == "sum"
+        with pytest.raises(ValueError):
+            Benchmark.run(sum, args=([1],), number=1, repeat=0, output=False)
@@ -0,0 +1,42 @@
+###############################################################
+# pytest -v --capture=no tests/test_benchmark_compare.py
+# pytest -v  tests/test_benchmark_compare.py
+###############################################################
+
+import json
+
+import pytest
+from cloudmesh.common.BenchmarkCompare import BenchmarkCompare
+from cloudmesh.common.BenchmarkCompare import main
+from cloudmesh.common.util import HEADING
+
+
+def result(times):
+    return {
+        "benchmark": {
+            timer: {"timer": timer, "time": value} for timer, value in times.items()
+        }
+    }
+
+
+@pytest.mark.incremental
+class Test_BenchmarkCompare:
+
+    def test_compare(self):
+        HEADING()
+        compare = BenchmarkCompare(threshold=0.05, seed=1)
+        compare.add("before", [result({"a": 1.0 + i / 100, "b": 2.0, "c": 1.0}) for i in range(5)])
+        compare.add("after", [result({"a": 1.5 + i / 100, "b": 2.0 - i / 1000, "d": 1.0}) for i in range(5)])
+        status = {entry["timer"]: entry["status"] for entry in compare.compare()}
+        assert status == {"a": "regression", "b": "ok", "c": "missing", "d": "new"}
+        assert [entry["timer"] for entry in compare.regressions()] == ["a"]
+        print(compare.report())
+
+    def test_main(self, tmp_path):
+        HEADING()
+        for name, value in [("base", 1.0), ("same", 1.01), ("slow", 2.0)]:
+            with open(tmp_path / f"compare-{name}.json", "w") as f:
+                json.dump(result({"a": value}), f)
+        base = str(tmp_path / "compare-base.json")
+        assert main([base, str(tmp_path / "compare-same.json")]) == 0
+        assert main([base, str(tmp_path / "compare-slow.json")]) == 1
@@ -0,0 +1,58 @@
+###############################################################
+# pytest -v --capture=no tests/test_benchmark_io.py
+# pytest -v  tests/test_benchmark_io.py
+###############################################################
+
+import os
+
+import pytest
+from cloudmesh.common.Benchmark import Benchmark
+from cloudmesh.common.BenchmarkIO import BenchmarkIO
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.util import HEADING
+
+
+@pytest.mark.incremental
+class Test_BenchmarkIO:
+
+    def test_stream(self, tmp_path):
+        HEADING()
+        blocks = list(Benchmark.stream(10000, block=4096))
+        assert [len(block) for block in blocks] == [4096, 4096, 1808]
+        blocks = list(Benchmark.stream(10000, block=4096, data=b"abc"))
+        assert [len(block) for block in blocks] == [4096, 4096, 1808]
+        assert blocks[0][:6] == b"abcabc"
+        filename = str(tmp_path / "stream.bin")
+        assert Benchmark.file(filename, 2, block=65536) == 2
+        assert os.path.getsize(filename) == 2 * 1048576
+
+    def test_run(self, tmp_path):
+        HEADING()
+        StopWatch.clear()
+        suite = BenchmarkIO(directory=str(tmp_path), size=256 * 1024, seed=1)
+        results = suite.run(
+            blocks=[4096, 65536],
+            modes=["buffered", "mmap", "direct"],
+            fsync=["none", "end"],
+        )
+        assert len(results) == 2 * 3 * 2 * 3
+        for result in results:
+            if result["mode"] != "direct":
+                assert result["status"] == "ok"
+                assert result["mb_s"] > 0
+            assert result["status"] in ["ok", "unsupported"]
+        key = StopWatch.key(
+            "io read", {"pattern": "random", "mode": "mmap", "block": 4096}
+        )
+        throughput = StopWatch.throughput(key)
+        assert throughput["bytes"] == 256 * 1024
+        assert throughput["mb_s"] > 0
+        data = StopWatch.get_benchmark(sysinfo=False)["benchmark"]
+        assert data[StopWatch.label_name(key)]["bytes"] == 256 * 1024
+        assert not os.listdir(tmp_path)
+
+    def test_parse_size(self):
+        HEADING()
+        assert BenchmarkIO.parse_size("4k") == 4096
+        assert BenchmarkIO.parse_size("1M") == 1048576
+        assert BenchmarkIO.parse_size(512) == 512
@@ -0,0 +1,70 @@
+###############################################################
+# pytest -v --capture=no tests/test_eventsink.py
+# pytest -v --capture=no tests/test_eventsink.py::Test_eventsink::test_file
+# pytest -v  tests/test_eventsink.py
+###############################################################
+
+import pytest
+from cloudmesh.common.EventSink import EventSink
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.StopWatch import StopWatchBlock
+from cloudmesh.common.util import HEADING
+from cloudmesh.common.util import readfile
+
+
+@pytest.mark.incremental
+class Test_eventsink:
+
+    def test_file(self, tmp_path):
+        HEADING()
+        filename = str(tmp_path / "events.log")
+        sink = EventSink(filename=filename, mode="w", size=10, interval=0.1)
+        data = {"step": 0}
+        for i in range(0, 100):
+            data["step"] = i
+            with StopWatchBlock("eventsink block", data=data, sink=sink):
+                pass
+        sink.close()
+        lines = readfile(filename).splitlines()
+        assert len(lines) == 100
+        assert lines[0].startswith("# eventsink block, ")
+        assert lines[-1].endswith("{'step': 99}")
+        assert sink.written == 100
+
+    def test_writer_batches(self):
+        HEADING()
+        batches = []
+        sink = EventSink(writer=batches.append, size=10, interval=60)
+        for i in range(0, 35):
+            sink.emit(i)
+        sink.close()
+        assert [e for batch in batches for e in batch] == list(range(0, 35))
+        assert max(len(batch) for batch in batches) <= 10
+
+    def test_drop(self):
+        HEADING()
+        batches = []
+        sink = EventSink(
+            writer=batches.append, size=1000, interval=60, capacity=10, overflow="drop"
+        )
+        for i in range(0, 20):
+            sink.emit(i)
+        sink.close()
+        assert sink.dropped == 10
+        assert [e for batch in batches for e in batch] == list(range(10, 20))
+
+    def test_stopwatch_sink(self):
+        HEADING()
+        batches = []
+        sink = EventSink(writer=batches.append, interval=60)
+        StopWatch.sink = sink
+        try:
+            StopWatch.event("eventsink event", values={"a": 1})
+            with StopWatchBlock("eventsink default"):
+                pass
+        finally:
+            StopWatch.sink = None
+            sink.close()
+        events = [e for batch in batches for e in batch]
+        assert [e[0] for e in events] == ["eventsink event", "eventsink default"]
+        assert events[0][4] == {"a": 1}
@@ -3,16 +3,18 @@
 # pytest -v --capture=no  tests/test_host..py::Test_host.test_001
 # pytest -v tests/test_host.py
 ###############################################################
+import asyncio
 import getpass
+import platform
 
 import pytest
+from cloudmesh.common.Host import Host
 from cloudmesh.common.Shell import Shell
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.parameter import Parameter
 from cloudmesh.common.util import HEADING
 
 
-# from cloudmesh.common.Host import Host
-
-
 @pytest.mark.incremental
 class Test_host(object):
 
@@ -22,3 +24,89 @@ class Test_host(object):
         result = Shell.run("whoami")
         print(result)
         assert getpass.getuser() in result
+
+    def test_002_run_asyncio(self):
+        HEADING()
+        hosts = "node[01-20]"
+        command = ["echo", "{host}"]
+        process = Host.run(hosts=hosts, command=command, processors=4)
+        seen = []
+        result = Host.run(
+            hosts=hosts,
+            command=command,
+            processors=8,
+            executor="asyncio",
+            live=seen.append,
+            interval=0.01,
+        )
+        assert [entry["stdout"] for entry in result] == Parameter.expand(hosts)
+        for a, b in zip(process, result):
+            assert set(a) == set(b)
+            assert (a["stdout"], a["stderr"], a["returncode"]) == (
+                b["stdout"],
+                b["stderr"],
+                b["returncode"],
+            )
+        assert len(seen[-1]) == 20
+        assert not any(entry["running"] for entry in seen[-1])
+
+        command = ["sh", "-c", "echo error >&2; exit 3"]
+        result = Host.run(hosts="node01", command=command, executor="asyncio")
+        assert result[0]["returncode"] == 3 and not result[0]["success"]
+        assert result[0]["stderr"] == b"error\n"
+
+        local = platform.uname()[1]
+        result = Host.run(
+            hosts=local, command=["unused"], execute="echo local", executor="asyncio"
+        )
+        assert result[0]["stdout"] == "local"
+
+    def test_003_run_async(self):
+        HEADING()
+
+        async def main():
+            return await Host.run_async(
+                hosts="node[1-3]", command=["echo", "{host}"], stopwatch=True
+            )
+
+        result = asyncio.run(main())
+        assert [entry["stdout"] for entry in result] == ["node1", "node2", "node3"]
+        assert StopWatch.get_status("Host.run node2")
+
+    def test_004_run_iter(self):
+        HEADING()
+        hosts = "node[5,1,3]"
+        command = ["sh", "-c", "sleep 0.$(echo {host} | tr -d node)"]
+        seen = []
+        for executor in [None, "asyncio"]:
+            result = [
+                entry["host"]
+                for entry in Host.run_iter(
+                    hosts=hosts, command=command, executor=executor
+                )
+            ]
+            assert result == ["node1", "node3", "node5"]
+
+            seen.clear()
+            result = Host.run(
+                hosts=hosts, command=command, executor=executor, callback=seen.append
+            )
+            assert [entry["host"] for entry in result] == ["node5", "node1", "node3"]
+            assert [entry["host"] for entry in seen] == ["node1", "node3", "node5"]
+
+        with pytest.raises(ValueError):
+            Host.run(hosts=hosts, command=command, callback=print, live=True)
+
+    def test_005_run_async_iter(self):
+        HEADING()
+
+        async def main():
+            return [
+                entry["stdout"]
+                async for entry in Host.run_async_iter(
+                    hosts="node[1-3]", command=["echo", "{host}"]
+                )
+            ]
+
+        result = asyncio.run(main())
+        assert sorted(result) == ["node1", "node2", "node3"]
@@ -0,0 +1,90 @@
+###############################################################
+# pytest -v --capture=no tests/test_ssh_pool.py
+# pytest -v  tests/test_ssh_pool.py
+###############################################################
+
+import os
+import tempfile
+
+import pytest
+from cloudmesh.common.ssh.ssh_pool import SSHPool
+from cloudmesh.common.util import HEADING
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    # a relative path, as the path of tmp_path can be longer than the path
+    # of a control socket allows
+    monkeypatch.chdir(tmp_path)
+    return "mux"
+
+
+@pytest.mark.incremental
+class Test_ssh_pool:
+
+    def test_options(self, directory):
+        HEADING()
+        pool = SSHPool(directory=directory)
+        options = pool.options()
+        assert options[:2] == ["-o", "ControlMaster=auto"]
+        assert f"ControlPersist={pool.persist}" in options
+        assert f"ControlPath={pool.path()}" in options
+        assert pool.directory == directory
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+        assert pool.path().endswith("default-%C")
+        assert pool.path("~/.ssh/a") != pool.path("~/.ssh/b")
+        assert not pool.masters
+
+    def test_directory(self, directory, tmp_path, monkeypatch):
+        HEADING()
+        os.makedirs(directory, mode=0o755)
+        os.chmod(directory, 0o755)
+        pool = SSHPool(directory=directory)
+        pool.options()
+        assert pool.directory == directory
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+
+        uid = os.getuid()
+        monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        pool = SSHPool(directory=directory)
+        pool.options()
+        assert pool.directory != directory
+        assert os.path.dirname(pool.directory) == str(tmp_path)
+        assert os.path.basename(pool.directory).startswith("cloudmesh-mux-")
+        assert os.stat(pool.directory).st_mode & 0o777 == 0o700
+
+    def test_lru(self, directory):
+        HEADING()
+        pool = SSHPool(directory=directory, size=2)
+        operations = []
+
+        def control(operation, host, user=None, key=None):
+            operations.append((operation, host))
+            return host == "red02"
+
+        pool._control = control
+        pool.use("red01")
+        pool.use("red02")
+        pool.use("red01")
+        pool.use("red03")
+        pool.use("red04")
+        assert [host for user, host, key in pool.masters] == ["red03", "red04"]
+        assert operations == [
+            ("check", "red02"),
+            ("exit", "red02"),
+            ("check", "red01"),
+        ]
+        pool.close()
+        assert not pool.masters
+
+    def test_disabled(self, directory):
+        HEADING()
+        pool = SSHPool(directory=directory)
+        SSHPool.enabled = False
+        try:
+            assert pool.options() == []
+            pool.use("red01")
+            assert not pool.masters
+        finally:
+            SSHPool.enabled = True
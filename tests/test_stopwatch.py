@@ -4,12 +4,39 @@
 # pytest -v  tests/test_stopwatch.py
 ###############################################################
 
+import asyncio
+import io
+import json
+import os
+import threading
 import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.StopWatch import StopWatchBlock
+from cloudmesh.common.StopWatch import benchmark
+from cloudmesh.common.JobSet import JobSet
+from cloudmesh.common.SharedTimerTable import SharedTimerTable
+from cloudmesh.common.StopWatch import TimerHistogram
 from cloudmesh.common.util import HEADING
 
+# the timing tests depend on the load of the machine, they only run with
+# CLOUDMESH_BENCHMARK=1
+timing = pytest.mark.skipif(
+    not os.environ.get("CLOUDMESH_BENCHMARK"),
+    reason="set CLOUDMESH_BENCHMARK=1 to run the timing tests",
+)
+
+
+def timed_job(spec):
+    for i in range(spec["value"]):
+        StopWatch.start("job step")
+        StopWatch.stop("job step")
+    return {"name": spec["name"], "stdout": "", "returncode": 0}
+
 
 @pytest.mark.incremental
 class Test_Printer:
@@ -76,6 +103,548 @@ class Test_Printer:
         data = {"a": 1}
         t = StopWatch.event("stopwtch event", msg=data)
 
+    def test_stopwatch_clock(self):
+        HEADING()
+        ticks = iter([1000, 1250, 2000, 2500])
+        StopWatch.set_clock(lambda: next(ticks))
+        try:
+            for i in range(0, 2):
+                StopWatch.start("stopwatch clock")
+                StopWatch.stop("stopwatch clock")
+        finally:
+            StopWatch.set_clock("perf_counter")
+        assert StopWatch.get_ns("stopwatch clock") == 500
+        assert StopWatch.sum_ns("stopwatch clock") == 750
+        assert StopWatch.get("stopwatch clock", digits=None) == 500 / 1e9
+        assert StopWatch.sum("stopwatch clock", digits=9) == 750 / 1e9
+
+    def test_stopwatch_not_started(self):
+        HEADING()
+        with pytest.raises(KeyError):
+            StopWatch.stop("stopwatch never started")
+        assert "stopwatch never started" not in StopWatch.registry
+        StopWatch.clear()
+        StopWatch.start("stopwatch digits")
+        StopWatch.stop("stopwatch digits")
+        data = StopWatch.get_benchmark(sysinfo=False, digits=0)["benchmark"]
+        assert data["stopwatch digits"]["time"] == 0
+
+    def test_stopwatch_concurrent_threads(self):
+        HEADING()
+        local = threading.local()
+
+        def clock():
+            local.ticks = getattr(local, "ticks", 0) + 10
+            return local.ticks
+
+        def work(i):
+            for j in range(0, 100):
+                StopWatch.start("stopwatch threads")
+                StopWatch.stop("stopwatch threads")
+            StopWatch.status("stopwatch threads", True)
+
+        StopWatch.set_clock(clock)
+        StopWatch.set_concurrent(True)
+        try:
+            with ThreadPoolExecutor(8) as pool:
+                list(pool.map(work, range(0, 16)))
+        finally:
+            StopWatch.set_concurrent(False)
+            StopWatch.set_clock("perf_counter")
+        assert StopWatch.sum_ns("stopwatch threads") == 16 * 100 * 10
+        assert StopWatch.get_ns("stopwatch threads") == 10
+        assert StopWatch.get_status("stopwatch threads")
+        contexts = StopWatch._contexts.values()
+        assert all(context.thread.is_alive() for context in contexts)
+
+    def test_stopwatch_concurrent_tasks(self):
+        HEADING()
+
+        log = io.StringIO()
+
+        async def work(dt):
+            StopWatch.start("stopwatch tasks")
+            await asyncio.sleep(dt)
+            StopWatch.stop("stopwatch tasks")
+            with StopWatchBlock("stopwatch task block", log=log) as block:
+                assert block is None
+                await asyncio.sleep(0)
+
+        async def main():
+            await asyncio.gather(*[work(0.1) for i in range(0, 5)])
+
+        async def short():
+            await asyncio.gather(*[work(0) for i in range(0, 500)])
+
+        StopWatch.set_concurrent(True)
+        try:
+            asyncio.run(main())
+            t = StopWatch.sum("stopwatch tasks")
+            assert not [key for key in StopWatch._contexts if key[1] is not None]
+            for i in range(0, 4):
+                asyncio.run(short())
+            assert not [key for key in StopWatch._contexts if key[1] is not None]
+            statistics = StopWatch.statistics("stopwatch task block")
+            assert statistics["count"] == 5 + 4 * 500
+        finally:
+            StopWatch.set_concurrent(False)
+        print(t)
+        assert t >= 5 * 0.1
+        assert log.getvalue().count("# stopwatch task block, ") == 5 + 4 * 500
+
+    def test_histogram(self):
+        HEADING()
+        h = TimerHistogram()
+        for value in range(1, 10001):
+            h.add(value * 1000)
+        assert h.count == 10000
+        assert h.min == 1000
+        assert h.max == 10000000
+        assert abs(h.mean - 5000500) < 1
+        assert len(h.buckets) < 1000
+        for q in [50, 95, 99]:
+            assert abs(h.percentile(q) - q * 100000) / (q * 100000) < 0.02
+
+        a = TimerHistogram()
+        b = TimerHistogram()
+        for value in range(1, 10001):
+            (a if value % 2 else b).add(value * 1000)
+        a.merge(b)
+        assert a.count == h.count
+        assert a.buckets == h.buckets
+        assert abs(a.stddev() - h.stddev()) < 1e-6 * h.stddev()
+
+    def test_stopwatch_statistics(self):
+        HEADING()
+        for i in range(0, 10):
+            StopWatch.start("stopwatch statistics")
+            time.sleep(0.01)
+            StopWatch.stop("stopwatch statistics")
+        data = StopWatch.statistics("stopwatch statistics")
+        print(data)
+        assert data["count"] == 10
+        assert 0.01 <= data["min"] <= data["p50"] <= data["p99"] <= data["max"]
+        assert data["stddev"] >= 0
+
+    def test_stopwatch_handle(self):
+        HEADING()
+        t = StopWatch.start("stopwatch handle")
+        time.sleep(0.01)
+        StopWatch.stop(t)
+        assert t is StopWatch.timer("stopwatch handle")
+        assert t.elapsed_ns == StopWatch.get_ns("stopwatch handle")
+        assert StopWatch.timer_start["stopwatch handle"] == t.started
+        assert StopWatch.timer_end["stopwatch handle"] >= t.started + 0.01
+        assert StopWatch.get_status("stopwatch handle")
+
+    @pytest.mark.benchmark
+    @timing
+    def test_stopwatch_overhead(self):
+        HEADING()
+        budget = 10e-6
+        n = 10000
+
+        def facade():
+            StopWatch.start("stopwatch overhead")
+            StopWatch.stop("stopwatch overhead")
+
+        t = StopWatch.timer("stopwatch overhead handle")
+
+        def handle():
+            t.start()
+            t.stop()
+
+        for f in [facade, handle]:
+            overhead = min(timeit.repeat(f, number=n, repeat=5)) / n
+            print(f.__name__, overhead * 1e6, "µs")
+            assert overhead < budget
+
+    def test_stopwatch_nested(self):
+        HEADING()
+        ticks = iter(range(0, 1000, 10))
+        StopWatch.set_clock(lambda: next(ticks))
+        StopWatch.set_nested(True)
+        try:
+            StopWatch.start("nested epoch")
+            for i in range(0, 2):
+                StopWatch.start("nested load")
+                StopWatch.stop("nested load")
+                StopWatch.start("nested forward")
+                StopWatch.start("nested kernel")
+                StopWatch.stop("nested kernel")
+                StopWatch.stop("nested forward")
+            StopWatch.stop("nested epoch")
+        finally:
+            StopWatch.set_nested(False)
+            StopWatch.set_clock("perf_counter")
+        tree = StopWatch.get_tree()
+        epoch = [e for e in tree if e["timer"] == "nested epoch"][0]
+        assert epoch["count"] == 1
+        assert epoch["inclusive_ns"] == 130
+        assert epoch["exclusive_ns"] == 130 - 2 * 10 - 2 * 30
+        forward, load = epoch["children"]
+        assert forward["timer"] == "nested forward"
+        assert forward["count"] == 2
+        assert forward["exclusive_ns"] == 2 * 30 - 2 * 10
+        assert forward["children"][0]["path"] == "nested epoch/nested forward/nested kernel"
+        assert load["inclusive_ns"] == 20
+        StopWatch.tree_report(output="table")
+        folded = StopWatch.tree_report(output="json")
+        assert "nested kernel" in folded
+        assert StopWatch._key() not in StopWatch._stacks
+
+    def test_stopwatch_nested_release(self):
+        HEADING()
+
+        async def work(i):
+            StopWatch.start("nested task")
+            StopWatch.start(f"nested task open {i}")
+            await asyncio.sleep(0)
+            StopWatch.stop("nested task")
+
+        async def main():
+            await asyncio.gather(*[work(i) for i in range(0, 200)])
+
+        def thread():
+            StopWatch.start("nested thread open")
+
+        StopWatch.set_nested(True)
+        try:
+            asyncio.run(main())
+            t = threading.Thread(target=thread)
+            t.start()
+            t.join()
+        finally:
+            StopWatch.set_nested(False)
+        assert not StopWatch._stacks
+
+    def test_stopwatch_snapshot(self):
+        HEADING()
+        StopWatch.start("snapshot a")
+        StopWatch.stop("snapshot a")
+        StopWatch.status("snapshot a", True)
+        snapshot = json.loads(json.dumps(StopWatch.snapshot()))
+        assert "snapshot a" in snapshot["timers"]
+        StopWatch.merge_snapshot(snapshot)
+        stats = StopWatch.statistics("snapshot a")
+        assert stats["count"] == 2
+        assert StopWatch.get_source("snapshot a") == f"{snapshot['host']}:{snapshot['pid']}"
+        StopWatch.merge_snapshot(snapshot, separate=True)
+        name = f"snapshot a [{snapshot['host']}:{snapshot['pid']}]"
+        assert StopWatch.statistics(name)["count"] == 1
+        assert StopWatch.get_status(name)
+
+    def test_stopwatch_snapshot_running(self):
+        HEADING()
+        StopWatch.start("snapshot running")
+        StopWatch.stop("snapshot running")
+        snapshot = StopWatch.snapshot()
+        StopWatch.start("snapshot running")
+        StopWatch.merge_snapshot(snapshot)
+        time.sleep(0.01)
+        StopWatch.stop("snapshot running")
+        assert 0.01 <= StopWatch.get("snapshot running", digits=None) < 1
+        assert StopWatch.statistics("snapshot running")["count"] == 3
+
+    def test_jobset_timers(self):
+        HEADING()
+        jobs = JobSet("timers", executor=timed_job)
+        for i in range(4):
+            jobs.add({"name": f"job {i}", "value": 3})
+        jobs.run(parallel=2)
+        assert StopWatch.statistics("job step")["count"] == 12
+        assert StopWatch.get_source("job step") != ""
+
+    def test_shared_timer_table(self):
+        HEADING()
+        with SharedTimerTable(rows=2, columns=2) as table:
+            row = SharedTimerTable.attach(table.filename).row(1)
+            StopWatch.shared = row
+            try:
+                StopWatch.start("shared a")
+                assert table.read()[0]["running"]
+                StopWatch.stop("shared a")
+                StopWatch.start("shared b")
+                StopWatch.stop("shared b")
+                StopWatch.start("shared c")
+                StopWatch.stop("shared c")
+            finally:
+                StopWatch.shared = None
+                row.table.close()
+            entries = table.read()
+            assert [entry["timer"] for entry in entries] == ["shared a", "shared b"]
+            assert entries[0]["row"] == 1 and not entries[0]["running"]
+            assert entries[0]["count"] == 1
+        assert not os.path.exists(table.filename)
+
+        seen = []
+        jobs = JobSet("live", executor=timed_job)
+        for i in range(3):
+            jobs.add({"name": f"live job {i}", "value": 2})
+        jobs.run(parallel=2, live=seen.append, interval=0.01)
+        final = {entry["timer"]: entry for entry in seen[-1]}
+        assert final["job live job 0"]["count"] == 1
+        assert final["job step"]["count"] == 2
+        assert not any(entry["running"] for entry in seen[-1])
+        assert jobs.table is None
+
+    def test_stopwatch_resources(self, tmp_path):
+        HEADING()
+        StopWatch.clear()
+        StopWatch.start("resources cpu", resources=True)
+        total = 0
+        for i in range(200000):
+            total += i * i
+        data = bytearray(10000000)
+        StopWatch.stop("resources cpu")
+        log = str(tmp_path / "block.log")
+        with StopWatchBlock("resources block", resources=True, log=log):
+            pass
+        usage = StopWatch.usage("resources cpu")
+        assert usage["cpu_user"] + usage["cpu_system"] > 0
+        assert usage["rss_peak"] >= len(data)
+        assert StopWatch.usage("resources block") is not None
+        StopWatch.start("resources none")
+        StopWatch.stop("resources none")
+        assert StopWatch.usage("resources none") is None
+        assert StopWatch.get_benchmark(sysinfo=False)["benchmark"]["resources cpu"]["rss_peak"] > 0
+
+    def test_stopwatch_trace(self, tmp_path):
+        HEADING()
+        StopWatch.clear()
+        StopWatch.set_trace(True)
+        try:
+            with StopWatchBlock("trace outer", log=str(tmp_path / "block.log")):
+                StopWatch.start("trace inner")
+                StopWatch.stop("trace inner")
+                StopWatch.event("trace event", values={"step": 1})
+            jobs = JobSet("trace", executor=timed_job)
+            for i in range(2):
+                jobs.add({"name": f"trace job {i}", "value": 2})
+            jobs.run(parallel=2)
+        finally:
+            StopWatch.set_trace(False)
+        StopWatch.write_trace(str(tmp_path / "trace.json"))
+        with open(tmp_path / "trace.json") as f:
+            events = json.load(f)["traceEvents"]
+        spans = {e["name"]: e for e in events if e["ph"] == "X"}
+        outer = spans["trace outer"]
+        inner = spans["trace inner"]
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+        assert [e["args"] for e in events if e["ph"] == "i"] == [{"values": "{'step': 1}"}]
+        processes = [e for e in events if e["ph"] == "M"]
+        assert len(processes) >= 2
+        assert len([e for e in events if e["name"] == "job step"]) == 4
+
+    def test_stopwatch_retention(self):
+        HEADING()
+        StopWatch.clear()
+        StopWatch.set_retention(10, rollup=" ")
+        try:
+            StopWatch.start("retention running")
+            for i in range(100):
+                StopWatch.start(f"retention {i}")
+                StopWatch.stop(f"retention {i}")
+            StopWatch.stop("retention running")
+            assert len(StopWatch.registry) <= 11
+            assert "retention 99" in StopWatch.registry
+            assert StopWatch.get("retention running") is not None
+            assert StopWatch.evicted == 91
+            assert StopWatch.statistics("retention *")["count"] == 91
+
+            StopWatch.clear()
+            StopWatch.set_retention(5)
+            StopWatch.set_concurrent(True)
+
+            def work(n):
+                for i in range(50):
+                    StopWatch.start(f"retention {n} {i}")
+                    StopWatch.stop(f"retention {n} {i}")
+
+            with ThreadPoolExecutor(4) as pool:
+                list(pool.map(work, range(4)))
+            assert len(StopWatch.keys()) <= 5
+            assert all(len(c.registry) <= 5 for c in StopWatch._contexts.values())
+        finally:
+            StopWatch.set_concurrent(False)
+            StopWatch.set_retention(None)
+            StopWatch.clear()
+
+    def test_stopwatch_labels(self):
+        HEADING()
+        StopWatch.clear()
+        StopWatch.set_clock(iter(range(0, 10000, 10)).__next__)
+        try:
+            for epoch in range(3):
+                for gpu in range(2):
+                    labels = {"epoch": epoch, "gpu": gpu}
+                    StopWatch.start("labels train", labels=labels)
+                    StopWatch.stop("labels train", labels=labels)
+            StopWatch.event("labels event", labels={"gpu": 0})
+        finally:
+            StopWatch.set_clock("perf_counter")
+        key = StopWatch.key("labels train", {"gpu": 1, "epoch": 2})
+        assert key is StopWatch.key("labels train", {"epoch": 2, "gpu": 1})
+        assert StopWatch.label_name(key) == "labels train epoch=2 gpu=1"
+        assert StopWatch.get_ns(key) == 10
+        groups = StopWatch.group("labels train", by=["gpu"], digits=9)
+        assert [(g["gpu"], g["count"]) for g in groups] == [(0, 3), (1, 3)]
+        assert groups[0]["sum"] == 3e-08
+        total = StopWatch.group("labels train")
+        assert total[0]["count"] == 6
+        StopWatch.group_report(by=["gpu"])
+        data = StopWatch.get_benchmark(sysinfo=False)["benchmark"]
+        assert "labels train epoch=0 gpu=1" in data
+        snapshot = json.loads(json.dumps(StopWatch.snapshot(clear=True)))
+        StopWatch.merge_snapshot(snapshot)
+        assert StopWatch.statistics(key)["count"] == 1
+
+    def test_benchmark_decorator(self):
+        HEADING()
+        StopWatch.clear()
+
+        @benchmark
+        def add(a, b):
+            return a + b
+
+        @benchmark(name="decorator fail")
+        def fail():
+            raise ValueError("fail")
+
+        @benchmark(name="decorator sampled", sample=10)
+        def sampled():
+            return 1
+
+        @benchmark(name="decorator coroutine")
+        async def coroutine():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        @benchmark(name="decorator generator")
+        def generator(n):
+            for i in range(n):
+                time.sleep(0.001)
+                received = yield i
+                if received:
+                    yield received
+            return "end"
+
+        @benchmark(name="decorator agenerator")
+        async def agenerator(n):
+            for i in range(n):
+                await asyncio.sleep(0.001)
+                yield i
+
+        async def consume():
+            return [i async for i in agenerator(3)]
+
+        assert add(1, 2) == 3
+        assert add.__name__ == "add"
+        assert StopWatch.get_status("add")
+        with pytest.raises(ValueError):
+            fail()
+        assert StopWatch.get_status("decorator fail") is False
+        for i in range(25):
+            sampled()
+        assert StopWatch.statistics("decorator sampled")["count"] == 3
+        assert asyncio.run(coroutine()) == "done"
+        assert StopWatch.get("decorator coroutine") >= 0.01
+
+        g = generator(3)
+        assert next(g) == 0
+        assert g.send("x") == "x"
+        assert list(g) == [1, 2]
+        assert StopWatch.get_status("decorator generator")
+        assert StopWatch.get("decorator generator first", digits=6) < StopWatch.get("decorator generator", digits=6)
+
+        def outer():
+            result = yield from generator(1)
+            return result
+
+        with pytest.raises(StopIteration) as e:
+            o = outer()
+            next(o)
+            next(o)
+        assert e.value.value == "end"
+
+        assert asyncio.run(consume()) == [0, 1, 2]
+        assert StopWatch.statistics("decorator agenerator")["count"] == 1
+        assert StopWatch.get("decorator agenerator") >= 0.003
+
+    def test_stopwatch_memory(self, tmp_path):
+        HEADING()
+        log = str(tmp_path / "block.log")
+        StopWatch.clear()
+        StopWatch.set_memory(True, sites=2)
+        try:
+            with StopWatchBlock("memory outer", log=log):
+                kept = [bytearray(1000) for i in range(1000)]
+                with StopWatchBlock("memory inner", log=log):
+                    freed = bytearray(2000000)
+                    del freed
+        finally:
+            StopWatch.set_memory(False)
+        outer = StopWatch.memory("memory outer")
+        inner = StopWatch.memory("memory inner")
+        assert outer["mem_allocated"] >= 1000000
+        assert outer["mem_peak"] >= 3000000
+        assert "test_stopwatch.py" in outer["mem_sites"]
+        assert 2000000 <= inner["mem_peak"] < 2100000
+        assert abs(inner["mem_allocated"]) < 100000
+        assert len(kept) == 1000
+        data = StopWatch.get_benchmark(sysinfo=False)["benchmark"]
+        assert data["memory outer"]["mem_peak"] == outer["mem_peak"]
+
+        assert not tracemalloc.is_tracing()
+        with StopWatchBlock("memory block", log=log, memory=True):
+            with StopWatchBlock("memory block inner", log=log, memory=True):
+                pass
+            assert tracemalloc.is_tracing()
+        assert not tracemalloc.is_tracing()
+        assert StopWatch.memory("memory block") is not None
+
+    def test_read_csv(self, tmp_path):
+        HEADING()
+        StopWatch.clear()
+        StopWatch.start("csv a 1")
+        StopWatch.stop("csv a 1")
+        StopWatch.start("csv a 2")
+        StopWatch.stop("csv a 2")
+        filename = str(tmp_path / "csv.log")
+        StopWatch.benchmark(filename=filename, sysinfo=False, csv=True)
+        with open(filename) as f:
+            content = f.read()
+        with open(filename, "a") as f:
+            f.write("other output\n" + content)
+        entries = list(
+            StopWatch.read_csv(
+                filename, columns=["timer", "time", "count"], convert=True
+            )
+        )
+        assert len(entries) == 4
+        assert entries[0]["timer"] == "csv a 1"
+        assert isinstance(entries[0]["time"], float)
+        assert entries[0]["count"] == 1
+        data = StopWatch.load_csv(filename, columns=["timer", "sum", "missing"])
+        assert data["timer"] == ["csv a 1", "csv a 2"] * 2
+        assert data["missing"] == [None] * 4
+        loaded = StopWatch.load(
+            filename, label=["name", "a", "n"], attributes=["timer", "time"]
+        )
+        assert loaded["headers"] == ["timer", "time", "name", "a", "n"]
+        assert loaded["data"][1][-1] == "2"
+
+        filename = str(tmp_path / "status.log")
+        StopWatch.benchmark(
+            filename=filename,
+            sysinfo=False,
+            csv=True,
+            attributes=["status", "timer", "time"],
+        )
+        entries = list(StopWatch.read_csv(filename, columns=["timer", "status"]))
+        assert [entry["timer"] for entry in entries] == ["csv a 1", "csv a 2"]
+        assert len(StopWatch.load(filename, attributes=["timer"])["data"]) == 2
 
     def test_print(self):
         StopWatch.benchmark(sysinfo=True, csv=True, sum=True, tag="pytest")
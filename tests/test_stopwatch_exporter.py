@@ -0,0 +1,51 @@
+###############################################################
+# pytest -v --capture=no tests/test_stopwatch_exporter.py
+# pytest -v  tests/test_stopwatch_exporter.py
+###############################################################
+
+import urllib.request
+
+import pytest
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.StopWatchExporter import StopWatchExporter
+from cloudmesh.common.util import HEADING
+
+
+@pytest.mark.incremental
+class Test_StopWatchExporter:
+
+    def test_metrics(self):
+        HEADING()
+        StopWatch.clear()
+        for i in range(3):
+            StopWatch.start("exporter step")
+            StopWatch.stop("exporter step")
+        StopWatch.start("exporter gpu", labels={"gpu": 1, "name": 'a"b'})
+        StopWatch.stop("exporter gpu", labels={"gpu": 1, "name": 'a"b'})
+        reserved = {"quantile": "q", "timer": "t"}
+        StopWatch.start("exporter reserved", labels=reserved)
+        StopWatch.stop("exporter reserved", labels=reserved)
+        StopWatch.start("exporter running")
+        content = StopWatchExporter().metrics()
+        print(content)
+        assert 'stopwatch_seconds_count{timer="exporter step"} 3' in content
+        assert 'stopwatch_seconds{timer="exporter step",quantile="0.5"}' in content
+        assert 'stopwatch_seconds_count{timer="exporter gpu",gpu="1",name="a\\"b"} 1' in content
+        assert 'stopwatch_seconds_count{timer="exporter running"} 0' in content
+        assert (
+            'stopwatch_seconds{timer="exporter reserved",label_quantile="q",'
+            'label_timer="t",quantile="0.5"}'
+        ) in content
+        assert content.endswith("# EOF\n")
+
+    def test_server(self):
+        HEADING()
+        with StopWatchExporter(port=0) as exporter:
+            url = f"http://127.0.0.1:{exporter.port}/metrics"
+            with urllib.request.urlopen(url) as response:
+                content = response.read().decode("utf-8")
+                assert response.headers["Content-Type"].startswith(
+                    "application/openmetrics-text"
+                )
+        assert 'stopwatch_seconds_count{timer="exporter step"} 3' in content
+        StopWatch.clear()
@@ -0,0 +1,106 @@
+###############################################################
+# pytest -v --capture=no tests/test_stopwatch_mllog_overhead.py
+# pytest -v  tests/test_stopwatch_mllog_overhead.py
+###############################################################
+
+import importlib.util
+import os
+
+import pytest
+from cloudmesh.common.Benchmark import Benchmark
+from cloudmesh.common.StopWatchMllog import StopWatch
+from cloudmesh.common.util import HEADING
+from cloudmesh.common.util import readfile
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("mlperf_logging") is None,
+    reason="mlperf_logging is not installed",
+)
+
+# the timing tests depend on the load of the machine, they only run with
+# CLOUDMESH_BENCHMARK=1
+timing = pytest.mark.skipif(
+    not os.environ.get("CLOUDMESH_BENCHMARK"),
+    reason="set CLOUDMESH_BENCHMARK=1 to run the timing tests",
+)
+
+
+@pytest.mark.incremental
+class Test_mllog_overhead:
+
+    def test_lookup(self):
+        HEADING()
+        from mlperf_logging.mllog import constants
+
+        key = StopWatch._mllog_lookup("POINT_IN_TIME")
+        assert key == constants.POINT_IN_TIME
+        assert StopWatch._mllog_lookup("POINT_IN_TIME") is key
+        assert StopWatch._mllog_lookup("not a constant") == "mllog-event-not a constant"
+
+    def test_values(self, tmp_path):
+        HEADING()
+        filename = str(tmp_path / "values.log")
+        StopWatch.clear()
+        StopWatch.activate_mllog(filename=filename)
+        try:
+            data = {"step": 1}
+            StopWatch.start("mllog values", values=data)
+            StopWatch.stop("mllog values", values=data)
+            StopWatch.event("mllog event", values=data)
+            StopWatch.start("mllog list", values=[1])
+            StopWatch.stop("mllog list", values=[1])
+        finally:
+            StopWatch.deactivate_mllog()
+        assert data == {"step": 1}
+        content = readfile(filename)
+        assert "[1, 'mllog list']" in content
+        assert "{'step': 1, 'name': 'mllog values'}" in content
+        assert '"value": "{\'step\': 1}"' in content
+
+    def test_sink(self, tmp_path):
+        HEADING()
+        filename = str(tmp_path / "sink.log")
+        StopWatch.clear()
+        StopWatch.activate_mllog(filename=filename, sink=True)
+        try:
+            data = {"step": 1}
+            StopWatch.start("mllog sink", values=data)
+            data["step"] = 2
+            StopWatch.stop("mllog sink", values=data)
+        finally:
+            StopWatch.deactivate_mllog()
+        content = readfile(filename)
+        assert "{'step': 1, 'name': 'mllog sink'}" in content
+        assert "{'step': 2, 'name': 'mllog sink'}" in content
+
+    @pytest.mark.benchmark
+    @timing
+    def test_overhead(self, tmp_path):
+        HEADING()
+        filename = str(tmp_path / "overhead.log")
+        values = {"epoch": 1, "loss": 0.5}
+
+        def event():
+            StopWatch.event("mllog overhead", values=values)
+
+        StopWatch.clear()
+        disabled = Benchmark.run(
+            event, name="mllog disabled", number=200, repeat=5, output=False
+        )
+        StopWatch.activate_mllog(filename=filename)
+        try:
+            enabled = Benchmark.run(
+                event, name="mllog enabled", number=200, repeat=5, output=False
+            )
+        finally:
+            StopWatch.deactivate_mllog()
+        StopWatch.activate_mllog(filename=filename, sink=True)
+        try:
+            deferred = Benchmark.run(
+                event, name="mllog sink", number=200, repeat=5, output=False
+            )
+        finally:
+            StopWatch.deactivate_mllog()
+        for result in [disabled, enabled, deferred]:
+            print(f"{result['timer']:15} {result['mean'] * 1e6:8.2f} µs per event")
+        assert disabled["mean"] < enabled["mean"]
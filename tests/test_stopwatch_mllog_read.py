@@ -0,0 +1,106 @@
+###############################################################
+# pytest -v --capture=no tests/test_stopwatch_mllog_read.py
+# pytest -v  tests/test_stopwatch_mllog_read.py
+###############################################################
+
+import json
+
+import pytest
+from cloudmesh.common.StopWatchMllog import StopWatch
+from cloudmesh.common.util import HEADING
+from cloudmesh.common.util import writefile
+
+
+def line(event_type, key, time_ms, value=None):
+    entry = {
+        "namespace": "cloudmesh",
+        "time_ms": time_ms,
+        "event_type": event_type,
+        "key": key,
+        "value": value,
+        "metadata": {"file": "train.py", "lineno": 1},
+    }
+    return ":::MLLOG " + json.dumps(entry)
+
+
+@pytest.mark.incremental
+class Test_mllog_read:
+
+    def test_read(self, tmp_path):
+        HEADING()
+        filename = str(tmp_path / "read.log")
+        lines = ["some other output", line("POINT_IN_TIME", "submission_org", 1000)]
+        for epoch in range(4):
+            lines.append(line("INTERVAL_START", "epoch", 2000 + epoch * 1000))
+            lines.append(line("INTERVAL_START", "eval", 2500 + epoch * 1000))
+            lines.append(line("INTERVAL_END", "eval", 2600 + epoch * 1000))
+            lines.append(line("INTERVAL_END", "epoch", 2900 + epoch * 1000))
+        lines.append(":::MLLOG {broken")
+        lines.append(line("INTERVAL_START", "run", 6000))
+        writefile(filename, "\n".join(lines) + "\n")
+
+        entries = list(StopWatch.read_mllog(filename))
+        assert len(entries) == 1 + 16 + 1
+        assert entries[0]["key"] == "submission_org"
+
+        intervals = list(StopWatch.read_mllog_intervals(filename))
+        epochs = [i for i in intervals if i["key"] == "epoch"]
+        assert [i["elapsed"] for i in epochs] == [0.9] * 4
+        assert intervals[-1]["key"] == "run" and intervals[-1]["elapsed"] is None
+
+        data = StopWatch.load_mllog(filename)
+        assert data["epoch"]["count"] == 4
+        assert data["epoch"]["sum"] == 3.6
+        assert data["epoch"]["status"] == "ok"
+        assert abs(data["eval"]["mean"] - 0.1) < 0.01
+        assert data["submission_org"]["time"] == 0.0
+        assert data["run"]["status"] == "failed"
+        assert data["run"]["count"] == 0
+
+        table = StopWatch.mllog_benchmark(filename)
+        assert "epoch" in table and "P95" in table
+
+    def test_constants(self, tmp_path):
+        HEADING()
+        constants = pytest.importorskip("mlperf_logging.mllog.constants")
+        filename = str(tmp_path / "constants.log")
+        lines = [
+            line("INTERVAL_START", constants.INIT_START, 0),
+            line("INTERVAL_END", constants.INIT_STOP, 500),
+            line("INTERVAL_START", constants.RUN_START, 1000),
+        ]
+        for epoch in range(2):
+            start = 2000 + epoch * 1000
+            lines.append(line("INTERVAL_START", constants.EPOCH_START, start))
+            lines.append(line("INTERVAL_START", constants.EVAL_START, start + 500))
+            lines.append(line("INTERVAL_END", constants.EVAL_STOP, start + 700))
+            lines.append(line("INTERVAL_END", constants.EPOCH_STOP, start + 900))
+        lines.append(line("INTERVAL_END", constants.RUN_STOP, 5000))
+        writefile(filename, "\n".join(lines) + "\n")
+
+        intervals = list(StopWatch.read_mllog_intervals(filename))
+        assert all(i["elapsed"] is not None for i in intervals)
+        data = StopWatch.load_mllog(filename)
+        assert set(data) == {"init", "run", "epoch", "eval"}
+        assert data["run"]["time"] == 4.0
+        assert data["run"]["status"] == "ok"
+        assert data["epoch"]["count"] == 2
+        assert data["epoch"]["sum"] == 1.8
+        assert data["eval"]["sum"] == 0.4
+
+    def test_roundtrip(self, tmp_path):
+        HEADING()
+        pytest.importorskip("mlperf_logging.mllog")
+        filename = str(tmp_path / "roundtrip.log")
+        StopWatch.clear()
+        StopWatch.activate_mllog(filename=filename)
+        try:
+            for i in range(3):
+                StopWatch.start("roundtrip")
+                StopWatch.stop("roundtrip")
+            StopWatch.event("roundtrip event")
+        finally:
+            StopWatch.deactivate_mllog()
+        data = StopWatch.load_mllog(filename)
+        assert data["roundtrip"]["count"] == 3
+        assert data["roundtrip event"]["count"] == 1
@@ -0,0 +1,61 @@
+###############################################################
+# pytest -v --capture=no tests/test_systeminfo.py
+# pytest -v  tests/test_systeminfo.py
+###############################################################
+
+import json
+
+import cloudmesh.common.systeminfo
+import pytest
+from cloudmesh.common.StopWatch import StopWatch
+from cloudmesh.common.systeminfo import static_systeminfo
+from cloudmesh.common.systeminfo import systeminfo
+from cloudmesh.common.util import HEADING
+
+
+@pytest.mark.incremental
+class Test_systeminfo:
+
+    def test_systeminfo(self):
+        HEADING()
+        data = systeminfo(user="pytest", node="pytest-node")
+        assert data["user"] == "pytest"
+        assert data["uname.node"] == "pytest-node"
+        assert "mem.percent" in data
+        assert "platform.version" in data
+        assert list(data).index("mem.percent") < list(data).index("platform.version")
+
+    def test_static(self):
+        HEADING()
+        assert static_systeminfo() is static_systeminfo()
+        data = systeminfo(dynamic=False)
+        assert "mem.percent" not in data
+        assert data["cpu"] == static_systeminfo()["cpu"]
+
+    def test_cache_file(self, tmp_path):
+        HEADING()
+        filename = str(tmp_path / "systeminfo.json")
+        data = static_systeminfo(refresh=True, filename=filename)
+        with open(filename) as f:
+            cached = json.load(f)
+        cached["data"]["cpu"] = "cached cpu"
+        with open(filename, "w") as f:
+            json.dump(cached, f)
+        assert static_systeminfo(refresh=False, filename=filename) is data
+        cloudmesh.common.systeminfo._static_systeminfo = None
+        assert static_systeminfo(filename=filename)["cpu"] == "cached cpu"
+        assert static_systeminfo(refresh=True)["cpu"] == data["cpu"]
+
+    def test_benchmark_static(self, monkeypatch):
+        HEADING()
+
+        def dynamic_systeminfo():
+            raise AssertionError("dynamic systeminfo computed")
+
+        monkeypatch.setattr(
+            cloudmesh.common.systeminfo, "dynamic_systeminfo", dynamic_systeminfo
+        )
+        StopWatch.start("systeminfo static")
+        StopWatch.stop("systeminfo static")
+        StopWatch.benchmark(sysinfo=False)
+        StopWatch.get_benchmark(sysinfo=False)